@@ -5,6 +5,7 @@
 
 from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import Optional, List
+import heapq
 import logging
 from datetime import datetime, timedelta
 
@@ -257,7 +258,7 @@ async def get_file_info(
     """
     
     try:
-        file_info = await document_service.get_file_info(file_id)
+        file_info = await document_service.get_file_info(file_id, include_remote=True)
         
         return SuccessResponse(
             data=file_info,
@@ -598,25 +599,31 @@ async def get_dashboard_stats(
         # 获取任务统计
         task_stats = await document_service.cache_service.get_queue_stats("document_parse")
         
-        # 获取文件列表用于计算存储统计
-        files = await document_service.list_files(limit=1000)  # 获取更多文件用于统计
-        
-        total_size = sum(file.get("file_size", 0) for file in files)
+        # 流式遍历全部文件（分批读取所需字段），累计存储大小、解析数和最近上传的文件（最近7天）
+        # 不再截取前1000个文件，避免文件数增长后统计结果失真
+        recent_cutoff = datetime.utcnow() - timedelta(days=7)
+        total_files = 0
+        total_size = 0
+        parsed_files = 0
+        recent_files = []
+        async for file in document_service.cache_service.iter_file_fields(
+            ["filename", "upload_date", "file_size", "parse_status"], batch_size=500
+        ):
+            total_files += 1
+            file_size = file["file_size"]
+            if file_size:
+                total_size += int(file_size)  # Redis哈希中存储为字符串
+            if file["parse_status"] == "completed":
+                parsed_files += 1
+            if datetime.fromisoformat(file["upload_date"] or "1970-01-01") > recent_cutoff:
+                recent_files.append(file)
         
         # 计算解析成功率
-        parsed_files = sum(1 for file in files if file.get("parse_status") == "completed")
-        parse_success_rate = (parsed_files / len(files) * 100) if files else 0
-        
-        # 最近上传的文件（最近7天）
-        recent_cutoff = datetime.utcnow() - timedelta(days=7)
-        recent_files = [
-            file for file in files 
-            if datetime.fromisoformat(file.get("upload_date", "1970-01-01")) > recent_cutoff
-        ]
+        parse_success_rate = (parsed_files / total_files * 100) if total_files else 0
         
         dashboard_data = {
             "file_stats": {
-                "total_files": len(files),
+                "total_files": total_files,
                 "categories": file_categories,
                 "total_size_bytes": total_size,
                 "total_size_mb": round(total_size / (1024 * 1024), 2),
@@ -626,8 +633,8 @@ async def get_dashboard_stats(
             "task_stats": task_stats,
             "storage_stats": {
                 "used_space_mb": round(total_size / (1024 * 1024), 2),
-                "file_count": len(files),
-                "avg_file_size_mb": round(total_size / len(files) / (1024 * 1024), 2) if files else 0
+                "file_count": total_files,
+                "avg_file_size_mb": round(total_size / total_files / (1024 * 1024), 2) if total_files else 0
             },
             "recent_activities": [
                 {
@@ -636,7 +643,7 @@ async def get_dashboard_stats(
                     "upload_date": file.get("upload_date"),
                     "file_size": file.get("file_size")
                 }
-                for file in sorted(recent_files, key=lambda x: x.get("upload_date", ""), reverse=True)[:10]
+                for file in heapq.nlargest(10, recent_files, key=lambda x: x["upload_date"])
             ]
         }
         
@@ -14,7 +14,7 @@ import psutil
 from app.models.responses import SuccessResponse, ErrorCode, HealthCheckResponse, ErrorResponse
 from app.core.config import settings
 from app.core.exceptions import create_service_exception
-from app.services import get_service_status
+from app.services import get_service_status, get_document_service, get_cache_service
 
 router = APIRouter(prefix="/health", tags=["系统健康"])
 logger = logging.getLogger("rag-anything")
@@ -36,20 +36,11 @@ async def check_qdrant_health() -> str:
 async def check_redis_health() -> str:
     """检查Redis数据库健康状态"""
     try:
-        # 这里需要实际的Redis连接检查
-        # 目前返回模拟状态
-        import redis.asyncio as redis
-        
-        redis_client = redis.Redis(
-            host=settings.REDIS_HOST,
-            port=settings.REDIS_PORT,
-            password=settings.REDIS_PASSWORD,
-            db=settings.REDIS_DB,
-            socket_connect_timeout=5
-        )
+        # 复用缓存服务的共享连接池，不为每次检查新建连接
+        cache_service = await get_cache_service()
+        await cache_service.initialize()
         
-        await redis_client.ping()
-        await redis_client.close()
+        await asyncio.wait_for(cache_service.redis.ping(), timeout=5)
         return "healthy"
         
     except Exception as e:
@@ -223,6 +214,7 @@ async def quick_health_check():
     **响应数据:**
     - status: 服务器状态
     - timestamp: 检查时间
+    - workers: 本进程MinerU可用槽位，可用于扩缩容判断
     - uptime: 服务运行时间（如果可获取）
     """
     
@@ -240,6 +232,8 @@ async def quick_health_check():
         process = psutil.Process(os.getpid())
         process_memory = process.memory_info()
         
+        document_service = await get_document_service()
+        
         health_data = {
             "status": "healthy",
             "timestamp": datetime.utcnow().isoformat(),
@@ -249,6 +243,10 @@ async def quick_health_check():
                 "disk_percent": (disk.used / disk.total) * 100,
                 "process_memory_mb": round(process_memory.rss / 1024 / 1024, 2)
             },
+            "workers": {
+                "mineru_slots_available": document_service.mineru_slots_available,
+                "mineru_max_concurrent": settings.MINERU_MAX_CONCURRENT
+            },
             "settings": {
                 "max_concurrent_files": settings.MAX_CONCURRENT_FILES,
                 "max_file_size_mb": settings.MAX_FILE_SIZE // (1024 * 1024),
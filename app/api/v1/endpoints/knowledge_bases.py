@@ -282,7 +282,7 @@ async def get_knowledge_base_files(
         doc_service = await get_document_service()
         files = []
         for file_id in file_ids:
-            file_info = await doc_service.get_file_info(file_id)
+            file_info = await doc_service.get_file_info(file_id, include_remote=True)
             if file_info:
                 files.append(file_info)
         
@@ -4,7 +4,9 @@
 """
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from typing import Optional, List, Dict, Any
+import json
 import logging
 from pydantic import BaseModel
 
@@ -369,6 +371,38 @@ async def generate_answer(
             )
 
 
+@router.post("/answer/stream", summary="流式问答生成")
+async def generate_answer_stream(
+    request: SearchRequest,
+    search_service: SearchService = Depends(get_search_service)
+):
+    """
+    流式问答生成接口
+    
+    **功能说明:**
+    - 检索完成后立即返回来源信息，回答边生成边返回
+    - 响应为 Server-Sent Events（text/event-stream），每个事件的data为JSON
+    
+    **事件类型:**
+    - sources: 检索到的来源信息
+    - delta: 回答片段，按顺序拼接即为完整回答
+    - done: 回答生成结束
+    - error: 检索或生成失败
+    """
+    
+    async def event_stream():
+        async for event in search_service.search_and_answer_stream(
+            query=request.query,
+            search_type=request.search_type,
+            limit=request.limit,
+            score_threshold=0.1,  # 🔧 与问答生成接口一致，降低阈值确保能找到结果
+            file_ids=request.file_ids
+        ):
+            yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
 @router.get("/stats", response_model=SuccessResponse, summary="检索统计信息")
 async def get_search_stats(
     search_service: SearchService = Depends(get_search_service)
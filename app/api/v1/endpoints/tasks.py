@@ -454,6 +454,50 @@ async def get_processing_overview(
         )
 
 
+@router.get("/processing/status", response_model=SuccessResponse, summary="批量获取文件处理状态")
+async def get_file_processing_statuses(
+    ids: str = Query(..., description="文件ID列表，逗号分隔（最多100个）"),
+    document_service: DocumentService = Depends(get_document_service)
+):
+    """
+    批量获取文件处理状态 - 用于文件列表页一次性展示多个文件的进度
+    
+    **功能说明:**
+    - 文件元数据和任务信息各一次批量查询
+    - 避免逐个调用单文件状态接口带来的N+1请求
+    
+    **查询参数:**
+    - ids: 文件ID列表，逗号分隔
+    
+    **响应数据:**
+    - statuses: 以文件ID为键的处理状态（结构与单文件处理状态接口一致，不存在的文件为 {"exists": false}）
+    """
+    file_ids = list(dict.fromkeys(file_id.strip() for file_id in ids.split(",") if file_id.strip()))
+    if not file_ids or len(file_ids) > 100:
+        raise create_file_exception(
+            ErrorCode.INVALID_REQUEST,
+            "文件ID数量必须在1-100之间"
+        )
+    
+    try:
+        statuses = await document_service.get_file_processing_statuses(file_ids)
+        
+        return SuccessResponse(
+            data={"statuses": statuses},
+            message="文件处理状态获取成功"
+        )
+        
+    except Exception as e:
+        logger.error(f"批量获取文件处理状态失败: {e}")
+        if hasattr(e, 'code'):
+            raise e
+        else:
+            raise create_file_exception(
+                ErrorCode.INTERNAL_SERVER_ERROR,
+                f"批量获取文件处理状态失败: {str(e)}"
+            )
+
+
 @router.get("/retry-candidates", response_model=SuccessResponse, summary="获取重试候选任务")
 async def get_retry_candidates(
     queue_name: str = Query("document_parse", description="队列名称"),
@@ -57,14 +57,14 @@ async def upload_file(
         logger.info(f"🚀 API upload_file 开始处理文件")
         logger.info(f"📄 文件信息: filename='{file.filename}', content_type='{file.content_type}', description='{description}'")
         
-        # 读取文件内容
-        file_content = await file.read()
-        logger.info(f"📊 文件内容读取成功，大小: {len(file_content)} 字节")
+        # 直接从上传的临时文件流式写入存储，不整体读入内存
+        logger.info(f"📊 文件大小: {file.size} 字节")
         
         # 上传文件
         logger.info(f"🔄 开始调用 document_service.upload_file")
         file_id = await document_service.upload_file(
-            file_content=file_content,
+            file_stream=file.file,
+            file_size=file.size,
             filename=file.filename,
             content_type=file.content_type,
             metadata={"description": description} if description else None
@@ -72,7 +72,7 @@ async def upload_file(
         logger.info(f"✅ document_service.upload_file 调用成功，返回 file_id: {file_id}")
         
         # 获取文件信息
-        file_info = await document_service.get_file_info(file_id)
+        file_info = await document_service.get_file_info(file_id, include_remote=True)
         
         # 如果需要自动解析，启动解析任务
         parse_task_id = None
@@ -157,19 +157,17 @@ async def upload_files_batch(
                 failed_uploads += 1
                 continue
             
-            # 读取文件内容
-            file_content = await file.read()
-            
-            # 上传文件
+            # 上传文件（流式）
             file_id = await document_service.upload_file(
-                file_content=file_content,
+                file_stream=file.file,
+                file_size=file.size,
                 filename=file.filename,
                 content_type=file.content_type,
                 metadata={"description": description} if description else None
             )
             
             # 获取文件信息
-            file_info = await document_service.get_file_info(file_id)
+            file_info = await document_service.get_file_info(file_id, include_remote=True)
             
             # 如果需要自动解析，启动解析任务
             parse_task_id = None
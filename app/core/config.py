@@ -23,12 +23,16 @@ class Settings(BaseSettings):
     QDRANT_PORT: int = 6333
     QDRANT_API_KEY: str = ""  # 如果需要认证
     QDRANT_COLLECTION_NAME: str = "rag_documents"  # 默认集合名称
+    QDRANT_QUANTIZATION: str = "int8"  # 新建集合的标量量化类型（int8），留空不量化；已有集合不受影响
+    QDRANT_SEARCH_OVERSAMPLING: float = 2.0  # 量化检索时多取的候选倍数，候选用原始向量重新打分
     
     # Redis 缓存数据库配置  
     REDIS_HOST: str = "192.168.30.54"
     REDIS_PORT: int = 36379
     REDIS_PASSWORD: str = "8i9o0p-["
     REDIS_DB: int = 0
+    REDIS_MAX_CONNECTIONS: int = 50  # 进程内共享连接池的最大连接数
+    REDIS_POOL_TIMEOUT: int = 20  # 连接池用尽时等待空闲连接的秒数
     
     # === 对象存储配置 ===
     # MinIO 配置
@@ -50,6 +54,9 @@ class Settings(BaseSettings):
     EMBEDDING_API_KEY: str = "dummy_key_for_local_service"  # 本地服务不需要认证，设置dummy值
     EMBEDDING_MODEL: str = "Qwen3-Embedding-8B"
     EMBEDDING_DIMENSION: int = 4096  # ⭐ 推荐：使用Qwen3-Embedding-8B的原生维度
+    EMBEDDING_CACHE_TTL: int = 86400  # embedding结果缓存时间（秒），相同文本不重复请求
+    EMBEDDING_ENCODING_FORMAT: str = "float"  # float 或 base64（服务端支持时可省去逐个解析JSON浮点数）
+    SEMANTIC_CACHE: bool = False  # embedding缓存按归一化文本（忽略大小写和空白差异）命中
     
     # 兼容性别名（为了向后兼容）
     LLM_API_BASE: str = ""  # 会在初始化时同步
@@ -127,6 +134,7 @@ class Settings(BaseSettings):
     ENABLE_TABLE_PROCESSING: bool = True
     ENABLE_EQUATION_PROCESSING: bool = True
     MAX_CONCURRENT_FILES: int = 4
+    MINERU_MAX_CONCURRENT: int = 2  # 每个进程同时运行的MinerU子进程数，按GPU/内存容量设置
     
     # 检索配置
     DEFAULT_SEARCH_LIMIT: int = 10
@@ -136,6 +144,7 @@ class Settings(BaseSettings):
     # 任务管理
     TASK_CLEANUP_INTERVAL: int = 3600  # 1小时，清理完成的任务
     TASK_MAX_RETENTION: int = 86400  # 24小时，任务最大保留时间
+    PARSE_WORKER_MAX_TASKS: int = 5  # 每个进程同时执行的解析任务数
     
     # 日志配置
     LOG_LEVEL: str = "INFO"
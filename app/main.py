@@ -13,7 +13,7 @@ from app.core.config import settings
 from app.core.exceptions import setup_exception_handlers
 from app.api.v1.api import api_router
 from app.services import initialize_services, cleanup_services
-from app.workers import start_vectorize_worker, stop_vectorize_worker
+from app.workers import start_vectorize_worker, stop_vectorize_worker, start_parse_worker, stop_parse_worker
 
 # 配置日志
 logging.basicConfig(
@@ -46,6 +46,8 @@ async def lifespan(app: FastAPI):
         logger.info("启动后台任务处理器...")
         await start_vectorize_worker()
         logger.info("✓ 向量化任务处理器已启动")
+        await start_parse_worker()
+        logger.info("✓ 解析任务处理器已启动")
         
         logger.info(f"🚀 RAG-Anything 服务启动完成！")
         logger.info(f"📊 服务器运行在: http://{settings.HOST}:{settings.PORT}")
@@ -65,6 +67,8 @@ async def lifespan(app: FastAPI):
         logger.info("停止后台任务处理器...")
         await stop_vectorize_worker()
         logger.info("✓ 向量化任务处理器已停止")
+        await stop_parse_worker()
+        logger.info("✓ 解析任务处理器已停止")
         
         # 清理所有服务
         await cleanup_services()
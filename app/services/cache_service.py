@@ -3,10 +3,19 @@ Redis 缓存服务
 负责任务状态管理、文件元数据缓存和会话管理
 """
 
+import re
+import copy
 import json
+import time
+import base64
+import struct
 import asyncio
+import hashlib
 import logging
-from typing import Any, Dict, List, Optional, Union
+from array import array
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
 from datetime import datetime, timedelta
 from urllib.parse import quote_plus
 
@@ -22,13 +31,234 @@ from app.core.exceptions import create_service_exception
 
 logger = logging.getLogger("rag-anything")
 
+# 进程内文件元数据缓存：同一文件在一次处理流程中会被反复读取
+# 其他进程（解析/向量化worker）也会改写元数据，命中时先HMGET这些易变字段，与缓存一致才直接返回，
+# 省去HGETALL和读取体积较大的parse_result
+_FILE_METADATA_CACHE_SIZE = 4096
+_FILE_METADATA_CACHE_TTL = 5.0
+_FILE_METADATA_VERSION_FIELDS = (
+    "updated_at", "status", "parse_status", "vectorize_status",
+    "vectorize_updated_at", "vector_status", "kb_id", "kb_name"
+)
+
+# 文件列表索引：按上传时间排序的全部文件，以及按状态划分的同序索引
+_FILE_DATE_INDEX = "files:by_date"
+_FILE_STATUS_INDEX = "files:status:{}"
+_FILE_INDEX_READY = "files:index_ready"
+
+# 文件统计计数器：写入状态字段时增减，每小时用全量扫描校准一次
+_FILE_COUNTER_FIELDS = ("parse_status", "vectorize_status")
+_FILE_COUNTER_VALUES = ("completed", "running", "failed")
+_FILE_COUNTER_KEY = "files:count:{}:{}"
+_FILE_TOTAL_KEY = "files:count"
+_FILE_SIZED_KEY = "files:sized_count"
+_FILE_SIZE_KEY = "files:total_size"
+_FILE_COUNTERS_READY = "files:counters_ready"
+_FILE_COUNTERS_TTL = 3600
+
+# 任务队列分数中优先级的权重：远大于时间戳（秒），保证高优先级任务总是先出队
+_QUEUE_PRIORITY_WEIGHT = 1e10
+
+# 知识库列表索引：按创建时间排序的全部知识库，以及按状态划分的同序索引（取代早期的knowledge_bases集合）
+_KB_LEGACY_SET = "knowledge_bases"
+_KB_DATE_INDEX = "knowledge_bases:by_date"
+_KB_STATUS_INDEX = "knowledge_bases:status:{}"
+_KB_INDEX_READY = "knowledge_bases:index_ready"
+
+# 知识库计数器：文件加入/移出知识库、解析/向量化状态变更时原子增减，每天用全量统计校准一次
+# 哈希字段：file_count、total_size、parsed_files、vectorized_files、last_indexed，
+# 以及分布字段file_types:{content_type}、parse_status:{状态}、vector_status:{状态}
+_KB_COUNTERS_KEY = "kb:counters:{}"
+_KB_COUNTERS_TTL = 86400
+_KB_STATUS_FIELDS = ("parse_status", "vector_status")
+_KB_COMPLETED_FIELDS = {"parse_status": "parsed_files", "vector_status": "vectorized_files"}
+
+# KEYS: file:{fid}, kb_files:{kb}, kb:counters:{kb}  ARGV: kb_id, kb_name, file_id, 增量(1或-1), 计数器TTL
+# 计数器不存在（或只剩缺少file_count的残缺哈希）时只改关联关系，等待下次全量统计重建
+_KB_COUNT_FILE_LUA = """
+if redis.call('HEXISTS', KEYS[3], 'file_count') == 1 then
+    local delta = tonumber(ARGV[4])
+    local fields = redis.call('HMGET', KEYS[1], 'file_size', 'content_type', 'parse_status', 'vector_status', 'vectorized_at')
+    local parse_status = fields[3] or 'pending'
+    local vector_status = fields[4] or 'pending'
+    redis.call('HINCRBY', KEYS[3], 'file_count', delta)
+    redis.call('HINCRBY', KEYS[3], 'total_size', delta * math.floor(tonumber(fields[1]) or 0))
+    redis.call('HINCRBY', KEYS[3], 'file_types:' .. (fields[2] or 'unknown'), delta)
+    redis.call('HINCRBY', KEYS[3], 'parse_status:' .. parse_status, delta)
+    redis.call('HINCRBY', KEYS[3], 'vector_status:' .. vector_status, delta)
+    if parse_status == 'completed' then
+        redis.call('HINCRBY', KEYS[3], 'parsed_files', delta)
+    end
+    if vector_status == 'completed' then
+        redis.call('HINCRBY', KEYS[3], 'vectorized_files', delta)
+    end
+    if delta > 0 and fields[5] then
+        local last_indexed = redis.call('HGET', KEYS[3], 'last_indexed')
+        if not last_indexed or fields[5] > last_indexed then
+            redis.call('HSET', KEYS[3], 'last_indexed', fields[5])
+        end
+    end
+    if redis.call('TTL', KEYS[3]) < 0 then
+        redis.call('EXPIRE', KEYS[3], ARGV[5])
+    end
+end
+"""
+
+# KEYS: kb:counters:{kb}  ARGV: 计数器TTL, last_indexed(空串表示不更新), 之后为成对的 字段, 增量
+# 与_KB_COUNT_FILE_LUA相同：计数器缺少file_count时不做任何修改，避免留下永不过期的残缺哈希
+_KB_COUNT_STATUS_LUA = """
+if redis.call('HEXISTS', KEYS[1], 'file_count') == 0 then
+    return 0
+end
+for i = 3, #ARGV, 2 do
+    redis.call('HINCRBY', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+if ARGV[2] ~= '' then
+    redis.call('HSET', KEYS[1], 'last_indexed', ARGV[2])
+end
+if redis.call('TTL', KEYS[1]) < 0 then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+return 1
+"""
+
+# KEYS: knowledge_base:{kb}, kb:counters:{kb}  ARGV: 计数器TTL, 之后为成对的 字段, 值
+# 全量统计重建只覆盖计数器；知识库已被删除时不写入，避免后台重建把它重新建出来
+_KB_REPLACE_COUNTERS_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('DEL', KEYS[2])
+for i = 2, #ARGV, 2 do
+    redis.call('HSET', KEYS[2], ARGV[i], ARGV[i + 1])
+end
+redis.call('EXPIRE', KEYS[2], ARGV[1])
+return 1
+"""
+
+# 返回 -1 文件不存在，0 已在知识库中，1 新加入
+_KB_LINK_FILE_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return -1
+end
+redis.call('HSET', KEYS[1], 'kb_id', ARGV[1], 'kb_name', ARGV[2])
+if redis.call('SADD', KEYS[2], ARGV[3]) == 0 then
+    return 0
+end
+""" + _KB_COUNT_FILE_LUA + """
+return 1
+"""
+
+# 返回 0 不在知识库中，1 已移出
+_KB_UNLINK_FILE_LUA = """
+redis.call('HDEL', KEYS[1], 'kb_id', 'kb_name')
+if redis.call('SREM', KEYS[2], ARGV[3]) == 0 then
+    return 0
+end
+""" + _KB_COUNT_FILE_LUA + """
+return 1
+"""
+
+# 内容去重：blob:{哈希}记录已上传对象（JSON，含object_name、file_url），object_refs:{对象名}记录引用该对象的文件
+# 引用的登记、复用与释放都在服务端脚本中完成，删除最后一个引用与新文件复用之间不会交错
+
+# KEYS: blob:{hash}  ARGV: file_id, blob过期秒数  返回blob JSON（已登记引用）或nil（需重新上传）
+_BLOB_ACQUIRE_LUA = """
+local blob = redis.call('GET', KEYS[1])
+if not blob then
+    return nil
+end
+local ok, info = pcall(cjson.decode, blob)
+if not ok or type(info) ~= 'table' or not info['object_name'] then
+    return nil
+end
+redis.call('SADD', 'object_refs:' .. info['object_name'], ARGV[1])
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return blob
+"""
+
+# KEYS: blob:{hash}, object_refs:{对象名}  ARGV: blob JSON, file_id, blob过期秒数
+# 返回1已登记；0相同内容已被并发上传的文件先登记，本文件独占自己的对象，不参与引用计数
+_BLOB_REGISTER_LUA = """
+if not redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[3], 'NX') then
+    return 0
+end
+redis.call('SADD', KEYS[2], ARGV[2])
+return 1
+"""
+
+# KEYS: object_refs:{对象名}, blob:{hash}（可为空串）  ARGV: file_id, 对象名
+# 返回1对象已无引用、可以删除；0仍被其他文件引用
+_BLOB_RELEASE_LUA = """
+if redis.call('SREM', KEYS[1], ARGV[1]) == 0 then
+    return 1
+end
+if redis.call('SCARD', KEYS[1]) > 0 then
+    return 0
+end
+if KEYS[2] ~= '' then
+    local blob = redis.call('GET', KEYS[2])
+    if blob then
+        local ok, info = pcall(cjson.decode, blob)
+        if ok and type(info) == 'table' and info['object_name'] == ARGV[2] then
+            redis.call('DEL', KEYS[2])
+        end
+    end
+end
+return 1
+"""
+
+# 进程内embedding缓存：以float32数组保存，单条4096维约16KB；Redis中以float16保存
+_EMBEDDING_CACHE_SIZE = 1024
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# 搜索建议索引：归一化后的历史查询，字典序有序集合（分值均为0）支持ZRANGEBYLEX前缀查找，
+# 另一个有序集合记录每条查询的次数用于排序
+_SUGGEST_LEX_KEY = "search_suggest:lex"
+_SUGGEST_COUNT_KEY = "search_suggest:count"
+_SUGGEST_MAX_LENGTH = 50
+_SUGGEST_CANDIDATES = 100
+# 建议索引上限：超过_SUGGEST_MAX_ENTRIES时按次数淘汰到_SUGGEST_TRIM_TO条，留出余量让新查询有机会积累次数
+_SUGGEST_MAX_ENTRIES = 10000
+_SUGGEST_TRIM_TO = 9000
+
+# KEYS: search_suggest:count, search_suggest:lex  ARGV: 上限, 淘汰后保留条数
+# 从次数最少的查询开始淘汰，两个有序集合同步移除
+_SUGGEST_TRIM_LUA = """
+local total = redis.call('ZCARD', KEYS[1])
+if total <= tonumber(ARGV[1]) then
+    return 0
+end
+local victims = redis.call('ZRANGE', KEYS[1], 0, total - tonumber(ARGV[2]) - 1)
+for i = 1, #victims, 500 do
+    local batch = {unpack(victims, i, math.min(i + 499, #victims))}
+    redis.call('ZREM', KEYS[1], unpack(batch))
+    redis.call('ZREM', KEYS[2], unpack(batch))
+end
+return #victims
+"""
+
 
 class CacheService:
     """Redis 缓存服务"""
     
     def __init__(self):
         self.redis: Optional[Redis] = None
+        self._pool = None
         self._connected = False
+        # (file_id, include_parse_result) -> (过期时间, 易变字段取值, 元数据)
+        self._file_metadata_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        # emb:{model}:{sha256} -> float32数组
+        self._embedding_cache: "OrderedDict[str, array]" = OrderedDict()
+        # Lua脚本对象：首次调用时SCRIPT LOAD，之后按SHA执行EVALSHA
+        self._kb_link_file_script = None
+        self._kb_unlink_file_script = None
+        self._kb_count_status_script = None
+        self._blob_acquire_script = None
+        self._blob_register_script = None
+        self._blob_release_script = None
+        self._suggest_trim_script = None
+        self._kb_replace_counters_script = None
         
     async def initialize(self):
         """初始化Redis连接"""
@@ -45,18 +275,30 @@ class CacheService:
             else:
                 redis_url = f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}/{settings.REDIS_DB}"
             
-            # 创建Redis连接池
-            self.redis = aioredis.from_url(
+            # 创建进程内共享的Redis连接池：连接用尽时排队等待而不是直接报错，
+            # 避免并发请求（批量提交、asyncio.gather扇出）超出上限时失败
+            self._pool = aioredis.BlockingConnectionPool.from_url(
                 redis_url,
                 encoding='utf-8',
                 decode_responses=True,
-                max_connections=20,
+                max_connections=settings.REDIS_MAX_CONNECTIONS,
+                timeout=settings.REDIS_POOL_TIMEOUT,
                 retry_on_timeout=True
             )
+            self.redis = Redis(connection_pool=self._pool)
             
             # 测试连接
             await self.redis.ping()
             
+            self._kb_link_file_script = self.redis.register_script(_KB_LINK_FILE_LUA)
+            self._kb_unlink_file_script = self.redis.register_script(_KB_UNLINK_FILE_LUA)
+            self._kb_count_status_script = self.redis.register_script(_KB_COUNT_STATUS_LUA)
+            self._blob_acquire_script = self.redis.register_script(_BLOB_ACQUIRE_LUA)
+            self._blob_register_script = self.redis.register_script(_BLOB_REGISTER_LUA)
+            self._blob_release_script = self.redis.register_script(_BLOB_RELEASE_LUA)
+            self._suggest_trim_script = self.redis.register_script(_SUGGEST_TRIM_LUA)
+            self._kb_replace_counters_script = self.redis.register_script(_KB_REPLACE_COUNTERS_LUA)
+            
             self._connected = True
             logger.info(f"Redis 服务初始化成功，连接到 {settings.REDIS_HOST}:{settings.REDIS_PORT}")
             
@@ -71,6 +313,7 @@ class CacheService:
         """关闭Redis连接"""
         if self.redis:
             await self.redis.close()
+            await self._pool.disconnect()
             self._connected = False
             logger.info("Redis 连接已关闭")
     
@@ -127,6 +370,9 @@ class CacheService:
         if not self._connected:
             await self.initialize()
             
+        for key in keys:
+            self._forget_file_metadata_key(key)
+        
         try:
             return await self.redis.delete(*keys)
         except Exception as e:
@@ -166,6 +412,15 @@ class CacheService:
             logger.error(f"Redis TTL 操作失败: {key} - {e}")
             return -1
     
+    @asynccontextmanager
+    async def pipeline(self, transaction: bool = True) -> AsyncIterator[Any]:
+        """获取Redis管道，批量提交多条命令以减少往返次数"""
+        if not self._connected:
+            await self.initialize()
+        
+        async with self.redis.pipeline(transaction=transaction) as pipe:
+            yield pipe
+    
     # ===================
     # 哈希操作
     # ===================
@@ -175,21 +430,26 @@ class CacheService:
         if not self._connected:
             await self.initialize()
             
+        self._forget_file_metadata_key(name)
+        
         try:
-            # 序列化值
-            serialized_mapping = {}
-            for k, v in mapping.items():
-                if isinstance(v, (dict, list)):
-                    serialized_mapping[k] = json.dumps(v, ensure_ascii=False)
-                else:
-                    serialized_mapping[k] = str(v)
-                    
-            return await self.redis.hset(name, mapping=serialized_mapping)
+            return await self.redis.hset(name, mapping=self._serialize_mapping(mapping))
             
         except Exception as e:
             logger.error(f"Redis HSET 操作失败: {name} - {e}")
             return 0
     
+    @staticmethod
+    def _serialize_mapping(mapping: Dict[str, Any]) -> Dict[str, str]:
+        """序列化哈希字段值：dict/list转JSON，其余转字符串"""
+        serialized_mapping = {}
+        for k, v in mapping.items():
+            if isinstance(v, (dict, list)):
+                serialized_mapping[k] = json.dumps(v, ensure_ascii=False)
+            else:
+                serialized_mapping[k] = str(v)
+        return serialized_mapping
+    
     async def hget(self, name: str, key: str) -> Optional[str]:
         """获取哈希字段值"""
         if not self._connected:
@@ -212,11 +472,31 @@ class CacheService:
             logger.error(f"Redis HGETALL 操作失败: {name} - {e}")
             return {}
     
+    async def hgetall_many(self, names: List[str]) -> List[Dict[str, str]]:
+        """批量获取多个哈希的所有字段 - 一次管道往返，结果与names一一对应"""
+        if not names:
+            return []
+        if not self._connected:
+            await self.initialize()
+            
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for name in names:
+                pipe.hgetall(name)
+            results = await pipe.execute(raise_on_error=False)
+        except Exception as e:
+            logger.error(f"Redis 批量HGETALL 操作失败: {e}")
+            return [{} for _ in names]
+        
+        return [{} if isinstance(result, Exception) else result for result in results]
+    
     async def hdel(self, name: str, *keys: str) -> int:
         """删除哈希字段"""
         if not self._connected:
             await self.initialize()
             
+        self._forget_file_metadata_key(name)
+        
         try:
             return await self.redis.hdel(name, *keys)
         except Exception as e:
@@ -237,11 +517,24 @@ class CacheService:
     async def hset_field(self, name: str, key: str, value: Any) -> int:
         if not self._connected:
             await self.initialize()
+        self._forget_file_metadata_key(name)
         try:
             if isinstance(value, (dict, list)):
                 value = json.dumps(value, ensure_ascii=False)
             else:
                 value = str(value)
+            
+            if key in _FILE_COUNTER_FIELDS and name.startswith("file:"):
+                # 文件状态字段变更时同步调整统计计数器：WATCH后读取原值，并发改写时事务重试
+                async def _write(pipe: Any):
+                    previous = await pipe.hget(name, key)
+                    pipe.multi()
+                    pipe.hset(name, key, value)
+                    self._count_file_changes(pipe, {key: previous}, {key: value})
+                
+                results = await self.redis.transaction(_write, name)
+                return results[0]
+            
             return await self.redis.hset(name, key, value)
         except Exception as e:
             logger.error(f"Redis hset_field 操作失败: {name} - {e}")
@@ -360,7 +653,11 @@ class CacheService:
         if not task_data:
             return None
             
-        # 解析JSON字段
+        return self._decode_task_data(task_data)
+    
+    @staticmethod
+    def _decode_task_data(task_data: Dict[str, Any]) -> Dict[str, Any]:
+        """解析任务哈希中的JSON字段"""
         for key, value in task_data.items():
             if key in ["metadata", "result", "error_details"]:
                 try:
@@ -382,36 +679,624 @@ class CacheService:
         
         return await self.hset(task_key, update_data) > 0
     
-    async def save_file_metadata(self, file_id: str, metadata: Dict[str, Any], expire: int = 2592000) -> bool:
-        """保存文件元数据 (默认30天过期)"""
+    async def save_file_metadata(
+        self,
+        file_id: str,
+        metadata: Dict[str, Any],
+        expire: int = 2592000,
+        delete_keys: Optional[List[str]] = None
+    ) -> bool:
+        """保存文件元数据 (默认30天过期)
+        
+        只写入metadata中给出的字段，其余字段保持不变，状态变更时只需传入变化的字段。
+        HSET、EXPIRE以及需要随之失效的delete_keys在同一个MULTI/EXEC中提交；需要原值时先WATCH再读取，
+        并发改写导致事务失败时自动重试。体积较大的parse_result单独存放在parse_result:{file_id}，不随每次HGETALL读取。
+        """
         file_key = f"file:{file_id}"
+        parse_result_key = self._parse_result_key(file_id)
         
+        self._forget_file_metadata(file_id)
         metadata["updated_at"] = datetime.now().isoformat()
+        hash_fields = {k: v for k, v in metadata.items() if k != "parse_result"}
         
-        result = await self.hset(file_key, metadata)
-        if result and expire > 0:
-            await self.expire(file_key, expire)
+        # 列表索引：新文件带upload_date直接入索引；状态变更时需要原状态和上传时间来移动状态索引
+        index_status = metadata.get("status")
+        index_score = self._upload_timestamp(metadata.get("upload_date"))
+        # 统计计数器：需要知道文件是否新建以及计数字段的原值
+        counted_fields = [field for field in _FILE_COUNTER_FIELDS if field in metadata]
+        # 知识库计数器：需要知道文件所属知识库以及状态字段的原值
+        kb_fields = [field for field in _KB_STATUS_FIELDS if field in metadata]
+        previous_fields = list(dict.fromkeys([*counted_fields, *kb_fields]))
+        if kb_fields:
+            previous_fields.append("kb_id")
+        
+        async def _write(pipe: Any):
+            # WATCH file:{id}之后读取原值，其他客户端在EXEC前改写该文件时事务失败并整体重试，
+            # 保证计数器增量基于写入时的真实原值
+            file_existed = True
+            previous_status = None
+            previous_values: Dict[str, Optional[str]] = {}
+            score = index_score
+            if index_status is not None or previous_fields:
+                file_existed = await pipe.exists(file_key)
+                previous_row = await pipe.hmget(file_key, ["status", *previous_fields])
+                previous_status = previous_row[0]
+                previous_values = dict(zip(previous_fields, previous_row[1:]))
+                if score is None:
+                    score = await pipe.zscore(_FILE_DATE_INDEX, file_id)
             
-        return result > 0
+            pipe.multi()
+            pipe.hset(file_key, mapping=self._serialize_mapping(hash_fields))
+            if "parse_result" in metadata:
+                # 清理旧版本写在哈希中的parse_result字段
+                pipe.hdel(file_key, "parse_result")
+                pipe.set(
+                    parse_result_key,
+                    json.dumps(metadata["parse_result"], ensure_ascii=False),
+                    ex=expire if expire > 0 else None
+                )
+            if expire > 0:
+                pipe.expire(file_key, expire)
+                pipe.expire(parse_result_key, expire)
+            if delete_keys:
+                pipe.delete(*delete_keys)
+            if score is not None:
+                if "upload_date" in metadata:
+                    pipe.zadd(_FILE_DATE_INDEX, {file_id: score})
+                if index_status is not None:
+                    if previous_status and previous_status != index_status:
+                        pipe.zrem(_FILE_STATUS_INDEX.format(previous_status), file_id)
+                    pipe.zadd(_FILE_STATUS_INDEX.format(index_status), {file_id: score})
+            if not file_existed:
+                pipe.incr(_FILE_TOTAL_KEY)
+                if metadata.get("file_size"):
+                    pipe.incr(_FILE_SIZED_KEY)
+                    pipe.incrby(_FILE_SIZE_KEY, int(metadata["file_size"]))
+            self._count_file_changes(pipe, previous_values, metadata)
+            if previous_values.get("kb_id"):
+                await self._count_kb_file_changes(pipe, previous_values, metadata)
+        
+        try:
+            if not self._connected:
+                await self.initialize()
+            results = await self.redis.transaction(_write, file_key)
+        except Exception as e:
+            logger.error(f"保存文件元数据失败: {file_key} - {e}")
+            return False
+            
+        return results[0] > 0
     
-    async def get_file_metadata(self, file_id: str) -> Optional[Dict[str, Any]]:
-        """获取文件元数据"""
-        file_key = f"file:{file_id}"
-        metadata = await self.hgetall(file_key)
+    @staticmethod
+    def _count_file_changes(pipe: Any, previous: Dict[str, Optional[str]], updates: Dict[str, Any]):
+        """把计数字段从原值到新值的变化加入管道"""
+        for field in _FILE_COUNTER_FIELDS:
+            if field not in updates:
+                continue
+            old_value = previous.get(field)
+            new_value = str(updates[field])
+            if old_value == new_value:
+                continue
+            if old_value in _FILE_COUNTER_VALUES:
+                pipe.decr(_FILE_COUNTER_KEY.format(field, old_value))
+            if new_value in _FILE_COUNTER_VALUES:
+                pipe.incr(_FILE_COUNTER_KEY.format(field, new_value))
+    
+    async def _count_kb_file_changes(self, pipe: Any, previous: Dict[str, Optional[str]], updates: Dict[str, Any]):
+        """把文件状态变化加入所属知识库的计数器
         
-        if not metadata:
+        增量通过Lua脚本在服务端应用：计数器已过期（缺少file_count）时整体跳过，等待下次读取时全量重建。
+        """
+        increments: Dict[str, int] = {}
+        for field in _KB_STATUS_FIELDS:
+            if field not in updates:
+                continue
+            old_value = previous.get(field) or "pending"
+            new_value = str(updates[field])
+            if old_value == new_value:
+                continue
+            increments[f"{field}:{old_value}"] = increments.get(f"{field}:{old_value}", 0) - 1
+            increments[f"{field}:{new_value}"] = increments.get(f"{field}:{new_value}", 0) + 1
+            if old_value == "completed":
+                increments[_KB_COMPLETED_FIELDS[field]] = increments.get(_KB_COMPLETED_FIELDS[field], 0) - 1
+            if new_value == "completed":
+                increments[_KB_COMPLETED_FIELDS[field]] = increments.get(_KB_COMPLETED_FIELDS[field], 0) + 1
+        last_indexed = ""
+        if updates.get("vector_status") == "completed" and updates.get("vectorized_at"):
+            last_indexed = str(updates["vectorized_at"])
+        if not increments and not last_indexed:
+            return
+        
+        args: List[Any] = [_KB_COUNTERS_TTL, last_indexed]
+        for field, delta in increments.items():
+            args.extend([field, delta])
+        # 管道中调用脚本只是排入EVALSHA，执行前由管道负责SCRIPT LOAD
+        await self._kb_count_status_script(
+            keys=[_KB_COUNTERS_KEY.format(previous["kb_id"])],
+            args=args,
+            client=pipe
+        )
+    
+    async def remove_file_counters(self, metadata: Dict[str, Any]):
+        """删除文件时从统计计数器中扣除"""
+        if not self._connected:
+            await self.initialize()
+        
+        async with self.pipeline() as pipe:
+            pipe.decr(_FILE_TOTAL_KEY)
+            if metadata.get("file_size"):
+                pipe.decr(_FILE_SIZED_KEY)
+                pipe.decrby(_FILE_SIZE_KEY, int(metadata["file_size"]))
+            for field in _FILE_COUNTER_FIELDS:
+                if metadata.get(field) in _FILE_COUNTER_VALUES:
+                    pipe.decr(_FILE_COUNTER_KEY.format(field, metadata[field]))
+            await pipe.execute()
+    
+    async def get_file_counters(self) -> Optional[Dict[str, int]]:
+        """一次MGET读取文件统计计数器，结构与aggregate_file_statistics一致；未校准时返回None"""
+        if not self._connected:
+            await self.initialize()
+        
+        counter_keys = [
+            (field, value) for field in _FILE_COUNTER_FIELDS for value in _FILE_COUNTER_VALUES
+        ]
+        values = await self.redis.mget([
+            _FILE_COUNTERS_READY, _FILE_TOTAL_KEY, _FILE_SIZED_KEY, _FILE_SIZE_KEY,
+            *[_FILE_COUNTER_KEY.format(field, value) for field, value in counter_keys]
+        ])
+        if not values[0]:
             return None
-            
-        # 解析JSON字段
+        
+        # 计数器可能因并发写入短暂偏差，不返回负数
+        total_files, sized_files, total_size, *field_values = [max(int(v or 0), 0) for v in values[1:]]
+        counts = dict(zip(counter_keys, field_values))
+        return {
+            "total_files": total_files,
+            "parsed_files": counts[("parse_status", "completed")],
+            "vectorized_files": counts[("vectorize_status", "completed")],
+            "processing_files": counts[("parse_status", "running")] + counts[("vectorize_status", "running")],
+            "failed_files": counts[("parse_status", "failed")] + counts[("vectorize_status", "failed")],
+            "sized_files": sized_files,
+            "total_size": total_size
+        }
+    
+    @staticmethod
+    def _upload_timestamp(upload_date: Optional[str]) -> Optional[float]:
+        """上传时间（ISO格式）转为列表索引的分值"""
+        if not upload_date:
+            return None
+        try:
+            return datetime.fromisoformat(upload_date).timestamp()
+        except (TypeError, ValueError):
+            return None
+    
+    async def list_file_ids(self, offset: int, limit: int, status: Optional[str] = None) -> Optional[List[str]]:
+        """按上传时间倒序分页读取文件ID，可按状态过滤；索引尚未建立时返回None"""
+        if not self._connected:
+            await self.initialize()
+        
+        index_key = _FILE_STATUS_INDEX.format(status) if status else _FILE_DATE_INDEX
+        async with self.pipeline(transaction=False) as pipe:
+            pipe.exists(_FILE_INDEX_READY)
+            pipe.zrevrange(index_key, offset, offset + limit - 1)
+            index_ready, file_ids = await pipe.execute()
+        
+        return file_ids if index_ready else None
+    
+    async def index_files(self, files: Dict[str, Dict[str, Any]]):
+        """用已有文件元数据回填列表索引，完成后标记索引可用
+        
+        files为file_id到元数据的映射，只在索引首次建立时全量调用一次。
+        """
+        if not self._connected:
+            await self.initialize()
+        
+        async with self.pipeline(transaction=False) as pipe:
+            for file_id, metadata in files.items():
+                score = self._upload_timestamp(metadata.get("upload_date"))
+                if score is None:
+                    continue
+                pipe.zadd(_FILE_DATE_INDEX, {file_id: score})
+                if metadata.get("status"):
+                    pipe.zadd(_FILE_STATUS_INDEX.format(metadata["status"]), {file_id: score})
+            pipe.set(_FILE_INDEX_READY, datetime.now().isoformat())
+            await pipe.execute()
+        
+        logger.info(f"文件列表索引已建立: {len(files)}个文件")
+    
+    async def remove_from_file_index(self, file_ids: List[str], status: Optional[str] = None):
+        """从列表索引中移除文件（删除文件或元数据已过期时调用）"""
+        if not file_ids:
+            return
+        if not self._connected:
+            await self.initialize()
+        
+        async with self.pipeline(transaction=False) as pipe:
+            pipe.zrem(_FILE_DATE_INDEX, *file_ids)
+            if status:
+                pipe.zrem(_FILE_STATUS_INDEX.format(status), *file_ids)
+            await pipe.execute()
+    
+    async def get_file_metadata(self, file_id: str, include_parse_result: bool = True) -> Optional[Dict[str, Any]]:
+        """获取文件元数据，include_parse_result=False时不读取parse_result
+        
+        结果在进程内缓存几秒，经本服务写入该文件元数据时立即失效；命中时核对易变字段，
+        其他进程改写过状态则重新读取。返回深拷贝，调用方修改嵌套结构不会影响缓存。
+        """
+        cache_key = (file_id, include_parse_result)
+        cached = self._file_metadata_cache.get(cache_key)
+        if cached and cached[0] > time.monotonic():
+            try:
+                current_version = tuple(
+                    await self.redis.hmget(f"file:{file_id}", _FILE_METADATA_VERSION_FIELDS)
+                )
+            except Exception as e:
+                logger.warning(f"核对文件元数据缓存失败: {file_id} - {e}")
+                current_version = None
+            if current_version == cached[1]:
+                self._file_metadata_cache.move_to_end(cache_key)
+                return copy.deepcopy(cached[2])
+            self._file_metadata_cache.pop(cache_key, None)
+        
+        results = await self.get_file_metadata_many([file_id], include_parse_result)
+        metadata = results[0]
+        if metadata is not None:
+            version = tuple(metadata.get(field) for field in _FILE_METADATA_VERSION_FIELDS)
+            self._file_metadata_cache[cache_key] = (
+                time.monotonic() + _FILE_METADATA_CACHE_TTL, version, metadata
+            )
+            self._file_metadata_cache.move_to_end(cache_key)
+            while len(self._file_metadata_cache) > _FILE_METADATA_CACHE_SIZE:
+                self._file_metadata_cache.popitem(last=False)
+            return copy.deepcopy(metadata)
+        return None
+    
+    def _forget_file_metadata(self, file_id: str):
+        """使某个文件的进程内元数据缓存失效"""
+        self._file_metadata_cache.pop((file_id, True), None)
+        self._file_metadata_cache.pop((file_id, False), None)
+    
+    def _forget_file_metadata_key(self, key: str):
+        """写入file:{id}或parse_result:{id}键时使对应缓存失效"""
+        prefix, _, file_id = key.partition(":")
+        if prefix in ("file", "parse_result") and file_id:
+            self._forget_file_metadata(file_id)
+    
+    async def get_file_metadata_many(
+        self,
+        file_ids: List[str],
+        include_parse_result: bool = True
+    ) -> List[Optional[Dict[str, Any]]]:
+        """批量获取文件元数据 - 一次管道HGETALL，结果与file_ids一一对应"""
+        if not file_ids:
+            return []
+        if not self._connected:
+            await self.initialize()
+        
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for file_id in file_ids:
+                pipe.hgetall(f"file:{file_id}")
+                if include_parse_result:
+                    pipe.get(self._parse_result_key(file_id))
+            results = await pipe.execute(raise_on_error=False)
+        except Exception as e:
+            logger.error(f"批量获取文件元数据失败: {e}")
+            return [None] * len(file_ids)
+        
+        step = 2 if include_parse_result else 1
+        metadata_list = []
+        for i in range(0, len(results), step):
+            metadata = results[i]
+            if not metadata or isinstance(metadata, Exception):
+                metadata_list.append(None)
+                continue
+            if include_parse_result and results[i + 1] and not isinstance(results[i + 1], Exception):
+                metadata["parse_result"] = results[i + 1]
+            metadata_list.append(self._decode_file_metadata(metadata))
+        
+        return metadata_list
+    
+    async def link_file_to_knowledge_base(self, file_id: str, kb_id: str, kb_name: str) -> int:
+        """关联文件与知识库 - 服务端Lua脚本一次往返完成：写入kb_id/kb_name、加入kb_files:{kb_id}、增加知识库计数器
+        
+        返回 -1 文件不存在，0 文件已在知识库中，1 新加入。
+        """
+        if not self._connected:
+            await self.initialize()
+        
+        self._forget_file_metadata(file_id)
+        return await self._kb_link_file_script(
+            keys=[f"file:{file_id}", f"kb_files:{kb_id}", _KB_COUNTERS_KEY.format(kb_id)],
+            args=[kb_id, kb_name, file_id, 1, _KB_COUNTERS_TTL]
+        )
+    
+    async def unlink_file_from_knowledge_base(self, file_id: str, kb_id: str) -> int:
+        """解除文件与知识库的关联 - 服务端Lua脚本一次往返完成：删除kb_id/kb_name字段、移出kb_files:{kb_id}、减少知识库计数器
+        
+        返回 0 文件不在知识库中，1 已移出。
+        """
+        if not self._connected:
+            await self.initialize()
+        
+        self._forget_file_metadata(file_id)
+        return await self._kb_unlink_file_script(
+            keys=[f"file:{file_id}", f"kb_files:{kb_id}", _KB_COUNTERS_KEY.format(kb_id)],
+            args=[kb_id, "", file_id, -1, _KB_COUNTERS_TTL]
+        )
+    
+    async def get_knowledge_bases(self, kb_ids: List[str]) -> List[Tuple[Optional[str], Dict[str, str]]]:
+        """批量读取知识库元数据（原始JSON，由调用方直接解析为模型）及其计数器哈希 - 一次管道往返，结果与kb_ids一一对应
+        
+        元数据不存在时为None；计数器尚未建立或已过期时没有file_count字段。
+        """
+        if not kb_ids:
+            return []
+        if not self._connected:
+            await self.initialize()
+        
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for kb_id in kb_ids:
+                pipe.get(f"knowledge_base:{kb_id}")
+                pipe.hgetall(_KB_COUNTERS_KEY.format(kb_id))
+            results = await pipe.execute(raise_on_error=False)
+        except Exception as e:
+            logger.error(f"批量获取知识库失败: {e}")
+            return [(None, {}) for _ in kb_ids]
+        
+        knowledge_bases = []
+        for i in range(0, len(results), 2):
+            raw, counters = results[i], results[i + 1]
+            if not raw or isinstance(raw, Exception):
+                raw = None
+            if not counters or isinstance(counters, Exception):
+                counters = {}
+            knowledge_bases.append((raw, counters))
+        
+        return knowledge_bases
+    
+    async def save_knowledge_base(
+        self,
+        kb_id: str,
+        document: str,
+        created_at: float,
+        status: Optional[str],
+        counters: Optional[Dict[str, Any]] = None,
+        previous_status: Optional[str] = None
+    ):
+        """保存知识库元数据（已序列化的JSON）并更新列表索引 - 一次MULTI往返
+        
+        created_at（时间戳）和status用于列表索引；状态变更时传入previous_status，把知识库从原状态索引中移出。
+        传入counters时同时覆盖写入计数器（创建知识库和全量统计重建时），计数器过期后由下次读取重新统计。
+        """
+        if not self._connected:
+            await self.initialize()
+        
+        async with self.pipeline() as pipe:
+            pipe.set(f"knowledge_base:{kb_id}", document)
+            pipe.zadd(_KB_DATE_INDEX, {kb_id: created_at})
+            if previous_status and previous_status != status:
+                pipe.zrem(_KB_STATUS_INDEX.format(previous_status), kb_id)
+            if status:
+                pipe.zadd(_KB_STATUS_INDEX.format(status), {kb_id: created_at})
+            if counters is not None:
+                counters_key = _KB_COUNTERS_KEY.format(kb_id)
+                pipe.delete(counters_key)
+                pipe.hset(counters_key, mapping=self._serialize_mapping(counters))
+                pipe.expire(counters_key, _KB_COUNTERS_TTL)
+            await pipe.execute()
+    
+    async def replace_knowledge_base_counters(self, kb_id: str, counters: Dict[str, Any]) -> bool:
+        """全量统计后覆盖写入知识库计数器，不改动知识库元数据和列表索引
+        
+        知识库已被删除时不写入并返回False。
+        """
+        if not self._connected:
+            await self.initialize()
+        
+        args: List[Any] = [_KB_COUNTERS_TTL]
+        for field, value in self._serialize_mapping(counters).items():
+            args.extend([field, value])
+        replaced = await self._kb_replace_counters_script(
+            keys=[f"knowledge_base:{kb_id}", _KB_COUNTERS_KEY.format(kb_id)],
+            args=args
+        )
+        return bool(replaced)
+    
+    async def remove_knowledge_base(self, kb_id: str, status: Optional[str] = None):
+        """删除知识库元数据、文件集合、计数器并移出列表索引 - 一次MULTI往返"""
+        if not self._connected:
+            await self.initialize()
+        
+        async with self.pipeline() as pipe:
+            pipe.delete(f"knowledge_base:{kb_id}", f"kb_files:{kb_id}", _KB_COUNTERS_KEY.format(kb_id))
+            pipe.zrem(_KB_DATE_INDEX, kb_id)
+            if status:
+                pipe.zrem(_KB_STATUS_INDEX.format(status), kb_id)
+            pipe.srem(_KB_LEGACY_SET, kb_id)
+            await pipe.execute()
+    
+    async def list_knowledge_base_ids(
+        self,
+        offset: int,
+        limit: int,
+        status: Optional[str] = None
+    ) -> Optional[Tuple[List[str], int]]:
+        """按创建时间倒序分页读取知识库ID及总数，可按状态过滤；索引尚未建立时返回None"""
+        if not self._connected:
+            await self.initialize()
+        
+        index_key = _KB_STATUS_INDEX.format(status) if status else _KB_DATE_INDEX
+        async with self.pipeline(transaction=False) as pipe:
+            pipe.exists(_KB_INDEX_READY)
+            pipe.zrevrange(index_key, offset, offset + limit - 1)
+            pipe.zcard(index_key)
+            index_ready, kb_ids, total = await pipe.execute()
+        
+        return (kb_ids, total) if index_ready else None
+    
+    async def index_knowledge_bases(self):
+        """用早期knowledge_bases集合中的知识库回填列表索引，完成后标记索引可用，只在首次使用时调用一次"""
+        if not self._connected:
+            await self.initialize()
+        
+        kb_ids = list(await self.redis.smembers(_KB_LEGACY_SET))
+        knowledge_bases = await self.get_knowledge_bases(kb_ids)
+        
+        async with self.pipeline(transaction=False) as pipe:
+            for kb_id, (raw, _) in zip(kb_ids, knowledge_bases):
+                try:
+                    kb_data = json.loads(raw) if raw else None
+                except json.JSONDecodeError:
+                    kb_data = None
+                if not isinstance(kb_data, dict):
+                    logger.warning(f"无法解析知识库数据，跳过索引: {kb_id}")
+                    continue
+                score = self._kb_timestamp(kb_data.get("created_at"))
+                pipe.zadd(_KB_DATE_INDEX, {kb_id: score})
+                status = self._kb_status(kb_data.get("status"))
+                if status:
+                    pipe.zadd(_KB_STATUS_INDEX.format(status), {kb_id: score})
+            pipe.set(_KB_INDEX_READY, datetime.now().isoformat())
+            await pipe.execute()
+        
+        logger.info(f"知识库列表索引已建立: {len(kb_ids)}个知识库")
+    
+    @staticmethod
+    def _kb_timestamp(created_at: Any) -> float:
+        """知识库创建时间（datetime或ISO字符串）转为列表索引的分值，无法解析时取当前时间"""
+        if isinstance(created_at, datetime):
+            return created_at.timestamp()
+        try:
+            return datetime.fromisoformat(created_at).timestamp()
+        except (TypeError, ValueError):
+            return time.time()
+    
+    @staticmethod
+    def _kb_status(status: Any) -> Optional[str]:
+        """知识库状态（枚举或字符串）转为索引键中使用的值"""
+        return getattr(status, "value", status) or None
+    
+    @staticmethod
+    def _parse_result_key(file_id: str) -> str:
+        """文件解析结果的存储键"""
+        return f"parse_result:{file_id}"
+    
+    @staticmethod
+    def _decode_file_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """解析文件元数据中的JSON字段"""
         for key, value in metadata.items():
             if key in ["tags", "custom_fields", "parse_result"]:
                 try:
                     metadata[key] = json.loads(value) if value else None
                 except json.JSONDecodeError:
                     pass
+        
+        parse_result = metadata.get("parse_result")
+        if isinstance(parse_result, dict):
+            parse_result["content_blocks"] = CacheService._content_block_rows(parse_result.get("content_blocks"))
                     
         return metadata
     
+    @staticmethod
+    def _content_block_rows(content_blocks: Any) -> Any:
+        """parse_result.content_blocks按列存储（types/minio_paths/filenames/sizes），读取时还原为按行的块列表
+        
+        对外返回的结构与按行存储时一致；旧数据本身就是列表，原样返回。
+        """
+        if not isinstance(content_blocks, dict):
+            return content_blocks
+        return [
+            {"type": block_type, "minio_path": minio_path, "local_filename": filename, "size": size}
+            for block_type, minio_path, filename, size in zip(
+                content_blocks.get("types", []),
+                content_blocks.get("minio_paths", []),
+                content_blocks.get("filenames", []),
+                content_blocks.get("sizes", [])
+            )
+        ]
+    
+    async def iter_file_fields(self, fields: List[str], batch_size: int = 500) -> AsyncIterator[Dict[str, Optional[str]]]:
+        """分批遍历所有文件元数据，只读取指定字段（SCAN + 管道HMGET），逐条产出而不保留完整列表"""
+        if not self._connected:
+            await self.initialize()
+        
+        cursor = 0
+        while True:
+            cursor, keys = await self.redis.scan(cursor, match="file:*", count=batch_size)
+            if keys:
+                pipe = self.redis.pipeline(transaction=False)
+                for key in keys:
+                    pipe.hmget(key, *fields)
+                rows = await pipe.execute(raise_on_error=False)
+                
+                for row in rows:
+                    # 跳过非哈希类型的键和已被删除的文件
+                    if isinstance(row, Exception) or not any(row):
+                        continue
+                    yield dict(zip(fields, row))
+            
+            if cursor == 0:
+                break
+    
+    async def aggregate_file_statistics(self, batch_size: int = 500) -> Dict[str, int]:
+        """汇总所有文件的处理状态和大小 - 只读取统计所需字段
+        
+        全量扫描的结果同时用于校准统计计数器，之后一小时内由get_file_counters直接读取。
+        """
+        stats = {
+            "total_files": 0,
+            "parsed_files": 0,
+            "vectorized_files": 0,
+            "processing_files": 0,
+            "failed_files": 0,
+            "sized_files": 0,
+            "total_size": 0
+        }
+        field_counts = {
+            (field, value): 0 for field in _FILE_COUNTER_FIELDS for value in _FILE_COUNTER_VALUES
+        }
+        
+        try:
+            async for row in self.iter_file_fields(["parse_status", "vectorize_status", "file_size"], batch_size):
+                parse_status = row["parse_status"] or "pending"
+                vectorize_status = row["vectorize_status"] or "pending"
+                
+                stats["total_files"] += 1
+                for field, value in (("parse_status", parse_status), ("vectorize_status", vectorize_status)):
+                    if value in _FILE_COUNTER_VALUES:
+                        field_counts[(field, value)] += 1
+                if parse_status == "completed":
+                    stats["parsed_files"] += 1
+                if vectorize_status == "completed":
+                    stats["vectorized_files"] += 1
+                if parse_status == "running" or vectorize_status == "running":
+                    stats["processing_files"] += 1
+                if parse_status == "failed" or vectorize_status == "failed":
+                    stats["failed_files"] += 1
+                
+                if row["file_size"]:
+                    try:
+                        stats["total_size"] += int(row["file_size"])
+                        stats["sized_files"] += 1
+                    except ValueError:
+                        pass
+            
+            async with self.pipeline() as pipe:
+                pipe.set(_FILE_TOTAL_KEY, stats["total_files"])
+                pipe.set(_FILE_SIZED_KEY, stats["sized_files"])
+                pipe.set(_FILE_SIZE_KEY, stats["total_size"])
+                for (field, value), count in field_counts.items():
+                    pipe.set(_FILE_COUNTER_KEY.format(field, value), count)
+                pipe.set(_FILE_COUNTERS_READY, datetime.now().isoformat(), ex=_FILE_COUNTERS_TTL)
+                await pipe.execute()
+            
+            return stats
+            
+        except Exception as e:
+            logger.error(f"汇总文件统计失败: {e}")
+            return stats
+    
     async def add_task_to_queue(self, queue_name: str, task_id: str) -> bool:
         """添加任务到队列"""
         queue_key = f"queue:{queue_name}"
@@ -457,21 +1342,12 @@ class CacheService:
     
     async def add_priority_task(self, queue_name: str, task_data: Dict[str, Any], priority: int = 0) -> bool:
         """添加优先级任务到队列 - 参考mineru-web的任务调度"""
-        try:
-            # 使用有序集合实现优先级队列
-            priority_queue = f"{queue_name}:priority"
-            task_json = json.dumps(task_data, ensure_ascii=False)
-            
-            # 优先级越高，分数越小（先处理）
-            score = -priority  
-            await self.redis.zadd(priority_queue, {task_json: score})
-            
-            logger.info(f"添加优先级任务: {queue_name} - 优先级{priority}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"添加优先级任务失败: {queue_name} - {e}")
-            return False
+        return await self.add_to_queue(queue_name, task_data, priority)
+    
+    @staticmethod
+    def _queue_score(priority: int) -> float:
+        """任务队列分数：优先级越高分数越小，同优先级按入队时间先后（ZPOPMIN取最小）"""
+        return -priority * _QUEUE_PRIORITY_WEIGHT + time.time()
     
     async def get_priority_task(self, queue_name: str) -> Optional[Dict[str, Any]]:
         """获取最高优先级任务"""
@@ -492,34 +1368,55 @@ class CacheService:
     
     async def get_queue_stats(self, queue_name: str) -> Dict[str, int]:
         """获取队列统计信息 - 类似mineru-web的任务监控"""
+        stats = await self.get_queue_stats_multi([queue_name])
+        return stats[queue_name]
+    
+    async def get_queue_stats_multi(self, queue_names: List[str]) -> Dict[str, Dict[str, int]]:
+        """批量获取多个队列的统计信息 - 队列长度通过一次管道获取，任务状态只扫描一次"""
+        if not self._connected:
+            await self.initialize()
+        
         try:
-            regular_queue = f"queue:{queue_name}"
-            priority_queue = f"{queue_name}:priority"
+            pipe = self.redis.pipeline(transaction=False)
+            for queue_name in queue_names:
+                # 旧版本写入普通列表的任务仍计入待处理数
+                pipe.llen(queue_name)
+                pipe.zcard(f"{queue_name}:priority")
+                # 优先级大于0的任务分数为负
+                pipe.zcount(f"{queue_name}:priority", "-inf", "(0")
+            lengths = await pipe.execute()
             
-            stats = {
-                "pending_tasks": await self.llen(regular_queue),
-                "priority_tasks": await self.redis.zcard(priority_queue),
+            # 统计不同状态的任务（任务状态键不区分队列，各队列共用同一次扫描结果）
+            task_counts = {
                 "running_tasks": 0,
                 "completed_tasks": 0,
                 "failed_tasks": 0
             }
-            
-            # 统计不同状态的任务
             pattern = f"task:*:status"
             async for key in self.redis.scan_iter(match=pattern):
                 status = await self.redis.get(key)
                 if status == "running":
-                    stats["running_tasks"] += 1
+                    task_counts["running_tasks"] += 1
                 elif status == "completed":
-                    stats["completed_tasks"] += 1
+                    task_counts["completed_tasks"] += 1
                 elif status == "failed":
-                    stats["failed_tasks"] += 1
+                    task_counts["failed_tasks"] += 1
             
-            return stats
+            return {
+                queue_name: {
+                    "pending_tasks": lengths[3 * i] + lengths[3 * i + 1],
+                    "priority_tasks": lengths[3 * i + 2],
+                    **task_counts
+                }
+                for i, queue_name in enumerate(queue_names)
+            }
             
         except Exception as e:
-            logger.error(f"获取队列统计失败: {queue_name} - {e}")
-            return {"pending_tasks": 0, "priority_tasks": 0, "running_tasks": 0, "completed_tasks": 0, "failed_tasks": 0}
+            logger.error(f"获取队列统计失败: {queue_names} - {e}")
+            return {
+                queue_name: {"pending_tasks": 0, "priority_tasks": 0, "running_tasks": 0, "completed_tasks": 0, "failed_tasks": 0}
+                for queue_name in queue_names
+            }
     
     async def batch_update_tasks(self, task_updates: List[Dict[str, Any]]) -> int:
         """批量更新任务状态 - 提高性能"""
@@ -627,17 +1524,295 @@ class CacheService:
             logger.error(f"Redis set_task_info 操作失败: {task_id} - {e}")
             return False
     
-    async def add_to_queue(self, queue_name: str, task_data: dict) -> bool:
-        """将任务数据推入Redis队列（RPUSH）"""
+    async def set_task_and_enqueue(
+        self,
+        task_id: str,
+        task_data: Dict[str, Any],
+        queue_name: str,
+        priority: int = 0,
+        file_id: Optional[str] = None,
+        file_fields: Optional[Dict[str, Any]] = None,
+        delete_keys: Optional[List[str]] = None,
+        expire: int = 86400
+    ) -> bool:
+        """创建任务并入队 - 任务信息、队列、文件字段和缓存失效在同一个MULTI/EXEC中提交
+        
+        任务写入{queue_name}:priority有序集合，按优先级和入队时间排序。
+        """
+        if not self._connected:
+            await self.initialize()
+        
+        file_key = f"file:{file_id}" if file_id else None
+        counted_fields = [field for field in _FILE_COUNTER_FIELDS if file_fields and field in file_fields]
+        
+        task_json = json.dumps(task_data, ensure_ascii=False)
+        
+        async def _write(pipe: Any):
+            # 计数字段的原值在WATCH之后读取，并发改写文件时事务重试
+            previous_values: Dict[str, Optional[str]] = {}
+            if counted_fields:
+                previous_values = dict(zip(counted_fields, await pipe.hmget(file_key, counted_fields)))
+            
+            pipe.multi()
+            pipe.hset(f"task:{task_id}", mapping=self._serialize_mapping(task_data))
+            pipe.expire(f"task:{task_id}", expire)
+            pipe.zadd(f"{queue_name}:priority", {task_json: self._queue_score(priority)})
+            if file_key and file_fields:
+                pipe.hset(file_key, mapping=self._serialize_mapping(file_fields))
+                self._count_file_changes(pipe, previous_values, file_fields)
+            if delete_keys:
+                pipe.delete(*delete_keys)
+        
+        try:
+            if counted_fields:
+                await self.redis.transaction(_write, file_key)
+            else:
+                async with self.pipeline() as pipe:
+                    await _write(pipe)
+                    await pipe.execute()
+        except Exception as e:
+            logger.error(f"创建任务失败: {task_id} - {e}")
+            return False
+        finally:
+            if file_id:
+                self._forget_file_metadata(file_id)
+        
+        return True
+    
+    async def get_task_info(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """获取任务信息（task:{task_id}），与set_task_info对应"""
+        return await self.get_task(task_id)
+    
+    async def get_task_info_many(self, task_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """批量获取任务信息 - 一次管道HGETALL，不存在的任务不出现在结果中"""
+        if not task_ids:
+            return {}
+        if not self._connected:
+            await self.initialize()
+        
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for task_id in task_ids:
+                pipe.hgetall(f"task:{task_id}")
+            results = await pipe.execute(raise_on_error=False)
+        except Exception as e:
+            logger.error(f"批量获取任务信息失败: {e}")
+            return {}
+        
+        return {
+            task_id: self._decode_task_data(task_data)
+            for task_id, task_data in zip(task_ids, results)
+            if task_data and not isinstance(task_data, Exception)
+        }
+    
+    async def add_to_queue(self, queue_name: str, task_data: dict, priority: int = 0) -> bool:
+        """将任务数据加入队列（ZADD {queue_name}:priority），按优先级和入队时间出队"""
         if not self._connected:
             await self.initialize()
         try:
-            await self.redis.rpush(queue_name, json.dumps(task_data, ensure_ascii=False))
+            task_json = json.dumps(task_data, ensure_ascii=False)
+            await self.redis.zadd(f"{queue_name}:priority", {task_json: self._queue_score(priority)})
             return True
         except Exception as e:
             logger.error(f"Redis add_to_queue 操作失败: {queue_name} - {e}")
             return False
 
+    # ===================
+    # 内容去重 - 相同内容的文件共享同一个MinIO对象
+    # ===================
+    
+    async def acquire_content_blob(
+        self, content_hash: str, file_id: str, expire: int
+    ) -> Optional[Dict[str, Any]]:
+        """内容已上传过时先登记本文件的引用再返回已有对象信息；返回None表示需要重新上传"""
+        if not self._connected:
+            await self.initialize()
+        
+        blob = await self._blob_acquire_script(
+            keys=[f"blob:{content_hash}"],
+            args=[file_id, expire]
+        )
+        return json.loads(blob) if blob else None
+    
+    async def register_content_blob(
+        self, content_hash: str, file_id: str, object_name: str, file_url: str, expire: int
+    ) -> bool:
+        """登记新上传的内容对象及本文件的引用；相同内容已被并发上传的文件先登记时返回False"""
+        if not self._connected:
+            await self.initialize()
+        
+        registered = await self._blob_register_script(
+            keys=[f"blob:{content_hash}", f"object_refs:{object_name}"],
+            args=[json.dumps({"object_name": object_name, "file_url": file_url}), file_id, expire]
+        )
+        return bool(registered)
+    
+    async def release_content_blob(
+        self, file_id: str, object_name: str, content_hash: Optional[str]
+    ) -> bool:
+        """解除文件对内容对象的引用，返回对象是否已无引用、可以删除"""
+        if not self._connected:
+            await self.initialize()
+        
+        released = await self._blob_release_script(
+            keys=[f"object_refs:{object_name}", f"blob:{content_hash}" if content_hash else ""],
+            args=[file_id, object_name]
+        )
+        return bool(released)
+    
+    # ===================
+    # Embedding缓存 - 相同文本和模型不重复调用embedding服务
+    # ===================
+    
+    @staticmethod
+    def _embedding_cache_key(text: str, model: str) -> str:
+        """embedding缓存键：模型名 + 文本SHA-256
+        
+        开启SEMANTIC_CACHE时先归一化文本（去首尾空白、转小写、合并连续空白），
+        只有大小写或空白不同的文本共用同一条缓存。
+        """
+        if settings.SEMANTIC_CACHE:
+            text = _WHITESPACE_RE.sub(" ", text.strip().lower())
+        return f"emb:f16:{model}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+    
+    @staticmethod
+    def _pack_embedding(vector: array) -> str:
+        """向量量化为小端float16后base64编码，体积为float32的一半，余弦相似度误差约1e-3"""
+        return base64.b64encode(struct.pack(f"<{len(vector)}e", *vector)).decode('ascii')
+    
+    @staticmethod
+    def _unpack_embedding(value: str) -> array:
+        """解码Redis中的float16向量，还原为float32数组"""
+        raw = base64.b64decode(value)
+        return array('f', struct.unpack(f"<{len(raw) // 2}e", raw))
+    
+    def _remember_embedding(self, key: str, vector: array):
+        """写入进程内embedding缓存，超出容量时淘汰最久未使用的条目"""
+        self._embedding_cache[key] = vector
+        self._embedding_cache.move_to_end(key)
+        while len(self._embedding_cache) > _EMBEDDING_CACHE_SIZE:
+            self._embedding_cache.popitem(last=False)
+    
+    async def get_embeddings(self, texts: List[str], model: str) -> List[Optional[List[float]]]:
+        """批量读取缓存的embedding向量，结果与texts一一对应，未命中为None
+        
+        先查进程内缓存，其余键一次MGET；Redis中以base64编码的float16数组保存。
+        """
+        keys = [self._embedding_cache_key(text, model) for text in texts]
+        embeddings: List[Optional[List[float]]] = [None] * len(texts)
+        
+        missing = []
+        for i, key in enumerate(keys):
+            vector = self._embedding_cache.get(key)
+            if vector is not None:
+                self._embedding_cache.move_to_end(key)
+                embeddings[i] = vector.tolist()
+            else:
+                missing.append(i)
+        
+        if not missing:
+            return embeddings
+        if not self._connected:
+            await self.initialize()
+        
+        try:
+            values = await self.redis.mget([keys[i] for i in missing])
+        except Exception as e:
+            logger.warning(f"读取embedding缓存失败: {e}")
+            return embeddings
+        
+        for i, value in zip(missing, values):
+            if value:
+                vector = self._unpack_embedding(value)
+                self._remember_embedding(keys[i], vector)
+                embeddings[i] = vector.tolist()
+        
+        return embeddings
+    
+    async def set_embeddings(
+        self,
+        texts: List[str],
+        embeddings: List[List[float]],
+        model: str,
+        expire: Optional[int] = None
+    ) -> bool:
+        """批量写入embedding缓存 - 一次管道提交"""
+        if not texts:
+            return True
+        if not self._connected:
+            await self.initialize()
+        
+        expire = expire or settings.EMBEDDING_CACHE_TTL
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for text, embedding in zip(texts, embeddings):
+                key = self._embedding_cache_key(text, model)
+                vector = array('f', embedding)
+                self._remember_embedding(key, vector)
+                pipe.set(key, self._pack_embedding(vector), ex=expire)
+            await pipe.execute()
+            return True
+        except Exception as e:
+            logger.warning(f"写入embedding缓存失败: {e}")
+            return False
+
+    # ===================
+    # 搜索历史和搜索建议 - 历史查询前缀索引
+    # ===================
+    
+    @staticmethod
+    def _normalize_suggestion(text: str) -> str:
+        """搜索建议归一化：去首尾空白、转小写、合并连续空白"""
+        return _WHITESPACE_RE.sub(" ", text.strip().lower())
+    
+    async def save_search_history(self, history_key: str, entry: Dict[str, Any], expire: int):
+        """追加一条搜索历史并把查询加入搜索建议索引 - 一次管道往返，索引超过上限时按次数淘汰"""
+        async with self.pipeline(transaction=False) as pipe:
+            pipe.rpush(history_key, json.dumps(entry, ensure_ascii=False))
+            pipe.expire(history_key, expire)
+            
+            # 加入搜索建议索引并累加次数
+            phrase = self._normalize_suggestion(entry.get("query") or "")
+            if phrase and len(phrase) <= _SUGGEST_MAX_LENGTH:
+                pipe.zadd(_SUGGEST_LEX_KEY, {phrase: 0})
+                pipe.zincrby(_SUGGEST_COUNT_KEY, 1, phrase)
+                await self._suggest_trim_script(
+                    keys=[_SUGGEST_COUNT_KEY, _SUGGEST_LEX_KEY],
+                    args=[_SUGGEST_MAX_ENTRIES, _SUGGEST_TRIM_TO],
+                    client=pipe
+                )
+            await pipe.execute()
+    
+    async def get_search_suggestions(self, prefix: str, limit: int) -> List[str]:
+        """按前缀查找历史查询（ZRANGEBYLEX，O(log N)），按查询次数降序返回，不含与前缀相同的查询
+        
+        排序是近似的：只取字典序最前的_SUGGEST_CANDIDATES条匹配再按次数排序，
+        匹配超过该数量的短前缀可能漏掉字典序靠后的高频查询。
+        """
+        prefix = self._normalize_suggestion(prefix)
+        if not prefix:
+            return []
+        if not self._connected:
+            await self.initialize()
+        
+        # 上界按UTF-8字节比较：前缀之后追加0xFF，覆盖所有以该前缀开头的查询（含中文）
+        encoded = prefix.encode('utf-8')
+        candidates = await self.redis.zrangebylex(
+            _SUGGEST_LEX_KEY, b"[" + encoded, b"[" + encoded + b"\xff",
+            start=0, num=_SUGGEST_CANDIDATES
+        )
+        candidates = [phrase for phrase in candidates if phrase != prefix]
+        if not candidates:
+            return []
+        
+        async with self.pipeline(transaction=False) as pipe:
+            for phrase in candidates:
+                pipe.zscore(_SUGGEST_COUNT_KEY, phrase)
+            counts = await pipe.execute()
+        
+        ranked = sorted(zip(candidates, counts), key=lambda item: item[1] or 0, reverse=True)
+        return [phrase for phrase, _ in ranked[:limit]]
+
     # ===================
     # 数据操作便利方法 - 用于知识库管理
     # ===================
@@ -673,6 +1848,30 @@ class CacheService:
             logger.error(f"获取数据失败: {key} - {e}")
             return None
     
+    async def get_data_many(self, keys: List[str]) -> List[Optional[Any]]:
+        """批量获取数据（一次MGET往返，自动反序列化JSON），结果与keys一一对应"""
+        if not keys:
+            return []
+        if not self._connected:
+            await self.initialize()
+        
+        try:
+            values = await self.redis.mget(keys)
+        except Exception as e:
+            logger.error(f"Redis MGET 操作失败: {e}")
+            return [None] * len(keys)
+        
+        results = []
+        for value in values:
+            if value is None:
+                results.append(None)
+                continue
+            try:
+                results.append(json.loads(value))
+            except json.JSONDecodeError:
+                results.append(value)
+        return results
+    
     async def delete_data(self, key: str) -> bool:
         """删除数据"""
         try:
@@ -4,19 +4,28 @@
 """
 
 import os
+import re
+import random
+import codecs
 import uuid
+import hashlib
 import logging
-from typing import Dict, List, Optional, Any, Tuple
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional, Any, Tuple, BinaryIO
 from datetime import datetime
 import asyncio
 from pathlib import Path
 
+import httpx
+
+
 from app.core.config import settings
 from app.models.responses import ErrorCode
 from app.core.exceptions import create_service_exception
-from app.services.storage_service import get_minio_service
+from app.services.storage_service import get_minio_service, MULTIPART_THRESHOLD
 from app.services.cache_service import get_cache_service
 from app.services.vector_service import get_vector_service
+from app.services.search_service import get_search_service, decode_embedding
 
 # 先定义logger
 logger = logging.getLogger("rag-anything")
@@ -39,6 +48,100 @@ except ImportError:
     GenericModalProcessor = None
 
 
+# 分块用正则在模块加载时统一编译（总计约几毫秒）。
+# 注意：re.Pattern 的 pickle 只保存模式串，加载时会重新编译，持久化到磁盘无法缩短启动时间。
+
+# 章节类型关键词（按优先级排列，靠前的类型优先）
+_SECTION_KEYWORDS = {
+    "project_overview": ["项目概况", "工程概况", "建设规模", "项目性质"],
+    "bidding_notice": ["投标须知", "投标说明", "投标人须知"],
+    "technical_specs": ["技术规范", "技术要求", "施工标准", "质量标准"],
+    "commercial_terms": ["商务条款", "报价要求", "付款条件", "合同条款"],
+    "qualification": ["资格要求", "投标人资格", "资质要求", "业绩要求"],
+    "schedule": ["工期要求", "进度安排", "里程碑", "节点计划"],
+    "materials": ["材料要求", "设备规格", "材料标准"],
+    "evaluation": ["评标办法", "评标标准", "评标程序"],
+    "contract": ["合同条款", "履约要求", "违约责任"]
+}
+_SECTION_TYPE_RANK = {section_type: rank for rank, section_type in enumerate(_SECTION_KEYWORDS)}
+_SECTION_TYPE_RE = re.compile("|".join(
+    f"(?P<{section_type}>" + "|".join(map(re.escape, keywords)) + ")"
+    for section_type, keywords in _SECTION_KEYWORDS.items()
+))
+
+# 语义边界（招标书专用，按优先级排列）
+# 按层分组：层内各边界首字符互不相同，同一位置至多匹配一个
+_BOUNDARY_TIER_CHARS = (
+    ('\n\n', '。\n', '：\n', ';\n'),  # 段落边界
+    ('）\n', ')\n', '、\n'),          # 列表项边界
+    ('要求：', '规定：', '说明：'),    # 招标书常见分隔词
+    ('。', '！', '？'),               # 句子边界
+)
+_BOUNDARY_CHARS = tuple(boundary for tier in _BOUNDARY_TIER_CHARS for boundary in tier)
+# 零宽前瞻，保留重叠位置（如连续换行）
+_BOUNDARY_TIERS = tuple(
+    re.compile("(?=(" + "|".join(map(re.escape, tier)) + "))")
+    for tier in _BOUNDARY_TIER_CHARS
+)
+
+# 表格起止标签
+_TABLE_START_RE = re.compile(r'<table[^>]*>', re.IGNORECASE)
+_TABLE_END_RE = re.compile(r'</table>', re.IGNORECASE)
+
+# 解析结果上传到MinIO时的最大并发数，以及MinerU运行期间扫描输出目录的间隔（秒）
+_PARSED_UPLOAD_CONCURRENCY = 16
+_PARSED_OUTPUT_POLL_INTERVAL = 0.5
+
+# 解析结果文件按扩展名确定上传的content_type和内容块类型
+_PARSED_CONTENT_TYPES = {".md": "text/markdown", ".json": "application/json"}
+_PARSED_BLOCK_TYPES = {".md": "markdown", ".json": "json"}
+
+# 解析结果中保存的MinerU stdout/stderr末尾字符数
+_PARSE_OUTPUT_TAIL_CHARS = 2000
+
+# 向量化时每次请求的文本条数，以及同时进行的请求数
+_EMBEDDING_BATCH_SIZE = 64
+_EMBEDDING_CONCURRENCY = 8
+
+# embedding请求失败重试：最多尝试次数，以及指数退避的初始和最大等待秒数
+_EMBEDDING_MAX_ATTEMPTS = 4
+_EMBEDDING_RETRY_BASE_DELAY = 0.5
+_EMBEDDING_RETRY_MAX_DELAY = 8.0
+
+# embedding服务共享连接池：复用keep-alive连接，避免每次请求重新握手
+_EMBEDDING_HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+
+# 内容去重：blob:{哈希}记录已上传对象，object_refs:{对象名}记录引用该对象的文件
+_CONTENT_HASH_READ_SIZE = 1024 * 1024
+_CONTENT_BLOB_EXPIRE = 2592000  # 30天，与文件元数据一致
+
+# 统计结果短时缓存：仪表板频繁轮询，而聚合结果在两次轮询之间几乎不变
+_PROCESSING_STATS_CACHE_KEY = "stats:processing"
+_PROCESSING_STATS_CACHE_TTL = 5
+_FILE_STATUS_CACHE_TTL = 2
+
+# 批量提交任务时同时处理的文件数
+_BATCH_SUBMIT_CONCURRENCY = 32
+
+# 全量扫描文件键时每次SCAN的COUNT提示，减少遍历键空间的往返次数
+_FILE_SCAN_COUNT = 1000
+
+# 解析/向量化各阶段状态对应的进度贡献（两阶段各占50%）
+_STATUS_PROGRESS = {"completed": 50, "running": 25}
+
+# 要求/规格提取模式：前缀与内容使用有界量词，避免长文本（无；。分隔）上的二次回溯
+_REQUIREMENT_PATTERNS = tuple(re.compile(pattern) for pattern in (
+    r'[^；。]{0,200}要求[：:]?[^；。\n]{1,500}',
+    r'[^；。]{0,200}标准[：:]?[^；。\n]{1,500}',
+    r'[^；。]{0,200}规范[：:]?[^；。\n]{1,500}'
+))
+_SPECIFICATION_PATTERNS = tuple(re.compile(pattern) for pattern in (
+    r'[^；。]{0,200}规格[：:]?[^；。\n]{1,500}',
+    r'[^；。]{0,200}型号[：:]?[^；。\n]{1,500}',
+    r'[^；。]{0,200}参数[：:]?[^；。\n]{1,500}'
+))
+
+
 class DocumentService:
     """文档处理服务"""
     
@@ -46,16 +149,51 @@ class DocumentService:
         self.minio_service = None
         self.cache_service = None
         self.vector_service = None
+        self.search_service = None
         self.rag_processor = None
+        self._init_lock = asyncio.Lock()
+        self._ready = False
+        self._embedding_semaphore = asyncio.Semaphore(_EMBEDDING_CONCURRENCY)
+        self._embed_client: Optional[httpx.AsyncClient] = None
+        # 正在请求中的单条embedding，相同文本的并发调用共享同一次请求
+        self._embedding_inflight: Dict[str, asyncio.Future] = {}
+        # MinerU子进程占用大量内存和SGLang推理槽位，限制单个进程内同时运行的数量
+        self._mineru_semaphore = asyncio.Semaphore(settings.MINERU_MAX_CONCURRENT)
+    
+    @property
+    def mineru_slots_available(self) -> int:
+        """当前进程可立即启动的MinerU解析数"""
+        return self._mineru_semaphore._value
     
     async def _get_services(self):
-        """获取依赖服务"""
+        """获取依赖服务 - 只初始化一次，之后直接返回"""
+        if self._ready:
+            return
+        
+        async with self._init_lock:
+            # 等锁期间可能已被其他协程初始化完成
+            if self._ready:
+                return
+            await self._init_services()
+            self._ready = True
+    
+    async def _init_services(self):
+        """初始化依赖服务和RAG处理器"""
         if self.minio_service is None:
             self.minio_service = await get_minio_service()
         if self.cache_service is None:
             self.cache_service = await get_cache_service()
         if self.vector_service is None:
             self.vector_service = await get_vector_service()
+        if self.search_service is None:
+            self.search_service = await get_search_service()
+        if self._embed_client is None:
+            self._embed_client = httpx.AsyncClient(
+                base_url=settings.EMBEDDING_API_BASE,
+                headers={"Authorization": f"Bearer {settings.EMBEDDING_API_KEY}"},
+                limits=_EMBEDDING_HTTP_LIMITS,
+                timeout=30
+            )
         
         # 初始化RAG处理器
         if self.rag_processor is None and RAGAnything is not None:
@@ -74,6 +212,69 @@ class DocumentService:
                 # 如果初始化失败，设置为None，不影响基本的文件上传功能
                 self.rag_processor = None
     
+    async def cleanup(self):
+        """关闭embedding连接池（应用关闭时由服务管理器调用）"""
+        if self._embed_client is not None:
+            await self._embed_client.aclose()
+            self._embed_client = None
+            self._ready = False
+    
+    @staticmethod
+    def _status_cache_keys(file_id: Optional[str] = None) -> List[str]:
+        """文件状态变更时需要失效的统计缓存键"""
+        keys = [_PROCESSING_STATS_CACHE_KEY]
+        if file_id:
+            keys.append(f"stats:file:{file_id}")
+        return keys
+    
+    async def _invalidate_status_cache(self, file_id: Optional[str] = None):
+        """文件状态变更后清除统计缓存和该文件的状态缓存"""
+        await self.cache_service.delete(*self._status_cache_keys(file_id))
+    
+    @staticmethod
+    def _hash_content(file_content: bytes) -> str:
+        """计算文件内容哈希（BLAKE2b，标准库实现）"""
+        return hashlib.blake2b(file_content, digest_size=32).hexdigest()
+    
+    @staticmethod
+    def _hash_stream(file_stream: BinaryIO) -> Tuple[str, int]:
+        """分块计算文件对象的内容哈希，返回(哈希, 字节数)，读取后回到原位置"""
+        hasher = hashlib.blake2b(digest_size=32)
+        start_position = file_stream.tell()
+        size = 0
+        while True:
+            data = file_stream.read(_CONTENT_HASH_READ_SIZE)
+            if not data:
+                break
+            hasher.update(data)
+            size += len(data)
+        file_stream.seek(start_position)
+        return hasher.hexdigest(), size
+    
+    async def _register_content_blob(
+        self, content_hash: str, file_id: str, object_name: str, file_url: str, reused: bool
+    ):
+        """登记新上传对象的引用，删除文件时据此判断对象是否仍被其他文件使用
+        
+        复用已有对象时引用已在acquire_content_blob中登记，这里无需再处理。
+        """
+        if reused:
+            return
+        
+        if not await self.cache_service.register_content_blob(
+            content_hash, file_id, object_name, file_url, _CONTENT_BLOB_EXPIRE
+        ):
+            # 相同内容被并发上传且对方先完成登记：本文件独占自己的对象，不参与引用计数
+            logger.debug("相同内容已被其他文件登记，独占对象: %s", object_name)
+    
+    async def _release_content_blob(self, file_id: str, object_name: str, content_hash: Optional[str]) -> bool:
+        """解除文件对内容对象的引用，返回对象是否已无引用、可以删除"""
+        if await self.cache_service.release_content_blob(file_id, object_name, content_hash):
+            return True
+        
+        logger.info("♻️ 对象仍被其他文件引用，保留: %s", object_name)
+        return False
+    
     async def upload_file(
         self, 
         file_content: bytes = None,
@@ -82,22 +283,24 @@ class DocumentService:
         metadata: Optional[Dict[str, Any]] = None,
         original_name: Optional[str] = None,
         description: Optional[str] = None,
+        file_stream: Optional[BinaryIO] = None,
+        file_size: Optional[int] = None,
         **kwargs  # 接收额外参数，提高兼容性
     ) -> str:
-        """上传文件到MinIO"""
-        # 💡 添加方法入口日志 - 立即记录所有传入参数
-        logger.info(f"🔍 upload_file 方法被调用！")
-        logger.info(f"📋 传入参数详情:")
-        logger.info(f"  - file_content: {'存在' if file_content else '缺失'} (长度: {len(file_content) if file_content else 0})")
-        logger.info(f"  - filename: '{filename}' (类型: {type(filename)})")
-        logger.info(f"  - content_type: '{content_type}'")
-        logger.info(f"  - original_name: '{original_name}'")
-        logger.info(f"  - description: '{description}'")
-        logger.info(f"  - metadata: {metadata}")
-        logger.info(f"  - kwargs: {kwargs}")
+        """上传文件到MinIO
         
+        传入file_stream时直接从文件对象分片上传，不把整个文件读入内存；
+        file_size未知时按实际读取的字节数记录。
+        内容与已上传文件相同时复用已有对象，只新建元数据。
+        """
         # 参数验证和兼容性处理 - 参考mineru-web的实现
-        if not file_content:  # 检查None或空内容
+        if file_stream is not None and file_size == 0:
+            raise create_service_exception(
+                ErrorCode.INVALID_REQUEST,
+                "缺少文件内容参数 (file_content)"
+            )
+        
+        if not file_content and file_stream is None:  # 检查None或空内容
             # 尝试从kwargs获取
             file_content = kwargs.get('data', kwargs.get('file_data'))
             if not file_content:  # 检查None或空内容
@@ -119,29 +322,69 @@ class DocumentService:
         if content_type is None:
             content_type = kwargs.get('content_type', kwargs.get('mime_type'))
         
-        # 调试日志 - 记录参数信息
-        logger.info(f"upload_file 调用参数: filename='{filename}', content_type='{content_type}', "
-                    f"file_size={len(file_content) if file_content else 0}, "
-                    f"original_name='{original_name}', description='{description}', "
-                    f"kwargs={list(kwargs.keys()) if kwargs else []}")
+        # 调试日志 - 记录参数信息（%格式延迟到日志实际输出时才格式化）
+        logger.info(
+            "upload_file 调用参数: filename='%s', content_type='%s', file_size=%s, "
+            "original_name='%s', description='%s', kwargs=%s",
+            filename, content_type, len(file_content) if file_content else file_size,
+            original_name, description, list(kwargs) if kwargs else []
+        )
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("upload_file metadata=%s kwargs=%s", metadata, kwargs)
         
         await self._get_services()
         
         # 生成文件ID
         file_id = str(uuid.uuid4())
-        file_extension = Path(filename).suffix.lower()
+        file_extension = os.path.splitext(filename)[1].lower()
         
         # 生成对象名（包含路径结构）
-        upload_date = datetime.now().strftime("%Y/%m/%d")
+        now = datetime.now()
+        upload_date = now.strftime("%Y/%m/%d")
         object_name = f"documents/{upload_date}/{file_id}{file_extension}"
+        existing_blob = None
         
         try:
-            # 上传到MinIO
-            file_url = await self.minio_service.upload_file(
-                object_name=object_name,
-                file_data=file_content,
-                content_type=content_type
+            # 计算内容哈希，相同内容已上传过时直接复用已有对象，跳过上传
+            if file_stream is not None:
+                content_hash, hashed_size = await asyncio.to_thread(self._hash_stream, file_stream)
+                if file_size is None:
+                    file_size = hashed_size
+            else:
+                content_hash = await asyncio.to_thread(self._hash_content, file_content)
+            
+            # 先登记本文件的引用再决定复用：登记与其他文件释放最后一个引用在服务端串行执行，
+            # 登记失败（对象已被释放）时重新上传
+            existing_blob = await self.cache_service.acquire_content_blob(
+                content_hash, file_id, _CONTENT_BLOB_EXPIRE
             )
+            if existing_blob:
+                object_name = existing_blob["object_name"]
+                file_url = existing_blob["file_url"]
+                logger.info("♻️ 文件内容已存在，复用对象: %s -> %s", filename, object_name)
+            # 上传到MinIO，流式输入和大文件走分片上传
+            elif file_stream is not None:
+                file_url = await self.minio_service.upload_file_multipart(
+                    object_name=object_name,
+                    data=file_stream,
+                    content_type=content_type,
+                    length=file_size
+                )
+            elif len(file_content) > MULTIPART_THRESHOLD:
+                file_url = await self.minio_service.upload_file_multipart(
+                    object_name=object_name,
+                    data=file_content,
+                    content_type=content_type
+                )
+            else:
+                file_url = await self.minio_service.upload_file(
+                    object_name=object_name,
+                    file_data=file_content,
+                    content_type=content_type
+                )
+            
+            if file_stream is None:
+                file_size = len(file_content)
             
             # 准备文件元数据
             display_name = original_name or filename
@@ -157,36 +400,58 @@ class DocumentService:
                 "original_name": display_name,
                 "object_name": object_name,
                 "file_url": file_url,
-                "file_size": len(file_content),
+                "file_size": file_size,
                 "content_type": content_type,
                 "file_extension": file_extension,
-                "upload_date": datetime.now().isoformat(),
+                "upload_date": now.isoformat(),
                 "status": "uploaded",
                 "parse_status": "pending",
+                "content_hash": content_hash,
                 "custom_metadata": final_metadata
             }
             
             # 保存元数据到Redis
-            await self.cache_service.save_file_metadata(file_id, file_metadata)
+            await self.cache_service.save_file_metadata(
+                file_id, file_metadata, delete_keys=self._status_cache_keys(file_id)
+            )
+            await self._register_content_blob(
+                content_hash, file_id, object_name, file_url, reused=bool(existing_blob)
+            )
             
             logger.info(f"文件上传成功: {filename} -> {file_id}")
             return file_id
             
         except Exception as e:
             logger.error(f"文件上传失败: {filename} - {e}")
+            if existing_blob:
+                # 归还已登记的引用，避免共享对象因残留引用永远无法删除
+                try:
+                    if await self._release_content_blob(file_id, object_name, content_hash):
+                        await self.minio_service.delete_file(object_name)
+                except Exception as release_error:
+                    logger.warning(f"归还内容对象引用失败: {object_name} - {release_error}")
             raise create_service_exception(
                 ErrorCode.FILE_UPLOAD_FAILED,
                 f"文件上传失败: {str(e)}"
             )
     
-    async def get_file_info(self, file_id: str) -> Optional[Dict[str, Any]]:
-        """获取文件信息"""
+    async def get_file_info(
+        self,
+        file_id: str,
+        include_parse_result: bool = True,
+        include_remote: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """获取文件信息
+        
+        不需要解析结果时传include_parse_result=False以免读取整个parse_result；
+        include_remote=True时额外查询MinIO补充etag、修改时间和实际大小。
+        """
         await self._get_services()
         
         # 从Redis获取文件元数据
-        metadata = await self.cache_service.get_file_metadata(file_id)
-        if not metadata:
-            return None
+        metadata = await self.cache_service.get_file_metadata(file_id, include_parse_result)
+        if not metadata or not include_remote:
+            return metadata
         
         # 补充MinIO中的实时信息
         try:
@@ -204,12 +469,21 @@ class DocumentService:
         
         return metadata
     
+    async def get_files_info(
+        self,
+        file_ids: List[str],
+        include_parse_result: bool = False
+    ) -> List[Optional[Dict[str, Any]]]:
+        """批量获取文件信息 - 一次Redis管道往返，结果与file_ids一一对应，不存在的文件为None"""
+        await self._get_services()
+        return await self.cache_service.get_file_metadata_many(file_ids, include_parse_result)
+    
     async def download_file(self, file_id: str) -> Tuple[bytes, Dict[str, Any]]:
         """下载文件"""
         await self._get_services()
         
         # 获取文件元数据
-        metadata = await self.get_file_info(file_id)
+        metadata = await self.get_file_info(file_id, include_parse_result=False)
         if not metadata:
             raise create_service_exception(
                 ErrorCode.FILE_NOT_FOUND,
@@ -246,46 +520,41 @@ class DocumentService:
         
         try:
             # 获取文件元数据
-            metadata = await self.get_file_info(file_id)
+            metadata = await self.get_file_info(file_id, include_parse_result=False)
             if not metadata:
                 logger.warning(f"文件元数据不存在: {file_id}")
                 return False
             
-            success = True
+            # 先移出所属知识库并扣减其计数器（脚本需要读取文件元数据，须在删除前执行）
+            if metadata.get("kb_id"):
+                await self.cache_service.unlink_file_from_knowledge_base(file_id, metadata["kb_id"])
             
-            # 删除向量数据库中的数据
+            # 向量数据、MinIO对象和Redis键分属不同后端，互不依赖，并发删除
+            operations = {}
             if delete_vector_data:
-                try:
-                    await self.vector_service.delete_document(file_id)
-                except Exception as e:
-                    logger.error(f"删除向量数据失败: {file_id} - {e}")
-                    success = False
+                operations["删除向量数据"] = self.vector_service.delete_document(file_id)
+            
+            object_name = metadata.get("object_name")
+            if object_name and await self._release_content_blob(file_id, object_name, metadata.get("content_hash")):
+                operations["删除MinIO文件"] = self.minio_service.delete_file(object_name)
             
-            # 删除解析数据
+            # 删除Redis中的解析结果缓存和元数据 - 合并为一次DEL
+            redis_keys = [f"file:{file_id}", *self._status_cache_keys(file_id)]
             if delete_parsed_data:
-                try:
-                    # 删除解析结果缓存
-                    await self.cache_service.delete(f"parse_result:{file_id}")
-                    await self.cache_service.delete(f"text_chunks:{file_id}")
-                except Exception as e:
-                    logger.error(f"删除解析数据失败: {file_id} - {e}")
-                    success = False
+                redis_keys += [f"parse_result:{file_id}", f"text_chunks:{file_id}"]
+            operations["删除Redis元数据"] = self.cache_service.delete(*redis_keys)
+            operations["移出文件列表索引"] = self.cache_service.remove_from_file_index(
+                [file_id], metadata.get("status")
+            )
+            operations["更新文件统计计数"] = self.cache_service.remove_file_counters(metadata)
             
-            # 删除MinIO中的文件
-            object_name = metadata.get("object_name")
-            if object_name:
-                try:
-                    await self.minio_service.delete_file(object_name)
-                except Exception as e:
-                    logger.error(f"删除MinIO文件失败: {file_id} - {e}")
-                    success = False
+            results = await asyncio.gather(*operations.values(), return_exceptions=True)
             
-            # 删除Redis中的元数据
-            try:
-                await self.cache_service.delete(f"file:{file_id}")
-            except Exception as e:
-                logger.error(f"删除Redis元数据失败: {file_id} - {e}")
-                success = False
+            success = True
+            for operation, result in zip(operations, results):
+                if isinstance(result, Exception):
+                    logger.error(f"{operation}失败: {file_id} - {result}")
+                    success = False
             
             if success:
                 logger.info(f"文件删除成功: {file_id}")
@@ -299,38 +568,62 @@ class DocumentService:
             return False
     
     async def start_parse_task(self, file_id: str, priority: int = 0) -> str:
-        """启动文档解析任务 - 支持优先级设置"""
+        """启动文档解析任务 - 支持优先级设置
+        
+        任务写入document_parse队列，由解析任务处理器（app.workers.parse_worker）消费执行，
+        不在当前请求所在的事件循环中运行MinerU。
+        """
         await self._get_services()
         
         try:
-            # 获取任务服务
-            from app.services.task_service import get_task_service
-            task_service = await get_task_service()
+            # 检查文件是否存在
+            file_info = await self.cache_service.get_file_metadata(file_id)
+            if not file_info:
+                raise create_service_exception(
+                    ErrorCode.FILE_NOT_FOUND,
+                    f"文件不存在: {file_id}"
+                )
             
-            # 🔧 修复：定义解析任务函数，然后传递给create_task
-            async def parse_task_func():
-                """实际的解析任务函数"""
-                try:
-                    logger.info(f"开始解析文档: {file_id}")
-                    result = await self.parse_document(file_id)
-                    logger.info(f"文档解析完成: {file_id}")
-                    return result
-                except Exception as e:
-                    logger.error(f"文档解析任务失败: {file_id} - {e}")
-                    raise
+            # 生成任务ID
+            task_id = f"parse_{file_id}_{uuid.uuid4().hex[:8]}"
+            current_time = datetime.utcnow().isoformat()
             
-            # 🔧 修复：正确调用create_task，传递函数作为第一个参数
-            task_id = await task_service.create_task(
-                task_func=parse_task_func,  # ✅ 传递函数作为第一个参数
-                task_name=f"解析文档 {file_id}",
-                created_by="document_service"
+            # 准备任务数据
+            task_data = {
+                "task_id": task_id,
+                "task_name": f"解析文档 {file_id}",
+                "task_type": "parse",
+                "file_id": file_id,
+                "filename": file_info.get("filename"),
+                "status": "pending",
+                "created_at": current_time,
+                "created_by": "document_service",
+                "priority": priority
+            }
+            
+            # 保存任务信息、按优先级入队并记录文件对应的解析任务 - 一次往返
+            created = await self.cache_service.set_task_and_enqueue(
+                task_id,
+                task_data,
+                "document_parse",
+                priority=priority,
+                file_id=file_id,
+                file_fields={"parse_task_id": task_id},
+                delete_keys=self._status_cache_keys(file_id)
             )
+            if not created:
+                raise create_service_exception(
+                    ErrorCode.TASK_CREATION_FAILED,
+                    f"解析任务写入队列失败: {file_id}"
+                )
             
-            logger.info(f"文档解析任务已启动: {task_id} - {file_id} - 优先级: {priority}")
+            logger.info(f"文档解析任务已入队: {task_id} - {file_id} - 优先级: {priority}")
             return task_id
             
         except Exception as e:
             logger.error(f"启动文档解析任务失败: {file_id} - {e}")
+            if hasattr(e, 'code'):
+                raise e
             raise create_service_exception(
                 ErrorCode.TASK_CREATION_FAILED,
                 f"启动解析任务失败: {str(e)}"
@@ -339,7 +632,6 @@ class DocumentService:
     async def _run_mineru_with_sglang(self, input_file: str, file_id: str, original_filename: str = None) -> Dict[str, Any]:
         """使用MinerU和SGLang服务解析文档 - 🔧 优化：解析结果直接存储到MinIO"""
         try:
-            import subprocess
             import tempfile
             import shutil
             
@@ -375,86 +667,148 @@ class DocumentService:
                 # 🔧 修复：增加超时时间并添加更详细的日志
                 logger.info(f"⏱️  开始执行MinerU解析，预计需要10-15分钟...")
                 
-                # 执行命令 - 增加超时到20分钟，适应大文件处理
-                result = subprocess.run(
-                    cmd,
-                    capture_output=True,
-                    text=True,
-                    timeout=1200  # 🔧 20分钟超时，适应大文件
+                # 异步启动MinerU子进程并持续读取输出，不阻塞事件循环
+                # 子进程运行期间用于边解析边上传已写完的输出文件
+                process = await asyncio.create_subprocess_exec(
+                    *cmd,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE
+                )
+                mineru_task = asyncio.ensure_future(
+                    asyncio.wait_for(process.communicate(), timeout=1200)  # 🔧 20分钟超时，适应大文件
                 )
                 
-                logger.info(f"✅ MinerU命令执行完成，返回码: {result.returncode}")
+                upload_semaphore = asyncio.Semaphore(_PARSED_UPLOAD_CONCURRENCY)
+                uploaded: Dict[str, Tuple[int, int]] = {}  # 本地路径 -> 上传时的(大小, 修改时间)
+                in_flight: Dict[str, asyncio.Task] = {}
                 
-                if result.returncode != 0:
-                    logger.error(f"MinerU执行失败: {result.stderr}")
-                    raise Exception(f"MinerU执行失败: {result.stderr}")
+                def _scan_output() -> Dict[str, Tuple[int, int]]:
+                    """扫描输出目录，返回 {本地路径: (大小, 修改时间)}"""
+                    snapshot = {}
+                    for root, dirs, files in os.walk(temp_output):
+                        for file in files:
+                            local_file_path = os.path.join(root, file)
+                            try:
+                                stat = os.stat(local_file_path)
+                            except FileNotFoundError:
+                                continue
+                            snapshot[local_file_path] = (stat.st_size, stat.st_mtime_ns)
+                    return snapshot
+                
+                def _minio_path(local_file_path: str) -> str:
+                    # MinIO中的路径：parsed/{file_id}/{相对路径}，保持目录结构
+                    return f"parsed/{file_id}/{os.path.relpath(local_file_path, temp_output)}"
+                
+                async def _upload_one(local_file_path: str, signature: Tuple[int, int]):
+                    minio_path = _minio_path(local_file_path)
+                    content_type = _PARSED_CONTENT_TYPES.get(
+                        os.path.splitext(local_file_path)[1], "application/octet-stream"
+                    )
+                    
+                    try:
+                        async with upload_semaphore:
+                            file_size = signature[0]
+                            # 直接从磁盘流式上传，不读入内存，大文件由minio自动分片
+                            await self.minio_service.upload_file_from_path(
+                                object_name=minio_path,
+                                file_path=local_file_path,
+                                content_type=content_type
+                            )
+                    except Exception as e:
+                        logger.error(f"❌ 上传解析结果失败: {local_file_path} -> {minio_path} - {e}")
+                        return
+                    
+                    uploaded[local_file_path] = signature
+                    logger.info(f"✅ [{len(uploaded)}] 已上传: {minio_path} ({file_size} 字节)")
+                
+                def _schedule_upload(local_file_path: str, signature: Tuple[int, int]):
+                    task = asyncio.create_task(_upload_one(local_file_path, signature))
+                    in_flight[local_file_path] = task
+                    task.add_done_callback(lambda _, path=local_file_path: in_flight.pop(path, None))
+                
+                mineru_succeeded = False
+                try:
+                    # MinerU运行期间轮询输出目录：两次扫描之间大小和修改时间都不变的文件视为已写完，立即上传
+                    previous_snapshot: Dict[str, Tuple[int, int]] = {}
+                    while not mineru_task.done():
+                        snapshot = _scan_output()
+                        for local_file_path, signature in snapshot.items():
+                            if (previous_snapshot.get(local_file_path) == signature
+                                    and uploaded.get(local_file_path) != signature
+                                    and local_file_path not in in_flight):
+                                _schedule_upload(local_file_path, signature)
+                        previous_snapshot = snapshot
+                        await asyncio.wait({mineru_task}, timeout=_PARSED_OUTPUT_POLL_INTERVAL)
+                    
+                    stdout_data, stderr_data = await mineru_task
+                    stdout = stdout_data.decode("utf-8", errors="replace")
+                    stderr = stderr_data.decode("utf-8", errors="replace")
+                    
+                    logger.info(f"✅ MinerU命令执行完成，返回码: {process.returncode}")
+                    
+                    if process.returncode != 0:
+                        logger.error(f"MinerU执行失败: {stderr}")
+                        raise Exception(f"MinerU执行失败: {stderr}")
+                    mineru_succeeded = True
+                finally:
+                    # 轮询或等待期间被取消（如worker停止）时，先停止读取输出的任务再结束子进程，
+                    # 避免临时目录删除后MinerU仍在运行
+                    if not mineru_task.done():
+                        mineru_task.cancel()
+                        await asyncio.gather(mineru_task, return_exceptions=True)
+                    if process.returncode is None:
+                        # 超时或任务被取消时结束子进程，避免遗留MinerU进程
+                        process.kill()
+                        await process.wait()
+                    if in_flight:
+                        await asyncio.gather(*list(in_flight.values()), return_exceptions=True)
+                    if not mineru_succeeded and uploaded:
+                        # 解析失败时清理已提前上传的部分结果
+                        await asyncio.gather(
+                            *[self.minio_service.delete_file(_minio_path(path)) for path in uploaded],
+                            return_exceptions=True
+                        )
                 
                 # 🔧 优化：将解析结果上传到MinIO而不是保存到本地
                 minio_files = []
                 content_blocks = []
                 
-                logger.info(f"📤 开始将解析结果上传到MinIO...")
+                logger.info(f"📤 MinerU已结束，补传剩余解析结果到MinIO...")
                 
                 if os.path.exists(temp_output):
-                    # 统计要上传的文件
-                    total_files = sum([len(files) for _, _, files in os.walk(temp_output)])
-                    logger.info(f"📊 发现{total_files}个解析结果文件，开始上传...")
+                    # MinerU结束后最后扫描一次，补传尚未上传或上传后又被修改的文件
+                    final_snapshot = _scan_output()
+                    pending = [
+                        _upload_one(local_file_path, signature)
+                        for local_file_path, signature in final_snapshot.items()
+                        if uploaded.get(local_file_path) != signature
+                    ]
+                    if pending:
+                        await asyncio.gather(*pending)
                     
-                    uploaded_count = 0
-                    # 扫描临时输出目录并上传所有文件到MinIO
-                    for root, dirs, files in os.walk(temp_output):
-                        for file in files:
-                            local_file_path = os.path.join(root, file)
-                            
-                            # 计算相对路径，保持目录结构
-                            rel_path = os.path.relpath(local_file_path, temp_output)
-                            
-                            # MinIO中的路径：parsed/{file_id}/{相对路径}
-                            minio_path = f"parsed/{file_id}/{rel_path}"
-                            
-                            try:
-                                # 读取文件内容
-                                with open(local_file_path, 'rb') as f:
-                                    file_content = f.read()
-                                
-                                # 上传到MinIO
-                                content_type = "text/markdown" if file.endswith('.md') else \
-                                             "application/json" if file.endswith('.json') else \
-                                             "application/octet-stream"
-                                
-                                await self.minio_service.upload_file(
-                                    object_name=minio_path,
-                                    file_data=file_content,
-                                    content_type=content_type
-                                )
-                                
-                                minio_files.append(minio_path)
-                                uploaded_count += 1
-                                
-                                # 添加到内容块列表
-                                if file.endswith('.md'):
-                                    content_blocks.append({
-                                        "type": "markdown",
-                                        "minio_path": minio_path,
-                                        "local_filename": file,
-                                        "size": len(file_content)
-                                    })
-                                elif file.endswith('.json'):
-                                    content_blocks.append({
-                                        "type": "json", 
-                                        "minio_path": minio_path,
-                                        "local_filename": file,
-                                        "size": len(file_content)
-                                    })
-                                
-                                logger.info(f"✅ [{uploaded_count}/{total_files}] 已上传: {minio_path} ({len(file_content)} 字节)")
-                                
-                            except Exception as e:
-                                logger.error(f"❌ 上传解析结果失败: {local_file_path} -> {minio_path} - {e}")
-                                continue
+                    total_files = len(final_snapshot)
                     
-                    if uploaded_count > 0:
-                        logger.info(f"🎉 MinIO上传完成: {uploaded_count}/{total_files} 个文件上传成功")
+                    # 按扫描顺序汇总结果，保持文件列表顺序稳定
+                    for local_file_path, signature in final_snapshot.items():
+                        if uploaded.get(local_file_path) != signature:
+                            continue
+                        
+                        minio_path = _minio_path(local_file_path)
+                        minio_files.append(minio_path)
+                        
+                        # 添加到内容块列表
+                        local_filename = os.path.basename(local_file_path)
+                        block_type = _PARSED_BLOCK_TYPES.get(os.path.splitext(local_filename)[1])
+                        if block_type:
+                            content_blocks.append({
+                                "type": block_type,
+                                "minio_path": minio_path,
+                                "local_filename": local_filename,
+                                "size": signature[0]
+                            })
+                    
+                    if minio_files:
+                        logger.info(f"🎉 MinIO上传完成: {len(minio_files)}/{total_files} 个文件上传成功")
                     else:
                         logger.warning(f"⚠️  没有文件被上传到MinIO")
                 else:
@@ -465,8 +819,8 @@ class DocumentService:
                     "status": "success",
                     "minio_base_path": f"parsed/{file_id}",
                     "minio_files": minio_files,
-                    "stdout": result.stdout,
-                    "stderr": result.stderr,
+                    "stdout": stdout,
+                    "stderr": stderr,
                     "content_blocks": content_blocks,
                     "uploaded_files_count": len(minio_files),
                     "processing_time": "查看任务日志获取详细时间"
@@ -475,11 +829,11 @@ class DocumentService:
                 logger.info(f"🎉 MinerU解析完成: 找到{len(content_blocks)}个内容块，已上传{len(minio_files)}个文件到MinIO")
                 return parse_result
                 
-        except subprocess.TimeoutExpired as e:
-            logger.error(f"⏰ MinerU解析超时（20分钟）: {e}")
+        except asyncio.TimeoutError:
+            logger.error(f"⏰ MinerU解析超时（20分钟）")
             return {
                 "status": "failed",
-                "error": f"解析超时，大文件处理需要更长时间: {str(e)}",
+                "error": "解析超时，大文件处理需要更长时间",
                 "content_blocks": [],
                 "timeout": True
             }
@@ -499,7 +853,7 @@ class DocumentService:
         await self._get_services()
         
         # 获取文件信息
-        metadata = await self.get_file_info(file_id)
+        metadata = await self.get_file_info(file_id, include_parse_result=False)
         if not metadata:
             raise create_service_exception(
                 ErrorCode.FILE_NOT_FOUND,
@@ -520,52 +874,62 @@ class DocumentService:
                 file_size_mb = 0
                 estimated_time = 5  # 默认估计5分钟
             
-            logger.info(f"🚀 开始解析文档: {filename}")
-            logger.info(f"   📊 文件大小: {file_size_mb} MB")
-            logger.info(f"   🆔 文件ID: {file_id}")
-            logger.info(f"   ⏱️  预计处理时间: {estimated_time:.1f} 分钟（大文件需要更长时间）")
+            logger.info(
+                "🚀 开始解析文档: %s (📊 %s MB, 🆔 %s, ⏱️ 预计 %.1f 分钟)",
+                filename, file_size_mb, file_id, estimated_time
+            )
             
             # 更新解析状态
             await self.cache_service.save_file_metadata(
                 file_id, 
-                {**metadata, "parse_status": "parsing", "parse_started_at": datetime.now().isoformat()}
+                {"parse_status": "parsing", "parse_started_at": datetime.now().isoformat()},
+                delete_keys=self._status_cache_keys(file_id)
             )
             
-            # 下载文件到临时目录
-            logger.info(f"📥 从MinIO下载文件进行解析...")
-            file_data, _ = await self.download_file(file_id)
-            
             # 创建临时文件
             import tempfile
             with tempfile.NamedTemporaryFile(
                 suffix=metadata.get("file_extension", ".pdf"), 
                 delete=False
             ) as temp_file:
-                temp_file.write(file_data)
                 temp_input_path = temp_file.name
             
             try:
+                # 分片并行下载文件到临时文件，不在内存中缓存整个文件
+                logger.info(f"📥 从MinIO下载文件进行解析...")
+                object_name = metadata.get("object_name")
+                if not object_name:
+                    raise create_service_exception(
+                        ErrorCode.FILE_NOT_FOUND,
+                        f"文件对象名不存在: {file_id}"
+                    )
+                await self.minio_service.download_to_file(object_name, temp_input_path)
+                
                 # 🔧 优化：不再需要本地输出目录，直接使用MinIO存储
                 
                 # 使用MinerU解析 - 🔧 传递原始文件名
                 original_filename = metadata.get("filename", metadata.get("original_filename"))
-                parse_result = await self._run_mineru_with_sglang(temp_input_path, file_id, original_filename)
+                if self._mineru_semaphore.locked():
+                    logger.info("⏳ MinerU并发已满，等待空闲槽位: %s", file_id)
+                async with self._mineru_semaphore:
+                    parse_result = await self._run_mineru_with_sglang(temp_input_path, file_id, original_filename)
                 
                 # 更新元数据 - 🔧 优化：保存MinIO路径信息而不是本地路径
                 # 🔧 修复：同时更新status和parse_status字段以保持API兼容性
                 is_success = parse_result["status"] == "success"
                 updated_metadata = {
-                    **metadata,
                     "status": "parsed" if is_success else "parse_failed",  # API层检查的字段
                     "parse_status": "completed" if is_success else "failed",  # Service层使用的字段
-                    "parse_result": parse_result,
+                    "parse_result": self._compact_parse_result(parse_result),
                     "parsed_at": datetime.now().isoformat(),
                     "minio_base_path": parse_result.get("minio_base_path"),  # MinIO中的基础路径
                     "parsed_files_count": len(parse_result.get("content_blocks", [])),
                     "storage_location": "minio"  # 标记存储位置
                 }
                 
-                await self.cache_service.save_file_metadata(file_id, updated_metadata)
+                await self.cache_service.save_file_metadata(
+                    file_id, updated_metadata, delete_keys=self._status_cache_keys(file_id)
+                )
                 
                 # 🔧 添加详细的完成日志
                 if parse_result.get("status") == "success":
@@ -573,11 +937,10 @@ class DocumentService:
                     content_blocks = len(parse_result.get("content_blocks", []))
                     minio_path = parse_result.get("minio_base_path")
                     
-                    logger.info(f"🎉 文档解析完全成功: {file_id}")
-                    logger.info(f"   📁 MinIO存储路径: {minio_path}")
-                    logger.info(f"   📄 解析出内容块: {content_blocks}个")
-                    logger.info(f"   💾 上传文件数量: {uploaded_files}个")
-                    logger.info(f"   ✅ 所有数据已安全存储到MinIO")
+                    logger.info(
+                        "🎉 文档解析完全成功: %s (📁 %s, 📄 %d个内容块, 💾 %d个文件)",
+                        file_id, minio_path, content_blocks, uploaded_files
+                    )
                 else:
                     error_msg = parse_result.get("error", "未知错误")
                     logger.error(f"❌ 文档解析失败: {file_id}")
@@ -599,11 +962,11 @@ class DocumentService:
             await self.cache_service.save_file_metadata(
                 file_id,
                 {
-                    **metadata, 
                     "status": "parse_failed",  # API层检查的字段
                     "parse_status": "failed",  # Service层使用的字段
                     "parse_error": str(e)
-                }
+                },
+                delete_keys=self._status_cache_keys(file_id)
             )
             
             logger.error(f"文档解析失败: {file_id} - {e}")
@@ -612,6 +975,39 @@ class DocumentService:
                 f"文档解析失败: {str(e)}"
             )
     
+    @staticmethod
+    def _compact_parse_result(parse_result: Dict[str, Any]) -> Dict[str, Any]:
+        """持久化前只保留MinerU输出的末尾部分，完整输出记录在日志中
+        
+        content_blocks按列存储（types/minio_paths/filenames/sizes四个等长列表），
+        避免每个块重复写入字段名；CacheService读取时还原为按行的块列表，对外结构不变。
+        """
+        compacted = dict(parse_result)
+        for key in ("stdout", "stderr"):
+            output = compacted.get(key)
+            if output and len(output) > _PARSE_OUTPUT_TAIL_CHARS:
+                logger.debug(f"MinerU {key}: {output}")
+                compacted[key] = output[-_PARSE_OUTPUT_TAIL_CHARS:]
+        
+        content_blocks = compacted.get("content_blocks")
+        if isinstance(content_blocks, list):
+            compacted["content_blocks"] = {
+                "types": [block.get("type") for block in content_blocks],
+                "minio_paths": [block.get("minio_path") for block in content_blocks],
+                "filenames": [block.get("local_filename") for block in content_blocks],
+                "sizes": [block.get("size") for block in content_blocks],
+            }
+        return compacted
+    
+    @staticmethod
+    def _content_block_columns(content_blocks: Any) -> Tuple[List[Optional[str]], List[Optional[str]]]:
+        """返回content_blocks的(types, minio_paths)两列"""
+        content_blocks = content_blocks or []
+        return (
+            [block.get("type") for block in content_blocks],
+            [block.get("minio_path") for block in content_blocks]
+        )
+    
     async def extract_text_chunks(self, file_id: str) -> List[Dict[str, Any]]:
         """从解析结果中提取文本块 - 🔧 升级：智能表格感知分块"""
         await self._get_services()
@@ -631,33 +1027,40 @@ class DocumentService:
                 f"文档未解析或解析失败: {file_id}"
             )
         
-        chunks = []
-        content_blocks = parse_result.get("content_blocks", [])
+        block_types, block_paths = self._content_block_columns(parse_result.get("content_blocks"))
         
-        for i, block in enumerate(content_blocks):
-            if block.get("type") == "markdown":
-                try:
-                    # 🔧 优化：从MinIO读取文件而不是本地文件系统
-                    minio_path = block.get("minio_path")
-                    if minio_path:
-                        # 从MinIO下载文件内容
-                        file_content = await self.minio_service.download_file(minio_path)
-                        content = file_content.decode('utf-8')
-                        
-                        # 🚀 新增：智能表格感知分块算法
-                        smart_chunks = self._smart_chunk_content(content, file_id, i, minio_path)
-                        chunks.extend(smart_chunks)
-                                
-                except Exception as e:
-                    logger.warning(f"从MinIO读取解析文件失败: {minio_path} - {e}")
+        async def _chunk_block(i: int, minio_path: str) -> List[Dict[str, Any]]:
+            try:
+                # 🔧 优化：从MinIO读取文件而不是本地文件系统
+                # 从MinIO分段读取并增量解码，不同时持有完整的bytes和str
+                decoder = codecs.getincrementaldecoder('utf-8')()
+                parts = []
+                async for data in self.minio_service.iter_ranges(minio_path):
+                    parts.append(decoder.decode(data))
+                parts.append(decoder.decode(b'', final=True))
+                content = ''.join(parts)
+                del parts
+                
+                # 🚀 新增：智能表格感知分块算法 - CPU密集，放到线程池执行，不阻塞事件循环
+                return await asyncio.to_thread(self._smart_chunk_content, content, file_id, i, minio_path)
+                
+            except Exception as e:
+                logger.warning(f"从MinIO读取解析文件失败: {minio_path} - {e}")
+                return []
+        
+        # 各markdown块并发下载和分块，按块顺序合并结果
+        block_chunks = await asyncio.gather(*[
+            _chunk_block(i, minio_path)
+            for i, (block_type, minio_path) in enumerate(zip(block_types, block_paths))
+            if block_type == "markdown" and minio_path
+        ])
+        chunks = [chunk for chunk_list in block_chunks for chunk in chunk_list]
         
         logger.info(f"智能分块完成: {file_id} - {len(chunks)}个语义块")
         return chunks
     
     def _smart_chunk_content(self, content: str, file_id: str, block_index: int, minio_path: str) -> List[Dict[str, Any]]:
         """🚀 智能表格感知分块算法 - 🎯 招标书专用优化"""
-        import re
-        
         chunks = []
         current_pos = 0
         
@@ -670,21 +1073,21 @@ class DocumentService:
         tender_sections = self._identify_tender_sections(content)
         
         # 2️⃣ 表格边界检测（继承原有逻辑）
-        table_start_pattern = r'<table[^>]*>'
-        table_end_pattern = r'</table>'
-        
         table_ranges = []
-        for match in re.finditer(table_start_pattern, content, re.IGNORECASE):
+        for match in _TABLE_START_RE.finditer(content):
             start_pos = match.start()
-            remaining_content = content[start_pos:]
-            end_match = re.search(table_end_pattern, remaining_content, re.IGNORECASE)
+            # 从表格起点直接在原文中搜索，避免每个表格复制一次剩余内容
+            end_match = _TABLE_END_RE.search(content, start_pos)
             
             if end_match:
-                end_pos = start_pos + end_match.end()
-                table_ranges.append((start_pos, end_pos))
+                table_ranges.append((start_pos, end_match.end()))
         
-        # 3️⃣ 关键信息区域检测
+        # 3️⃣ 关键信息区域检测（合并后的区域互不重叠且有序，结束位置单调递增）
         key_info_ranges = self._detect_key_info_ranges(content)
+        key_info_ends = [info_end for _, info_end, _ in key_info_ranges]
+        
+        # 语义边界位置索引（整篇内容只扫描一次）
+        boundary_index = self._build_boundary_index(content)
         
         logger.info(f"🏗️ 招标书结构分析: {len(tender_sections)}个章节, {len(table_ranges)}个表格, {len(key_info_ranges)}个关键信息区域")
         
@@ -697,9 +1100,13 @@ class DocumentService:
             protected_chunk = None
             chunk_type = "text"
             
-            # 检查是否与关键信息区域重叠
-            for info_range in key_info_ranges:
+            # 检查是否与关键信息区域重叠：二分定位第一个结束于chunk_start之后的区域，
+            # 起点超过chunk_end后的区域都不可能重叠
+            for info_index in range(bisect_right(key_info_ends, chunk_start), len(key_info_ranges)):
+                info_range = key_info_ranges[info_index]
                 info_start, info_end, info_type = info_range
+                if info_start >= chunk_end:
+                    break
                 if (chunk_start < info_end and chunk_end > info_start):
                     # 扩展到包含完整关键信息
                     if info_end - chunk_start <= max_chunk_size * 1.5:
@@ -707,7 +1114,7 @@ class DocumentService:
                         chunk_end = min(len(content), info_end + 50)  # 包含后文上下文
                         protected_chunk = info_range
                         chunk_type = f"key_info_{info_type}"
-                        logger.info(f"🔑 保护关键信息区域: {info_type} ({info_start}-{info_end})")
+                        logger.debug("🔑 保护关键信息区域: %s (%d-%d)", info_type, info_start, info_end)
                         break
             
             # 6️⃣ 表格完整性保护（继承原有逻辑）
@@ -721,7 +1128,7 @@ class DocumentService:
                                 chunk_end = table_end
                                 protected_chunk = (table_start, table_end)
                                 chunk_type = "table"
-                                logger.info(f"📊 扩展块以包含完整表格: {table_start}-{table_end}")
+                                logger.debug("📊 扩展块以包含完整表格: %d-%d", table_start, table_end)
                             else:
                                 chunk_end = table_start
                             break
@@ -731,7 +1138,7 @@ class DocumentService:
                             chunk_end = table_end
                             protected_chunk = (table_start, table_end)
                             chunk_type = "table"
-                            logger.info(f"📊 调整块以对齐表格边界: {table_start}-{table_end}")
+                            logger.debug("📊 调整块以对齐表格边界: %d-%d", table_start, table_end)
                             break
             
             # 7️⃣ 章节边界优化
@@ -743,22 +1150,8 @@ class DocumentService:
             
             # 8️⃣ 语义边界优化（招标书专用）
             if not protected_chunk and chunk_end < len(content):
-                boundary_chars = [
-                    '\n\n', '。\n', '：\n', ';\n',  # 段落边界
-                    '）\n', ')\n', '、\n',          # 列表项边界
-                    '要求：', '规定：', '说明：',    # 招标书常见分隔词
-                    '。', '！', '？'               # 句子边界
-                ]
-                best_boundary = chunk_end
-                
                 search_end = min(chunk_end + 300, len(content))  # 扩大搜索范围
-                for boundary in boundary_chars:
-                    pos = content.find(boundary, chunk_end, search_end)
-                    if pos != -1:
-                        best_boundary = pos + len(boundary)
-                        break
-                
-                chunk_end = best_boundary
+                chunk_end = self._find_semantic_boundary(boundary_index, chunk_end, search_end)
             
             # 9️⃣ 创建增强型块
             chunk_text = content[chunk_start:chunk_end].strip()
@@ -795,7 +1188,7 @@ class DocumentService:
                 }
                 
                 chunks.append(chunk_data)
-                logger.debug(f"✅ 创建招标书{chunk_type}块: {chunk_start}-{chunk_end} ({len(chunk_text)}字符)")
+                logger.debug("✅ 创建招标书%s块: %d-%d (%d字符)", chunk_type, chunk_start, chunk_end, len(chunk_text))
             
             # 🔄 位置更新策略
             if protected_chunk or chunk_type.startswith("key_info"):
@@ -812,8 +1205,6 @@ class DocumentService:
     
     def _extract_table_content(self, html_content: str) -> str:
         """从HTML表格中提取纯文本内容，保持结构性"""
-        import re
-        
         try:
             # 移除HTML标签，但保持表格结构
             content = html_content
@@ -856,8 +1247,6 @@ class DocumentService:
     
     def _identify_tender_sections(self, content: str) -> List[Dict[str, Any]]:
         """🏗️ 识别招标书标准章节结构"""
-        import re
-        
         # 招标书常见章节模式
         section_patterns = [
             # 一级标题模式
@@ -896,9 +1285,6 @@ class DocumentService:
     
     def _detect_key_info_ranges(self, content: str) -> List[tuple]:
         """🔍 检测关键信息区域（日期、金额、工期等）"""
-        import re
-        from datetime import datetime
-        
         key_ranges = []
         
         # 1️⃣ 日期信息检测
@@ -977,6 +1363,22 @@ class DocumentService:
                 return section['start']
         return None
     
+    def _build_boundary_index(self, content: str) -> List[Tuple[str, List[int]]]:
+        """为每种语义边界建立有序位置索引（含重叠位置）"""
+        positions = {boundary: [] for boundary in _BOUNDARY_CHARS}
+        for tier in _BOUNDARY_TIERS:
+            for match in tier.finditer(content):
+                positions[match.group(1)].append(match.start())
+        return [(boundary, positions[boundary]) for boundary in _BOUNDARY_CHARS]
+    
+    def _find_semantic_boundary(self, boundary_index: List[Tuple[str, List[int]]], start: int, end: int) -> int:
+        """按优先级查找 [start, end) 内的语义边界，返回边界之后的位置；未找到时返回start"""
+        for boundary, positions in boundary_index:
+            i = bisect_left(positions, start)
+            if i < len(positions) and positions[i] + len(boundary) <= end:
+                return positions[i] + len(boundary)
+        return start
+    
     def _enhance_tender_chunk(self, text: str, chunk_type: str, protected_info: Any) -> str:
         """🎯 招标书内容增强处理"""
         enhanced_text = text
@@ -1023,31 +1425,20 @@ class DocumentService:
     
     def _identify_section_type(self, text: str) -> str:
         """📋 识别章节类型"""
-        import re
-        
-        section_keywords = {
-            "project_overview": ["项目概况", "工程概况", "建设规模", "项目性质"],
-            "bidding_notice": ["投标须知", "投标说明", "投标人须知"],
-            "technical_specs": ["技术规范", "技术要求", "施工标准", "质量标准"],
-            "commercial_terms": ["商务条款", "报价要求", "付款条件", "合同条款"],
-            "qualification": ["资格要求", "投标人资格", "资质要求", "业绩要求"],
-            "schedule": ["工期要求", "进度安排", "里程碑", "节点计划"],
-            "materials": ["材料要求", "设备规格", "材料标准"],
-            "evaluation": ["评标办法", "评标标准", "评标程序"],
-            "contract": ["合同条款", "履约要求", "违约责任"]
-        }
-        
-        text_lower = text.lower()
-        for section_type, keywords in section_keywords.items():
-            if any(keyword in text for keyword in keywords):
-                return section_type
+        # 单次正则扫描，按类型优先级取结果（与逐类型 in 检查的结果一致）
+        best_type = "unknown"
+        best_rank = len(_SECTION_TYPE_RANK)
+        for match in _SECTION_TYPE_RE.finditer(text):
+            rank = _SECTION_TYPE_RANK[match.lastgroup]
+            if rank < best_rank:
+                best_type, best_rank = match.lastgroup, rank
+                if rank == 0:
+                    break
         
-        return "unknown"
+        return best_type
     
     def _calculate_importance_score(self, text: str, chunk_type: str) -> float:
         """📊 计算内容重要性分数（0-1）"""
-        score = 0.5  # 基础分数
-        
         # 1️⃣ 块类型权重
         type_weights = {
             "key_info_date_info": 0.9,
@@ -1060,6 +1451,11 @@ class DocumentService:
         }
         score = type_weights.get(chunk_type, 0.5)
         
+        # 超长文本直接按长度定分，跳过关键词扫描
+        text_length = len(text)
+        if text_length > 8000:
+            return score - 0.05
+        
         # 2️⃣ 关键词权重调整
         high_importance_keywords = [
             "截标时间", "开标时间", "投标截止", "工期", "预算", "投标限价",
@@ -1078,25 +1474,45 @@ class DocumentService:
         score += keyword_count * 0.05
         
         # 3️⃣ 文本长度调整（适中长度更重要）
-        text_length = len(text)
         if 200 <= text_length <= 1000:
             score += 0.1
         elif text_length > 2000:
             score -= 0.05
+        elif text_length < 50:
+            # 过短文本按长度线性降权，从0字符的一半分数平滑过渡到50字符的完整分数
+            score *= 0.5 + 0.5 * text_length / 50
         
         return min(1.0, score)
     
     def _generate_chunking_report(self, chunks: List[Dict], file_id: str):
         """📊 生成分块质量报告"""
         total_chunks = len(chunks)
-        table_chunks = sum(1 for c in chunks if c.get('block_type') == 'table')
-        key_info_chunks = sum(1 for c in chunks if c.get('block_type', '').startswith('key_info'))
-        
-        avg_importance = sum(c.get('tender_info', {}).get('importance_score', 0) for c in chunks) / total_chunks if total_chunks > 0 else 0
-        
-        high_importance_chunks = sum(1 for c in chunks if c.get('tender_info', {}).get('importance_score', 0) > 0.8)
-        
-        structured_data_chunks = sum(1 for c in chunks if c.get('tender_info', {}).get('structured_data'))
+        if total_chunks == 0:
+            logger.info(f"📊 招标书分块质量报告 - {file_id}: 没有生成任何块")
+            return
+        
+        # 单次遍历汇总各项指标
+        table_chunks = 0
+        key_info_chunks = 0
+        high_importance_chunks = 0
+        structured_data_chunks = 0
+        total_importance = 0.0
+        for c in chunks:
+            block_type = c.get('block_type', '')
+            tender_info = c.get('tender_info', {})
+            importance_score = tender_info.get('importance_score', 0)
+            
+            if block_type == 'table':
+                table_chunks += 1
+            elif block_type.startswith('key_info'):
+                key_info_chunks += 1
+            if importance_score > 0.8:
+                high_importance_chunks += 1
+            if tender_info.get('structured_data'):
+                structured_data_chunks += 1
+            total_importance += importance_score
+        
+        avg_importance = total_importance / total_chunks
         
         logger.info(f"📊 招标书分块质量报告 - {file_id}:")
         logger.info(f"   📄 总块数: {total_chunks}")
@@ -1141,7 +1557,6 @@ class DocumentService:
     
     def _extract_dates(self, text: str) -> List[str]:
         """提取日期信息"""
-        import re
         dates = []
         
         date_patterns = [
@@ -1157,7 +1572,6 @@ class DocumentService:
     
     def _extract_amounts(self, text: str) -> List[str]:
         """提取金额信息"""
-        import re
         amounts = []
         
         amount_patterns = [
@@ -1173,23 +1587,17 @@ class DocumentService:
     
     def _extract_requirements(self, text: str) -> List[str]:
         """提取要求信息"""
-        import re
         requirements = []
         
-        req_patterns = [
-            r'[^；。]*要求[：:]?[^；。\n]+',
-            r'[^；。]*标准[：:]?[^；。\n]+',
-            r'[^；。]*规范[：:]?[^；。\n]+'
-        ]
-        
-        for pattern in req_patterns:
-            requirements.extend(re.findall(pattern, text))
+        for pattern in _REQUIREMENT_PATTERNS:
+            requirements.extend(pattern.findall(text))
+            if len(requirements) >= 5:
+                break
         
         return requirements[:5]  # 限制数量
     
     def _extract_deadlines(self, text: str) -> List[str]:
         """提取截止时间信息"""
-        import re
         deadlines = []
         
         deadline_patterns = [
@@ -1205,17 +1613,12 @@ class DocumentService:
     
     def _extract_specifications(self, text: str) -> List[str]:
         """提取规格参数信息"""
-        import re
         specs = []
         
-        spec_patterns = [
-            r'[^；。]*规格[：:]?[^；。\n]+',
-            r'[^；。]*型号[：:]?[^；。\n]+',
-            r'[^；。]*参数[：:]?[^；。\n]+'
-        ]
-        
-        for pattern in spec_patterns:
-            specs.extend(re.findall(pattern, text))
+        for pattern in _SPECIFICATION_PATTERNS:
+            specs.extend(pattern.findall(text))
+            if len(specs) >= 3:
+                break
         
         return specs[:3]  # 限制数量
     
@@ -1231,7 +1634,7 @@ class DocumentService:
         
         try:
             # 获取文件元数据，检查是否属于知识库
-            file_metadata = await self.get_file_info(file_id)
+            file_metadata = await self.get_file_info(file_id, include_parse_result=False)
             if not file_metadata:
                 raise create_service_exception(
                     ErrorCode.FILE_NOT_FOUND,
@@ -1265,12 +1668,8 @@ class DocumentService:
             # 生成向量
             texts = [chunk["text"] for chunk in chunks]
             
-            # 使用RAGAnything生成embeddings
-            embeddings = []
-            for text in texts:
-                # _get_embedding方法内部已经包含了fallback逻辑
-                embedding = await self._get_embedding(text)
-                embeddings.append(embedding)
+            # 分批并发生成embeddings，结果与texts顺序一致
+            embeddings = await self._get_embeddings_batch(texts)
             
             # 存储到向量数据库（使用知识库的集合或默认集合）
             point_ids = await self.vector_service.add_document_chunks(
@@ -1283,14 +1682,15 @@ class DocumentService:
             # 更新文件元数据
             if file_metadata:
                 updated_metadata = {
-                    **file_metadata,
                     "vector_status": "completed",
                     "vectorized_at": datetime.now().isoformat(),
                     "chunk_count": len(chunks),
                     "vector_point_ids": point_ids,
                     "vector_collection": collection_name or "rag_documents"  # 记录向量集合名称
                 }
-                await self.cache_service.save_file_metadata(file_id, updated_metadata)
+                await self.cache_service.save_file_metadata(
+                    file_id, updated_metadata, delete_keys=self._status_cache_keys(file_id)
+                )
             
             result = {
                 "file_id": file_id,
@@ -1305,14 +1705,14 @@ class DocumentService:
         except Exception as e:
             # 更新向量化状态为失败
             try:
-                current_metadata = await self.get_file_info(file_id)
-                if current_metadata:
+                if await self.cache_service.exists(f"file:{file_id}"):
                     updated_metadata = {
-                        **current_metadata,
                         "vector_status": "failed",
                         "vector_error": str(e)
                     }
-                    await self.cache_service.save_file_metadata(file_id, updated_metadata)
+                    await self.cache_service.save_file_metadata(
+                        file_id, updated_metadata, delete_keys=self._status_cache_keys(file_id)
+                    )
             except Exception as meta_error:
                 logger.error(f"更新失败状态元数据失败: {file_id} - {meta_error}")
             
@@ -1322,48 +1722,108 @@ class DocumentService:
                 f"文档向量化失败: {str(e)}"
             )
     
-    async def _get_embedding(self, text: str) -> List[float]:
-        """获取文本的embedding向量"""
+    async def _get_embeddings_batch(
+        self,
+        texts: List[str],
+        batch_size: int = _EMBEDDING_BATCH_SIZE
+    ) -> List[List[float]]:
+        """批量获取embedding向量，结果与texts一一对应
+        
+        命中缓存的文本不再请求；重复文本（页眉页脚、重复表格等）只请求一次；
+        其余按长度排序后每batch_size条一次请求，长度相近的文本同批可减少服务端padding，
+        各批并发提交，信号量限制并发批次数。
+        """
+        embeddings = await self.cache_service.get_embeddings(texts, settings.EMBEDDING_MODEL_NAME)
+        
+        # 未命中的文本去重：文本 -> 所有出现位置
+        missing: Dict[str, List[int]] = {}
+        for i, embedding in enumerate(embeddings):
+            if embedding is None:
+                missing.setdefault(texts[i], []).append(i)
+        if not missing:
+            return embeddings
+        
+        unique_texts = sorted(missing, key=len)
+        batches = [unique_texts[i:i + batch_size] for i in range(0, len(unique_texts), batch_size)]
+        batch_results = await asyncio.gather(*[self._request_embeddings(batch) for batch in batches])
+        for batch, batch_embeddings in zip(batches, batch_results):
+            for text, embedding in zip(batch, batch_embeddings):
+                for i in missing[text]:
+                    embeddings[i] = embedding
+        return embeddings
+    
+    async def _request_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """请求embedding服务，成功的结果写入缓存；重试仍失败时使用本地fallback（不缓存）"""
         try:
             # 检查embedding API配置
             if not settings.EMBEDDING_API_BASE or not settings.EMBEDDING_API_KEY:
                 logger.warning("Embedding API配置不完整，使用本地fallback方案")
                 raise ValueError("Embedding API配置不完整")
             
-            # 使用外部embedding API
-            import httpx
+            request_body = {
+                "model": settings.EMBEDDING_MODEL_NAME,
+                "input": texts
+            }
+            if settings.EMBEDDING_ENCODING_FORMAT == "base64":
+                request_body["encoding_format"] = "base64"
             
-            logger.info(f"DocumentService使用embedding API: {settings.EMBEDDING_API_BASE}")
+            response = await self._post_embeddings(request_body)
+            
+            data = response.json()["data"]
+            if len(data) != len(texts):
+                raise ValueError(f"返回向量数量不匹配: {len(data)} != {len(texts)}")
+            
+            # OpenAI兼容接口按index标识对应的输入
+            data.sort(key=lambda item: item.get("index", 0))
+            embeddings = [decode_embedding(item["embedding"]) for item in data]
+            await self.cache_service.set_embeddings(texts, embeddings, settings.EMBEDDING_MODEL_NAME)
+            
+            logger.info(f"DocumentService批量获取embedding成功: {len(embeddings)}条")
+            return embeddings
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{settings.EMBEDDING_API_BASE}/embeddings",
-                    json={
-                        "model": settings.EMBEDDING_MODEL_NAME,
-                        "input": text
-                    },
-                    headers={
-                        "Authorization": f"Bearer {settings.EMBEDDING_API_KEY}",
-                        "Content-Type": "application/json"
-                    },
-                    timeout=30
-                )
-                response.raise_for_status()
-                
-                data = response.json()
-                embedding = data["data"][0]["embedding"]
-                
-                logger.info(f"DocumentService获取embedding成功: {len(embedding)}维")
-                return embedding
-                
         except Exception as e:
-            logger.warning(f"DocumentService Embedding API失败: {e}")
+            logger.warning(f"DocumentService 批量Embedding API失败: {e}")
             # 使用本地embedding作为fallback
-            from app.services.search_service import SearchService
-            search_service = SearchService()
-            fallback_embedding = await search_service._get_local_embedding(text)
-            logger.info(f"DocumentService使用本地embedding生成向量: {len(fallback_embedding)}维")
-            return fallback_embedding
+            return [await self.search_service._get_local_embedding(text) for text in texts]
+    
+    async def _post_embeddings(self, request_body: Dict[str, Any]) -> httpx.Response:
+        """发送embedding请求 - 信号量限制并发请求数；超时、连接错误、429和5xx按指数退避重试
+        
+        退避等待期间不占用信号量，其他批次可以继续请求。
+        """
+        for attempt in range(1, _EMBEDDING_MAX_ATTEMPTS + 1):
+            try:
+                async with self._embedding_semaphore:
+                    response = await self._embed_client.post("/embeddings", json=request_body, timeout=120)
+                response.raise_for_status()
+                return response
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                retryable = (
+                    not isinstance(e, httpx.HTTPStatusError)
+                    or e.response.status_code == 429
+                    or e.response.status_code >= 500
+                )
+                if not retryable or attempt == _EMBEDDING_MAX_ATTEMPTS:
+                    raise
+                
+                # 指数退避加随机抖动，避免多个批次同时重试
+                delay = min(_EMBEDDING_RETRY_MAX_DELAY, _EMBEDDING_RETRY_BASE_DELAY * 2 ** (attempt - 1))
+                delay = random.uniform(delay / 2, delay)
+                logger.warning("Embedding请求失败，%.1f秒后重试(%d/%d): %s", delay, attempt, _EMBEDDING_MAX_ATTEMPTS, e)
+                await asyncio.sleep(delay)
+    
+    async def _get_embedding(self, text: str) -> List[float]:
+        """获取单条文本的embedding向量 - 重复文本先命中进程内LRU和Redis缓存，并发的相同请求只发送一次"""
+        await self._get_services()
+        
+        pending = self._embedding_inflight.get(text)
+        if pending is None:
+            pending = asyncio.ensure_future(self._get_embeddings_batch([text]))
+            self._embedding_inflight[text] = pending
+            pending.add_done_callback(lambda _: self._embedding_inflight.pop(text, None))
+        
+        # shield：单个调用方被取消时不影响共享同一请求的其他调用方
+        return (await asyncio.shield(pending))[0]
     
     async def list_files(
         self,
@@ -1371,29 +1831,39 @@ class DocumentService:
         offset: int = 0,
         status_filter: Optional[str] = None
     ) -> List[Dict[str, Any]]:
-        """列出文件"""
+        """列出文件 - 按上传时间倒序分页，通过Redis有序集合索引只读取当前页"""
         await self._get_services()
         
         try:
-            # 获取所有文件keys
-            keys = []
-            cursor = 0
-            while True:
-                cursor, new_keys = await self.cache_service.redis.scan(
-                    cursor, match="file:*", count=100
-                )
-                keys.extend(new_keys)
-                if cursor == 0:
-                    break
+            file_ids = await self.cache_service.list_file_ids(offset, limit, status_filter)
+            if file_ids is not None:
+                files_data = await self.cache_service.hgetall_many([f"file:{file_id}" for file_id in file_ids])
+                
+                # 元数据已过期的文件顺带移出索引
+                expired = [file_id for file_id, file_data in zip(file_ids, files_data) if not file_data]
+                if expired:
+                    await self.cache_service.remove_from_file_index(expired, status_filter)
+                
+                return [file_data for file_data in files_data if file_data]
+            
+            # 索引尚未建立：全量扫描一次并回填索引
+            keys = [
+                key async for key in self.cache_service.redis.scan_iter(match="file:*", count=_FILE_SCAN_COUNT)
+            ]
+            
+            # 一次管道读取所有文件元数据，而不是逐个HGETALL
+            all_files = {
+                key.split(":", 1)[1]: file_data
+                for key, file_data in zip(keys, await self.cache_service.hgetall_many(keys))
+                if file_data
+            }
+            await self.cache_service.index_files(all_files)
             
-            files = []
-            for key in keys:
-                file_data = await self.cache_service.hgetall(key)
-                if file_data:
-                    # 应用状态过滤
-                    if status_filter and file_data.get("status") != status_filter:
-                        continue
-                    files.append(file_data)
+            files = [
+                file_data for file_data in all_files.values()
+                # 应用状态过滤
+                if not status_filter or file_data.get("status") == status_filter
+            ]
             
             # 按上传时间排序
             files.sort(key=lambda x: x.get("upload_date", ""), reverse=True)
@@ -1413,7 +1883,7 @@ class DocumentService:
             await self._get_services()
             
             # 检查文件是否存在
-            file_info = await self.get_file_info(file_id)
+            file_info = await self.get_file_info(file_id, include_parse_result=False)
             if not file_info:
                 raise create_service_exception(
                     ErrorCode.FILE_NOT_FOUND,
@@ -1449,23 +1919,25 @@ class DocumentService:
                 "priority": priority,
                 "metadata": {
                     "file_size": file_info.get("file_size"),
-                    "content_type": file_info.get("content_type"),
-                    "parse_result": file_info.get("parse_result")
+                    "content_type": file_info.get("content_type")
                 }
             }
             
-            # 保存任务信息
-            await self.cache_service.set_task_info(task_id, task_data)
-            
-            # 根据优先级添加到不同队列
-            if priority > 0:
-                await self.cache_service.add_priority_task("document_vectorize", task_data, priority)
-            else:
-                await self.cache_service.add_to_queue("document_vectorize", task_data)
-            
-            # 更新文件状态
-            await self.cache_service.hset_field(f"file:{file_id}", "vectorize_status", "pending")
-            await self.cache_service.hset_field(f"file:{file_id}", "vectorize_task_id", task_id)
+            # 保存任务信息、按优先级入队并更新文件状态 - 一次往返
+            created = await self.cache_service.set_task_and_enqueue(
+                task_id,
+                task_data,
+                "document_vectorize",
+                priority=priority,
+                file_id=file_id,
+                file_fields={"vectorize_status": "pending", "vectorize_task_id": task_id},
+                delete_keys=self._status_cache_keys(file_id)
+            )
+            if not created:
+                raise create_service_exception(
+                    ErrorCode.TASK_CREATION_FAILED,
+                    f"向量化任务写入队列失败: {file_id}"
+                )
             
             logger.info(f"向量化任务已创建: {task_id} - 文件: {file_id}")
             return task_id
@@ -1489,21 +1961,37 @@ class DocumentService:
                 "failed_operations": []
             }
             
-            for file_id in file_ids:
-                try:
-                    if "parse" in operations:
-                        task_id = await self.start_parse_task(file_id, priority)
-                        results["parse_tasks"].append(task_id)
-                    
-                    if "vectorize" in operations:
-                        # 如果同时有解析任务，等解析完成后再进行向量化
-                        # 这里可以设置依赖关系或延迟处理
-                        task_id = await self.start_vectorize_task(file_id, priority)
-                        results["vectorize_tasks"].append(task_id)
+            semaphore = asyncio.Semaphore(_BATCH_SUBMIT_CONCURRENCY)
+            
+            async def _submit_one(file_id: str) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+                """提交单个文件的任务，返回(解析任务ID, 向量化任务ID, 错误信息)"""
+                parse_task_id = vectorize_task_id = None
+                async with semaphore:
+                    try:
+                        if "parse" in operations:
+                            parse_task_id = await self.start_parse_task(file_id, priority)
                         
-                except Exception as e:
-                    logger.error(f"批量处理失败: {file_id} - {e}")
-                    results["failed_operations"].append(f"{file_id}: {str(e)}")
+                        if "vectorize" in operations:
+                            # 如果同时有解析任务，等解析完成后再进行向量化
+                            # 这里可以设置依赖关系或延迟处理
+                            vectorize_task_id = await self.start_vectorize_task(file_id, priority)
+                            
+                    except Exception as e:
+                        logger.error(f"批量处理失败: {file_id} - {e}")
+                        return parse_task_id, vectorize_task_id, f"{file_id}: {str(e)}"
+                
+                return parse_task_id, vectorize_task_id, None
+            
+            # 各文件的任务提交互不依赖，并发执行，结果按file_ids顺序汇总
+            for parse_task_id, vectorize_task_id, error in await asyncio.gather(
+                *[_submit_one(file_id) for file_id in file_ids]
+            ):
+                if parse_task_id:
+                    results["parse_tasks"].append(parse_task_id)
+                if vectorize_task_id:
+                    results["vectorize_tasks"].append(vectorize_task_id)
+                if error:
+                    results["failed_operations"].append(error)
             
             logger.info(f"批量处理完成 - 解析任务: {len(results['parse_tasks'])}, 向量化任务: {len(results['vectorize_tasks'])}")
             return results
@@ -1520,118 +2008,134 @@ class DocumentService:
         try:
             await self._get_services()
             
-            # 获取基本文件信息
-            file_info = await self.get_file_info(file_id)
+            # 短时缓存，应对前端高频轮询
+            status_cache_key = f"stats:file:{file_id}"
+            cached_status = await self.cache_service.get_json(status_cache_key)
+            if cached_status:
+                return cached_status
+            
+            # 获取基本文件信息 - 状态数据只用到Redis中的元数据，无需再查询MinIO对象信息
+            file_info = await self.cache_service.get_file_metadata(file_id)
             if not file_info:
                 return {"exists": False}
             
-            # 获取解析状态
-            parse_status = file_info.get("parse_status", "pending")
+            # 获取任务详细信息 - 两个任务哈希在同一个管道中读取，只需一次往返
             parse_task_id = file_info.get("parse_task_id")
-            
-            # 获取向量化状态
-            vectorize_status = file_info.get("vectorize_status", "pending")
             vectorize_task_id = file_info.get("vectorize_task_id")
+            task_infos = await self.cache_service.get_task_info_many(
+                [task_id for task_id in (parse_task_id, vectorize_task_id) if task_id]
+            )
             
-            # 获取任务详细信息
-            parse_task_info = None
-            vectorize_task_info = None
+            status_data = self._build_status_dict(
+                file_id, file_info, task_infos.get(parse_task_id), task_infos.get(vectorize_task_id)
+            )
             
-            if parse_task_id:
-                parse_task_info = await self.cache_service.get_task_info(parse_task_id)
+            await self.cache_service.set(status_cache_key, status_data, expire=_FILE_STATUS_CACHE_TTL)
+            return status_data
             
-            if vectorize_task_id:
-                vectorize_task_info = await self.cache_service.get_task_info(vectorize_task_id)
+        except Exception as e:
+            logger.error(f"获取文件处理状态失败: {file_id} - {e}")
+            raise create_service_exception(
+                ErrorCode.INTERNAL_SERVER_ERROR,
+                f"获取处理状态失败: {str(e)}"
+            )
+    
+    async def get_file_processing_statuses(self, file_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """批量获取多个文件的处理状态 - 文件元数据和任务信息各一次管道查询，避免N+1"""
+        try:
+            await self._get_services()
             
-            # 计算总体进度
-            progress = 0
-            if parse_status == "completed":
-                progress += 50
-            elif parse_status == "running":
-                progress += 25
-            
-            if vectorize_status == "completed":
-                progress += 50
-            elif vectorize_status == "running":
-                progress += 25
-            
-            status_data = {
-                "exists": True,
-                "file_id": file_id,
-                "filename": file_info.get("filename"),
-                "upload_date": file_info.get("upload_date"),
-                "file_size": file_info.get("file_size"),
-                "total_progress": progress,
-                "parse": {
-                    "status": parse_status,
-                    "task_id": parse_task_id,
-                    "task_info": parse_task_info,
-                    "result": file_info.get("parse_result")
-                },
-                "vectorize": {
-                    "status": vectorize_status,
-                    "task_id": vectorize_task_id,
-                    "task_info": vectorize_task_info,
-                    "vector_count": file_info.get("vector_count", 0)
-                },
-                "last_updated": file_info.get("updated_at", file_info.get("upload_date"))
+            metadata_list = await self.cache_service.get_file_metadata_many(file_ids)
+            
+            task_ids = {
+                task_id
+                for file_info in metadata_list if file_info
+                for task_id in (file_info.get("parse_task_id"), file_info.get("vectorize_task_id")) if task_id
             }
+            task_infos = await self.cache_service.get_task_info_many(list(task_ids))
+            
+            statuses = {}
+            for file_id, file_info in zip(file_ids, metadata_list):
+                if not file_info:
+                    statuses[file_id] = {"exists": False}
+                    continue
+                statuses[file_id] = self._build_status_dict(
+                    file_id,
+                    file_info,
+                    task_infos.get(file_info.get("parse_task_id")),
+                    task_infos.get(file_info.get("vectorize_task_id"))
+                )
             
-            return status_data
+            return statuses
             
         except Exception as e:
-            logger.error(f"获取文件处理状态失败: {file_id} - {e}")
+            logger.error(f"批量获取文件处理状态失败: {e}")
             raise create_service_exception(
                 ErrorCode.INTERNAL_SERVER_ERROR,
-                f"获取处理状态失败: {str(e)}"
+                f"批量获取处理状态失败: {str(e)}"
             )
     
+    @staticmethod
+    def _build_status_dict(
+        file_id: str,
+        file_info: Dict[str, Any],
+        parse_task_info: Optional[Dict[str, Any]],
+        vectorize_task_info: Optional[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """根据文件元数据和任务信息组装处理状态（纯函数，不做IO）"""
+        parse_status = file_info.get("parse_status", "pending")
+        vectorize_status = file_info.get("vectorize_status", "pending")
+        upload_date = file_info.get("upload_date")
+        
+        return {
+            "exists": True,
+            "file_id": file_id,
+            "filename": file_info.get("filename"),
+            "upload_date": upload_date,
+            "file_size": file_info.get("file_size"),
+            # 计算总体进度
+            "total_progress": _STATUS_PROGRESS.get(parse_status, 0) + _STATUS_PROGRESS.get(vectorize_status, 0),
+            "parse": {
+                "status": parse_status,
+                "task_id": file_info.get("parse_task_id"),
+                "task_info": parse_task_info,
+                "result": file_info.get("parse_result")
+            },
+            "vectorize": {
+                "status": vectorize_status,
+                "task_id": file_info.get("vectorize_task_id"),
+                "task_info": vectorize_task_info,
+                "vector_count": file_info.get("vector_count", 0)
+            },
+            "last_updated": file_info.get("updated_at") or upload_date
+        }
+    
     async def get_processing_statistics(self) -> Dict[str, Any]:
         """获取处理统计信息 - 参考mineru-web的监控面板"""
         try:
             await self._get_services()
             
-            # 获取队列统计
-            parse_stats = await self.cache_service.get_queue_stats("document_parse")
-            vectorize_stats = await self.cache_service.get_queue_stats("document_vectorize")
-            
-            # 获取文件统计
-            files = await self.list_files(limit=1000)
-            
-            # 统计各种状态的文件
-            status_counts = {
-                "total_files": len(files),
-                "parsed_files": 0,
-                "vectorized_files": 0,
-                "processing_files": 0,
-                "failed_files": 0
-            }
-            
-            file_sizes = []
-            processing_times = []
+            # 短时缓存，应对仪表板高频轮询
+            cached_statistics = await self.cache_service.get_json(_PROCESSING_STATS_CACHE_KEY)
+            if cached_statistics:
+                return cached_statistics
             
-            for file in files:
-                parse_status = file.get("parse_status", "pending")
-                vectorize_status = file.get("vectorize_status", "pending")
-                
-                if parse_status == "completed":
-                    status_counts["parsed_files"] += 1
-                
-                if vectorize_status == "completed":
-                    status_counts["vectorized_files"] += 1
-                
-                if parse_status == "running" or vectorize_status == "running":
-                    status_counts["processing_files"] += 1
-                
-                if parse_status == "failed" or vectorize_status == "failed":
-                    status_counts["failed_files"] += 1
-                
-                # 收集文件大小用于统计
-                if file.get("file_size"):
-                    file_sizes.append(file["file_size"])
+            # 获取队列统计
+            queue_stats = await self.cache_service.get_queue_stats_multi(["document_parse", "document_vectorize"])
+            parse_stats = queue_stats["document_parse"]
+            vectorize_stats = queue_stats["document_vectorize"]
+            
+            # 获取文件统计 - 优先读取计数器，计数器过期时全量汇总一次并重新校准
+            file_stats = (
+                await self.cache_service.get_file_counters()
+                or await self.cache_service.aggregate_file_statistics()
+            )
+            total_size = file_stats.pop("total_size")
+            sized_files = file_stats.pop("sized_files")
+            status_counts = file_stats
             
             # 计算统计指标
-            avg_file_size = sum(file_sizes) / len(file_sizes) if file_sizes else 0
+            avg_file_size = total_size / sized_files if sized_files else 0
             success_rate = (status_counts["parsed_files"] / status_counts["total_files"] * 100) if status_counts["total_files"] > 0 else 0
             
             statistics = {
@@ -1643,7 +2147,7 @@ class DocumentService:
                 "performance_metrics": {
                     "average_file_size_mb": round(avg_file_size / (1024 * 1024), 2),
                     "success_rate_percent": round(success_rate, 1),
-                    "total_storage_mb": round(sum(file_sizes) / (1024 * 1024), 2)
+                    "total_storage_mb": round(total_size / (1024 * 1024), 2)
                 },
                 "system_health": {
                     "active_tasks": parse_stats["running_tasks"] + vectorize_stats["running_tasks"],
@@ -1653,6 +2157,7 @@ class DocumentService:
                 "updated_at": datetime.utcnow().isoformat()
             }
             
+            await self.cache_service.set(_PROCESSING_STATS_CACHE_KEY, statistics, expire=_PROCESSING_STATS_CACHE_TTL)
             return statistics
             
         except Exception as e:
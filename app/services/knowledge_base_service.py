@@ -3,8 +3,9 @@
 提供知识库的创建、管理、检索等功能
 """
 
-import uuid
+import secrets
 import asyncio
+from collections import Counter
 from datetime import datetime
 from typing import Optional, List, Dict, Any, Tuple
 from app.core.config import settings
@@ -22,6 +23,26 @@ import logging
 
 logger = logging.getLogger("rag-anything")
 
+# 删除知识库时同时删除的文件数，限制Redis/MinIO连接压力
+_DELETE_FILE_CONCURRENCY = 32
+
+# 一页知识库超过该数量时在线程池中解析JSON，避免长时间占用事件循环
+_KB_PARSE_OFFLOAD_THRESHOLD = 50
+
+
+def _parse_knowledge_bases(kb_ids: List[str], raws: List[Optional[str]]) -> List[Optional[KnowledgeBase]]:
+    """把知识库JSON逐条解析为模型，缺失或无法解析的为None"""
+    knowledge_bases = []
+    for kb_id, raw in zip(kb_ids, raws):
+        knowledge_base = None
+        if raw:
+            try:
+                knowledge_base = KnowledgeBase.model_validate_json(raw)
+            except Exception as e:
+                logger.error(f"获取知识库失败: {kb_id} - {e}")
+        knowledge_bases.append(knowledge_base)
+    return knowledge_bases
+
 
 class KnowledgeBaseService:
     """知识库管理服务"""
@@ -31,8 +52,24 @@ class KnowledgeBaseService:
         self.vector_service = None
         self.document_service = None
         self.minio_service = None
+        self._init_lock = asyncio.Lock()
+        self._ready = False
+        # 正在进行的全量统计重建，同一知识库的多次触发合并为一次
+        self._stats_rebuilds: Dict[str, asyncio.Task] = {}
         
     async def _get_services(self):
+        """获取依赖服务 - 只初始化一次，之后直接返回"""
+        if self._ready:
+            return
+        
+        async with self._init_lock:
+            # 等锁期间可能已被其他协程初始化完成
+            if self._ready:
+                return
+            await self._init_services()
+            self._ready = True
+    
+    async def _init_services(self):
         """延迟初始化服务依赖"""
         if not self.cache_service:
             self.cache_service = await get_cache_service()
@@ -45,7 +82,7 @@ class KnowledgeBaseService:
     
     def _generate_kb_id(self) -> str:
         """生成知识库ID"""
-        return f"kb_{uuid.uuid4().hex[:12]}"
+        return f"kb_{secrets.token_hex(6)}"
     
     def _generate_collection_name(self, kb_id: str) -> str:
         """生成Qdrant集合名称"""
@@ -94,14 +131,8 @@ class KnowledgeBaseService:
                     f"创建向量集合失败: {collection_name}"
                 )
             
-            # 保存知识库元数据
-            await self.cache_service.save_data(
-                f"knowledge_base:{kb_id}",
-                knowledge_base.dict()
-            )
-            
-            # 添加到知识库列表
-            await self.cache_service.redis.sadd("knowledge_bases", kb_id)
+            # 保存知识库元数据、初始化计数器并添加到知识库列表（一次往返）
+            await self._save_knowledge_base(knowledge_base, counters=self._empty_counters())
             
             logger.info(f"知识库创建成功: {kb_id} - {request.name}")
             return knowledge_base
@@ -113,21 +144,94 @@ class KnowledgeBaseService:
                 f"知识库创建失败: {str(e)}"
             )
     
+    async def _save_knowledge_base(
+        self,
+        knowledge_base: KnowledgeBase,
+        counters: Optional[Dict[str, Any]] = None,
+        previous_status: Optional[str] = None
+    ):
+        """保存知识库 - 由pydantic直接序列化为JSON，不再先转dict再json.dumps"""
+        await self.cache_service.save_knowledge_base(
+            knowledge_base.kb_id,
+            knowledge_base.model_dump_json(),
+            knowledge_base.created_at.timestamp(),
+            knowledge_base.status.value,
+            counters=counters,
+            previous_status=previous_status
+        )
+    
     async def get_knowledge_base(self, kb_id: str) -> Optional[KnowledgeBase]:
         """获取知识库信息"""
         await self._get_services()
         
         try:
-            kb_data = await self.cache_service.get_data(f"knowledge_base:{kb_id}")
-            if not kb_data:
-                return None
-            
-            return KnowledgeBase(**kb_data)
+            knowledge_base, _ = await self._load_knowledge_base(kb_id)
+            return knowledge_base
             
         except Exception as e:
             logger.error(f"获取知识库失败: {kb_id} - {e}")
             return None
     
+    async def _load_knowledge_base(
+        self,
+        kb_id: str,
+        wait_for_counters: bool = False
+    ) -> Tuple[Optional[KnowledgeBase], Dict[str, Any]]:
+        """一次往返读取知识库及其计数器
+        
+        计数器尚未建立或已过期时在后台全量统计重建，默认不等待，先返回元数据中保存的统计值；
+        wait_for_counters=True时等待重建完成（详细统计需要分布数据）。
+        """
+        (raw, counters), = await self.cache_service.get_knowledge_bases([kb_id])
+        if not raw:
+            return None, {}
+        
+        knowledge_base = KnowledgeBase.model_validate_json(raw)
+        if "file_count" in counters:
+            self._apply_counters(knowledge_base, counters)
+            return knowledge_base, counters
+        
+        rebuild = self._schedule_stats_rebuild(kb_id)
+        if not wait_for_counters:
+            return knowledge_base, {}
+        
+        counters = await asyncio.shield(rebuild)
+        if counters:
+            self._apply_counters(knowledge_base, counters)
+        return knowledge_base, counters
+    
+    def _schedule_stats_rebuild(self, kb_id: str) -> asyncio.Task:
+        """在后台全量统计知识库，已有重建在进行时直接复用"""
+        rebuild = self._stats_rebuilds.get(kb_id)
+        if rebuild is None:
+            rebuild = asyncio.create_task(self._update_knowledge_base_stats(kb_id))
+            self._stats_rebuilds[kb_id] = rebuild
+            rebuild.add_done_callback(lambda _: self._stats_rebuilds.pop(kb_id, None))
+        return rebuild
+    
+    @staticmethod
+    def _empty_counters() -> Dict[str, int]:
+        """新知识库的计数器"""
+        return {"file_count": 0, "total_size": 0, "parsed_files": 0, "vectorized_files": 0}
+    
+    @staticmethod
+    def _apply_counters(knowledge_base: KnowledgeBase, counters: Dict[str, Any]):
+        """用计数器覆盖知识库中的统计字段"""
+        knowledge_base.file_count = int(counters.get("file_count", 0))
+        knowledge_base.total_size = int(counters.get("total_size", 0))
+        knowledge_base.document_count = int(counters.get("parsed_files", 0))
+        if "vector_count" in counters:
+            knowledge_base.vector_count = int(counters["vector_count"])
+    
+    @staticmethod
+    def _counter_distribution(counters: Dict[str, Any], prefix: str) -> Dict[str, int]:
+        """从计数器中取出prefix:{值}形式的分布字段，忽略已减为0的项"""
+        distribution = {}
+        for field, count in counters.items():
+            if field.startswith(prefix) and int(count) > 0:
+                distribution[field[len(prefix):]] = int(count)
+        return distribution
+    
     async def update_knowledge_base(self, kb_id: str, request: KnowledgeBaseUpdate) -> Optional[KnowledgeBase]:
         """更新知识库"""
         await self._get_services()
@@ -142,6 +246,7 @@ class KnowledgeBaseService:
                 )
             
             # 更新字段
+            previous_status = knowledge_base.status.value
             update_data = request.dict(exclude_unset=True)
             for field, value in update_data.items():
                 if field in ["top_k", "score_threshold", "hnsw_ef_search"]:
@@ -153,11 +258,8 @@ class KnowledgeBaseService:
             # 更新时间戳
             knowledge_base.updated_at = datetime.now()
             
-            # 保存更新后的数据
-            await self.cache_service.save_data(
-                f"knowledge_base:{kb_id}",
-                knowledge_base.dict()
-            )
+            # 保存更新后的数据（统计字段由计数器维护，这里只在用户修改配置时整体写入一次）
+            await self._save_knowledge_base(knowledge_base, previous_status=previous_status)
             
             logger.info(f"知识库更新成功: {kb_id}")
             return knowledge_base
@@ -183,25 +285,28 @@ class KnowledgeBaseService:
             collection_name = knowledge_base.qdrant_config.collection_name
             
             # 删除向量集合
-            await self.vector_service.delete_collection(collection_name)
+            operations = [self.vector_service.delete_collection(collection_name)]
             
             if delete_files:
                 # 获取知识库中的所有文件
                 file_ids = await self.get_knowledge_base_files(kb_id)
+                semaphore = asyncio.Semaphore(_DELETE_FILE_CONCURRENCY)
+                
+                async def _delete_one(file_id: str):
+                    async with semaphore:
+                        await self.document_service.delete_file(
+                            file_id, 
+                            delete_parsed_data=True, 
+                            delete_vector_data=False  # 整个向量集合一并删除
+                        )
                 
-                # 删除所有文件
-                for file_id in file_ids:
-                    await self.document_service.delete_file(
-                        file_id, 
-                        delete_parsed_data=True, 
-                        delete_vector_data=False  # 向量集合已删除
-                    )
+                operations += [_delete_one(file_id) for file_id in file_ids]
             
-            # 删除知识库元数据
-            await self.cache_service.delete_data(f"knowledge_base:{kb_id}")
+            # 向量集合与各文件的删除互不依赖，并发执行
+            await asyncio.gather(*operations)
             
-            # 从知识库列表中移除
-            await self.cache_service.redis.srem("knowledge_bases", kb_id)
+            # 删除知识库元数据并从知识库列表中移除（一次往返）
+            await self.cache_service.remove_knowledge_base(kb_id, knowledge_base.status.value)
             
             logger.info(f"知识库删除成功: {kb_id}")
             return True
@@ -220,27 +325,34 @@ class KnowledgeBaseService:
         await self._get_services()
         
         try:
-            # 获取所有知识库ID
-            kb_ids = await self.cache_service.redis.smembers("knowledge_bases")
-            kb_ids = [kb_id.decode() if isinstance(kb_id, bytes) else kb_id for kb_id in kb_ids]
+            # 按创建时间倒序只读取当前页的知识库ID
+            status = status_filter.value if status_filter else None
+            page = await self.cache_service.list_knowledge_base_ids(offset, limit, status)
+            if page is None:
+                # 列表索引尚未建立（升级前创建的知识库），回填一次
+                await self.cache_service.index_knowledge_bases()
+                page = await self.cache_service.list_knowledge_base_ids(offset, limit, status)
+            kb_ids, total = page
+            
+            # 批量获取知识库数据及计数器（一次管道往返）
+            kb_data_list = await self.cache_service.get_knowledge_bases(kb_ids)
+            
+            raws = [raw for raw, _ in kb_data_list]
+            if len(raws) > _KB_PARSE_OFFLOAD_THRESHOLD:
+                loop = asyncio.get_running_loop()
+                parsed = await loop.run_in_executor(None, _parse_knowledge_bases, kb_ids, raws)
+            else:
+                parsed = _parse_knowledge_bases(kb_ids, raws)
             
-            # 批量获取知识库数据
             knowledge_bases = []
-            for kb_id in kb_ids:
-                kb = await self.get_knowledge_base(kb_id)
-                if kb:
-                    # 状态过滤
-                    if status_filter is None or kb.status == status_filter:
-                        knowledge_bases.append(kb)
+            for kb, (_, counters) in zip(parsed, kb_data_list):
+                if kb is None:
+                    continue
+                if "file_count" in counters:
+                    self._apply_counters(kb, counters)
+                knowledge_bases.append(kb)
             
-            # 排序（按创建时间倒序）
-            knowledge_bases.sort(key=lambda x: x.created_at, reverse=True)
-            
-            # 分页
-            total = len(knowledge_bases)
-            paginated = knowledge_bases[offset:offset + limit]
-            
-            return paginated, total
+            return knowledge_bases, total
             
         except Exception as e:
             logger.error(f"列出知识库失败: {e}")
@@ -259,24 +371,14 @@ class KnowledgeBaseService:
                     f"知识库不存在: {kb_id}"
                 )
             
-            # 更新文件元数据，添加知识库关联
-            file_metadata = await self.document_service.get_file_info(file_id)
-            if not file_metadata:
+            # 写入关联字段、添加到知识库文件列表并增加计数器（服务端脚本，一次往返）
+            linked = await self.cache_service.link_file_to_knowledge_base(file_id, kb_id, knowledge_base.name)
+            if linked < 0:
                 raise create_service_exception(
                     ErrorCode.FILE_NOT_FOUND,
                     f"文件不存在: {file_id}"
                 )
             
-            file_metadata["kb_id"] = kb_id
-            file_metadata["kb_name"] = knowledge_base.name
-            await self.cache_service.save_file_metadata(file_id, file_metadata)
-            
-            # 添加到知识库文件列表
-            await self.cache_service.redis.sadd(f"kb_files:{kb_id}", file_id)
-            
-            # 更新知识库统计
-            await self._update_knowledge_base_stats(kb_id)
-            
             logger.info(f"文件添加到知识库成功: {file_id} -> {kb_id}")
             return True
             
@@ -289,15 +391,8 @@ class KnowledgeBaseService:
         await self._get_services()
         
         try:
-            # 从文件元数据中移除知识库关联
-            file_metadata = await self.document_service.get_file_info(file_id)
-            if file_metadata:
-                file_metadata.pop("kb_id", None)
-                file_metadata.pop("kb_name", None)
-                await self.cache_service.save_file_metadata(file_id, file_metadata)
-            
-            # 从知识库文件列表中移除
-            await self.cache_service.redis.srem(f"kb_files:{kb_id}", file_id)
+            # 移除知识库关联、移出知识库文件列表并减少计数器（服务端脚本，一次往返）
+            await self.cache_service.unlink_file_from_knowledge_base(file_id, kb_id)
             
             # 删除该文件的向量数据（从知识库的向量集合中）
             knowledge_base = await self.get_knowledge_base(kb_id)
@@ -307,9 +402,6 @@ class KnowledgeBaseService:
                     knowledge_base.qdrant_config.collection_name
                 )
             
-            # 更新知识库统计
-            await self._update_knowledge_base_stats(kb_id)
-            
             logger.info(f"文件从知识库移除成功: {file_id} <- {kb_id}")
             return True
             
@@ -328,112 +420,114 @@ class KnowledgeBaseService:
             logger.error(f"获取知识库文件失败: {kb_id} - {e}")
             return []
     
-    async def _update_knowledge_base_stats(self, kb_id: str):
-        """更新知识库统计信息"""
+    async def _update_knowledge_base_stats(
+        self,
+        kb_id: str,
+        knowledge_base: Optional[KnowledgeBase] = None
+    ) -> Dict[str, Any]:
+        """全量统计知识库并重建计数器 - 计数器缺失或过期（每天校准一次）时使用，日常增减由计数器维护
+        
+        在后台运行，只写入kb:counters:{kb_id}（向量数量也保存在其中），不改写知识库元数据，
+        以免覆盖期间的用户修改或把已删除的知识库重新写回。返回重建后的计数器，失败或知识库已删除时返回空字典。
+        """
         try:
-            knowledge_base = await self.get_knowledge_base(kb_id)
+            if knowledge_base is None:
+                knowledge_base = await self.get_knowledge_base(kb_id)
             if not knowledge_base:
-                return
+                return {}
             
             # 获取文件列表
             file_ids = await self.get_knowledge_base_files(kb_id)
             
+            # 一次管道读取全部文件元数据，再在内存中汇总
+            files_metadata = [
+                file_metadata for file_metadata in await self.document_service.get_files_info(file_ids)
+                if file_metadata
+            ]
+            
+            # 文件类型、解析状态、向量化状态分布
+            file_types = Counter(m.get("content_type") or "unknown" for m in files_metadata)
+            parse_statuses = Counter(m.get("parse_status") or "pending" for m in files_metadata)
+            vector_statuses = Counter(m.get("vector_status") or "pending" for m in files_metadata)
+            
             # 统计信息
-            total_size = 0
-            parsed_files = 0
-            vectorized_files = 0
+            counters: Dict[str, Any] = {
+                "file_count": len(files_metadata),
+                "total_size": sum(int(m.get("file_size") or 0) for m in files_metadata),
+                "parsed_files": parse_statuses["completed"],
+                "vectorized_files": vector_statuses["completed"]
+            }
+            for prefix, distribution in (
+                ("file_types", file_types),
+                ("parse_status", parse_statuses),
+                ("vector_status", vector_statuses)
+            ):
+                counters.update({f"{prefix}:{value}": count for value, count in distribution.items()})
+            
+            # 最后索引时间：ISO-8601字符串可直接按字典序取最大值，无需逐个解析
+            last_indexed = max(
+                (m["vectorized_at"] for m in files_metadata if m.get("vectorized_at")),
+                default=None
+            )
             
-            for file_id in file_ids:
-                file_metadata = await self.document_service.get_file_info(file_id)
-                if file_metadata:
-                    total_size += file_metadata.get("file_size", 0)
-                    if file_metadata.get("parse_status") == "completed":
-                        parsed_files += 1
-                    if file_metadata.get("vector_status") == "completed":
-                        vectorized_files += 1
+            if last_indexed:
+                counters["last_indexed"] = last_indexed
             
             # 获取向量数量
-            vector_count = await self.vector_service.count_points(
+            counters["vector_count"] = await self.vector_service.count_points(
                 knowledge_base.qdrant_config.collection_name
             )
             
-            # 更新知识库统计
-            knowledge_base.file_count = len(file_ids)
-            knowledge_base.document_count = parsed_files
-            knowledge_base.vector_count = vector_count
-            knowledge_base.total_size = total_size
-            knowledge_base.updated_at = datetime.now()
-            
-            # 保存更新
-            await self.cache_service.save_data(
-                f"knowledge_base:{kb_id}",
-                knowledge_base.dict()
-            )
+            # 只覆盖计数器；统计期间知识库被删除时放弃写入
+            if not await self.cache_service.replace_knowledge_base_counters(kb_id, counters):
+                logger.info(f"知识库已删除，放弃统计结果: {kb_id}")
+                return {}
+            return counters
             
         except Exception as e:
             logger.error(f"更新知识库统计失败: {kb_id} - {e}")
+            return {}
     
     async def get_knowledge_base_stats(self, kb_id: str) -> Optional[KnowledgeBaseStats]:
-        """获取知识库详细统计信息"""
+        """获取知识库详细统计信息 - 直接读取计数器，不再逐个读取文件元数据"""
         await self._get_services()
         
         try:
-            knowledge_base = await self.get_knowledge_base(kb_id)
+            knowledge_base, counters = await self._load_knowledge_base(kb_id, wait_for_counters=True)
             if not knowledge_base:
                 return None
             
-            # 获取文件详细统计
-            file_ids = await self.get_knowledge_base_files(kb_id)
+            file_count = int(counters.get("file_count", 0))
+            total_size = int(counters.get("total_size", 0))
             
-            file_type_distribution = {}
-            parse_status_distribution = {}
-            vector_status_distribution = {}
-            total_size = 0
-            last_indexed = None
+            # 计算平均文件大小
+            avg_file_size = total_size / file_count if file_count else 0
             
-            for file_id in file_ids:
-                file_metadata = await self.document_service.get_file_info(file_id)
-                if file_metadata:
-                    # 文件类型分布
-                    file_type = file_metadata.get("content_type", "unknown")
-                    file_type_distribution[file_type] = file_type_distribution.get(file_type, 0) + 1
-                    
-                    # 解析状态分布
-                    parse_status = file_metadata.get("parse_status", "pending")
-                    parse_status_distribution[parse_status] = parse_status_distribution.get(parse_status, 0) + 1
-                    
-                    # 向量化状态分布
-                    vector_status = file_metadata.get("vector_status", "pending")
-                    vector_status_distribution[vector_status] = vector_status_distribution.get(vector_status, 0) + 1
-                    
-                    # 累计大小
-                    total_size += file_metadata.get("file_size", 0)
-                    
-                    # 最后索引时间
-                    vectorized_at = file_metadata.get("vectorized_at")
-                    if vectorized_at:
-                        indexed_time = datetime.fromisoformat(vectorized_at)
-                        if not last_indexed or indexed_time > last_indexed:
-                            last_indexed = indexed_time
+            # 最后索引时间
+            last_indexed = counters.get("last_indexed")
+            if last_indexed:
+                last_indexed = datetime.fromisoformat(last_indexed)
             
-            # 计算平均文件大小
-            avg_file_size = total_size / len(file_ids) if file_ids else 0
+            # 向量数量不随文件增减维护，查看统计时从向量库读取
+            vector_count = await self.vector_service.count_points(
+                knowledge_base.qdrant_config.collection_name
+            )
             
             stats = KnowledgeBaseStats(
                 kb_id=kb_id,
                 name=knowledge_base.name,
                 status=knowledge_base.status,
-                file_count=len(file_ids),
+                file_count=file_count,
                 document_count=knowledge_base.document_count,
-                vector_count=knowledge_base.vector_count,
+                vector_count=vector_count,
                 total_size=total_size,
                 avg_file_size=avg_file_size,
-                file_type_distribution=file_type_distribution,
-                parse_status_distribution=parse_status_distribution,
-                vector_status_distribution=vector_status_distribution,
+                file_type_distribution=self._counter_distribution(counters, "file_types:"),
+                parse_status_distribution=self._counter_distribution(counters, "parse_status:"),
+                vector_status_distribution=self._counter_distribution(counters, "vector_status:"),
                 created_at=knowledge_base.created_at,
                 last_updated=knowledge_base.updated_at,
-                last_indexed=last_indexed
+                last_indexed=last_indexed or None
             )
             
             return stats
@@ -540,10 +634,7 @@ class KnowledgeBaseService:
                 
                 # 保存更新后的配置
                 knowledge_base.updated_at = datetime.now()
-                await self.cache_service.save_data(
-                    f"knowledge_base:{kb_id}",
-                    knowledge_base.dict()
-                )
+                await self._save_knowledge_base(knowledge_base)
             
             logger.info(f"知识库 {kb_id} 索引重建完成，启动了 {len(task_ids)} 个向量化任务")
             return True
@@ -3,11 +3,19 @@
 负责文档的语义检索、向量检索和混合检索，使用分布式存储架构
 """
 
+import asyncio
+import base64
+import heapq
 import logging
-from typing import Dict, List, Optional, Any, Tuple
+import re
+import sys
+from array import array
+from typing import Dict, List, Optional, Any, Tuple, AsyncIterator, Set, Union
 from datetime import datetime, timedelta
 import json
 
+import httpx
+
 from app.core.config import settings
 from app.models.responses import ErrorCode
 from app.core.exceptions import create_service_exception
@@ -16,6 +24,28 @@ from app.services.cache_service import get_cache_service
 
 logger = logging.getLogger("rag-anything")
 
+# embedding和LLM请求共用的连接池：复用keep-alive连接，避免每次检索重新建立TCP/TLS连接
+_HTTP_LIMITS = httpx.Limits(max_connections=128, max_keepalive_connections=64)
+
+# 上下文token估算：中日韩字符约1个token，其余字符约4个字符1个token
+_CJK_CHAR_RE = re.compile(r"[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]")
+
+
+def _estimate_tokens(text: str) -> int:
+    """估算文本的token数（未引入分词器，按字符类别近似）"""
+    cjk_chars = len(_CJK_CHAR_RE.findall(text))
+    return cjk_chars + (len(text) - cjk_chars + 3) // 4
+
+
+def decode_embedding(embedding: Union[str, List[float]]) -> List[float]:
+    """解析接口返回的向量：base64格式为小端float32字节，直接按数组解码，不逐个解析JSON浮点数"""
+    if isinstance(embedding, str):
+        vector = array('f', base64.b64decode(embedding))
+        if sys.byteorder == "big":
+            vector.byteswap()
+        return vector.tolist()
+    return embedding
+
 
 class SearchService:
     """搜索服务"""
@@ -23,6 +53,11 @@ class SearchService:
     def __init__(self):
         self.vector_service = None
         self.cache_service = None
+        # 正在请求中的查询embedding，相同查询的并发调用共享同一次请求
+        self._embedding_inflight: Dict[str, asyncio.Future] = {}
+        self._http_client: Optional[httpx.AsyncClient] = None
+        # 后台写入搜索历史的任务，保留引用直到完成
+        self._background_tasks: Set[asyncio.Task] = set()
         
     async def _get_services(self):
         """获取依赖服务"""
@@ -30,48 +65,95 @@ class SearchService:
             self.vector_service = await get_vector_service()
         if self.cache_service is None:
             self.cache_service = await get_cache_service()
+        if self._http_client is None:
+            self._http_client = httpx.AsyncClient(limits=_HTTP_LIMITS, timeout=30)
+    
+    async def cleanup(self):
+        """关闭HTTP连接池（应用关闭时由服务管理器调用）"""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+    
+    async def _get_file_metadata_map(self, file_ids) -> Dict[str, Dict[str, Any]]:
+        """批量读取文件元数据（不含解析结果），一次管道往返，返回file_id到元数据的映射"""
+        unique_ids = list(dict.fromkeys(file_id for file_id in file_ids if file_id))
+        metadata_list = await self.cache_service.get_file_metadata_many(unique_ids, include_parse_result=False)
+        return {
+            file_id: metadata
+            for file_id, metadata in zip(unique_ids, metadata_list)
+            if metadata
+        }
     
     async def _get_query_embedding(self, query: str) -> List[float]:
-        """获取查询的embedding向量"""
+        """获取查询的embedding向量 - 相同查询命中缓存时不再请求embedding服务，并发的相同查询只请求一次"""
+        pending = self._embedding_inflight.get(query)
+        if pending is None:
+            pending = asyncio.ensure_future(self._get_query_embeddings([query]))
+            self._embedding_inflight[query] = pending
+            pending.add_done_callback(lambda _: self._embedding_inflight.pop(query, None))
+        
+        # shield：单个调用方被取消时不影响共享同一请求的其他调用方
+        return (await asyncio.shield(pending))[0]
+    
+    async def _get_query_embeddings(self, queries: List[str]) -> List[List[float]]:
+        """批量获取查询的embedding向量 - 去重并跳过缓存命中项，其余在一次请求中提交，结果与queries一一对应"""
+        await self._get_services()
+        
+        unique_queries = list(dict.fromkeys(queries))
+        cached = await self.cache_service.get_embeddings(unique_queries, settings.EMBEDDING_MODEL_NAME)
+        embeddings: Dict[str, List[float]] = {
+            query: embedding for query, embedding in zip(unique_queries, cached) if embedding is not None
+        }
+        missing = [query for query in unique_queries if query not in embeddings]
+        if missing:
+            embeddings.update(zip(missing, await self._request_query_embeddings(missing)))
+        
+        return [embeddings[query] for query in queries]
+    
+    async def _request_query_embeddings(self, queries: List[str]) -> List[List[float]]:
+        """请求embedding服务获取一组查询的向量，失败时使用本地方案"""
         try:
             # 检查API配置
             if not settings.EMBEDDING_API_BASE or not settings.EMBEDDING_API_KEY:
                 logger.warning("Embedding API配置不完整，尝试使用本地方案")
-                return await self._get_local_embedding(query)
-                
-            import httpx
+                return [await self._get_local_embedding(query) for query in queries]
             
             # 确保API_KEY不为空
             api_key = str(settings.EMBEDDING_API_KEY).strip()
             if not api_key or api_key == "None":
                 logger.warning("EMBEDDING_API_KEY为空，尝试使用本地方案")
-                return await self._get_local_embedding(query)
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{settings.EMBEDDING_API_BASE}/embeddings",
-                    json={
-                        "model": settings.EMBEDDING_MODEL_NAME,
-                        "input": query
-                    },
-                    headers={
-                        "Authorization": f"Bearer {api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    timeout=30
-                )
-                response.raise_for_status()
-                
-                data = response.json()
-                embedding = data["data"][0]["embedding"]
-                return embedding
-                
+                return [await self._get_local_embedding(query) for query in queries]
+            
+            request_body = {
+                "model": settings.EMBEDDING_MODEL_NAME,
+                "input": queries
+            }
+            if settings.EMBEDDING_ENCODING_FORMAT == "base64":
+                request_body["encoding_format"] = "base64"
+            
+            response = await self._http_client.post(
+                f"{settings.EMBEDDING_API_BASE}/embeddings",
+                json=request_body,
+                headers={
+                    "Authorization": f"Bearer {api_key}",
+                    "Content-Type": "application/json"
+                },
+                timeout=30
+            )
+            response.raise_for_status()
+            
+            # 按index还原顺序，与输入一一对应
+            data = sorted(response.json()["data"], key=lambda item: item.get("index", 0))
+            embeddings = [decode_embedding(item["embedding"]) for item in data]
+            await self.cache_service.set_embeddings(queries, embeddings, settings.EMBEDDING_MODEL_NAME)
+            return embeddings
+            
         except Exception as e:
             logger.error(f"获取查询embedding失败: {e}")
             # 尝试使用本地embedding作为fallback
             try:
                 logger.info("尝试使用本地embedding作为fallback")
-                return await self._get_local_embedding(query)
+                return [await self._get_local_embedding(query) for query in queries]
             except Exception as fallback_error:
                 logger.error(f"本地embedding也失败: {fallback_error}")
                 raise create_service_exception(
@@ -84,61 +166,87 @@ class SearchService:
         try:
             # 使用配置中的向量维度（Qwen3-Embedding-8B：3072维）
             import hashlib
+            import math
             import struct
-            from app.core.config import settings
             
             vector_dim = settings.EMBEDDING_DIMENSION
             
-            # 使用文本哈希生成确定性向量
-            text_hash = hashlib.md5(text.encode('utf-8')).digest()
-            
-            # 生成指定维度的向量
-            embedding = []
-            for i in range(vector_dim):
-                # 使用哈希值的不同部分生成浮点数
-                byte_offset = (i * 2) % len(text_hash)
-                if byte_offset + 1 < len(text_hash):
-                    value = struct.unpack('!h', text_hash[byte_offset:byte_offset+2])[0]
-                    # 归一化到[-1, 1]
-                    normalized_value = value / 32768.0
-                    embedding.append(normalized_value)
-                else:
-                    embedding.append(0.0)
+            # 使用文本哈希生成确定性向量：16字节哈希拆成8个大端int16并归一化到[-1, 1]，按维度循环平铺
+            # 文档向量化的fallback也使用本方法，已入库的向量依赖MD5结果，不能更换哈希算法
+            text_hash = hashlib.md5(text.encode('utf-8'), usedforsecurity=False).digest()
+            values = [value / 32768.0 for value in struct.unpack('!8h', text_hash)]
+            repeats, remainder = divmod(vector_dim, len(values))
             
-            # 向量归一化到单位长度（模长为1）
-            magnitude = sum(x*x for x in embedding)**0.5
+            # 向量归一化到单位长度（模长为1）：平铺向量的模长只需由8个基础值计算
+            magnitude = math.sqrt(
+                sum(x * x for x in values) * repeats + sum(x * x for x in values[:remainder])
+            )
             if magnitude > 0:
-                embedding = [x / magnitude for x in embedding]
-            
-            # 验证归一化后的模长
-            final_magnitude = sum(x*x for x in embedding)**0.5
+                values = [x / magnitude for x in values]
+            embedding = values * repeats + values[:remainder]
             
             logger.info(f"使用本地embedding生成向量: {len(embedding)}维")
             logger.info(f"向量前5个值: {embedding[:5]}")
             logger.info(f"归一化前模长: {magnitude:.4f}")
-            logger.info(f"归一化后模长: {final_magnitude:.4f}")
             return embedding
             
         except Exception as e:
             logger.error(f"本地embedding生成失败: {e}")
             # 如果所有方案都失败，返回零向量
-            from app.core.config import settings
             return [0.0] * settings.EMBEDDING_DIMENSION
     
+    async def _enrich_results(
+        self,
+        search_results: List[Dict[str, Any]],
+        score: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """把向量库返回的点转为检索结果，并附加文件元数据（一次批量读取）
+        
+        score为None时使用向量库返回的相似度分数。
+        """
+        metadata_map = await self._get_file_metadata_map(
+            result.get("payload", {}).get("file_id") for result in search_results
+        )
+        
+        enriched_results = []
+        for result in search_results:
+            payload = result.get("payload", {})
+            file_id = payload.get("file_id")
+            file_metadata = metadata_map.get(file_id)
+            
+            enriched_results.append({
+                "score": result.get("score", 0.0) if score is None else score,
+                "chunk_id": payload.get("chunk_id"),
+                "file_id": file_id,
+                "text": payload.get("text", ""),
+                "chunk_index": payload.get("chunk_index", 0),
+                "source_file": payload.get("source_file"),
+                "block_type": payload.get("block_type"),
+                "file_metadata": {
+                    "filename": file_metadata.get("filename"),
+                    "upload_date": file_metadata.get("upload_date"),
+                    "file_size": file_metadata.get("file_size"),
+                    "content_type": file_metadata.get("content_type")
+                } if file_metadata else None
+            })
+        return enriched_results
+    
     async def vector_search(
         self,
         query: str,
         limit: int = 10,
         score_threshold: float = 0.1,  # 🔧 进一步大幅降低阈值以确保能找到结果
         file_ids: Optional[List[str]] = None,
-        collection_name: Optional[str] = None
+        collection_name: Optional[str] = None,
+        query_vector: Optional[List[float]] = None
     ) -> List[Dict[str, Any]]:
-        """向量语义检索"""
+        """向量语义检索 - 调用方已计算查询向量时通过query_vector传入，不再重复获取"""
         await self._get_services()
         
         try:
             # 获取查询向量
-            query_vector = await self._get_query_embedding(query)
+            if query_vector is None:
+                query_vector = await self._get_query_embedding(query)
             
             # 执行向量搜索
             search_results = await self.vector_service.search_documents(
@@ -150,32 +258,7 @@ class SearchService:
             )
             
             # 增强搜索结果，添加文件元数据
-            enriched_results = []
-            for result in search_results:
-                payload = result.get("payload", {})
-                file_id = payload.get("file_id")
-                
-                # 获取文件元数据
-                file_metadata = None
-                if file_id:
-                    file_metadata = await self.cache_service.get_file_metadata(file_id)
-                
-                enriched_result = {
-                    "score": result.get("score", 0.0),
-                    "chunk_id": payload.get("chunk_id"),
-                    "file_id": file_id,
-                    "text": payload.get("text", ""),
-                    "chunk_index": payload.get("chunk_index", 0),
-                    "source_file": payload.get("source_file"),
-                    "block_type": payload.get("block_type"),
-                    "file_metadata": {
-                        "filename": file_metadata.get("filename") if file_metadata else None,
-                        "upload_date": file_metadata.get("upload_date") if file_metadata else None,
-                        "file_size": file_metadata.get("file_size") if file_metadata else None,
-                        "content_type": file_metadata.get("content_type") if file_metadata else None
-                    } if file_metadata else None
-                }
-                enriched_results.append(enriched_result)
+            enriched_results = await self._enrich_results(search_results)
             
             logger.info(f"向量检索完成: 查询='{query}' 找到{len(enriched_results)}个结果")
             return enriched_results
@@ -208,38 +291,14 @@ class SearchService:
             
             # 过滤指定文件
             if file_ids:
+                allowed_file_ids = set(file_ids)
                 search_results = [
                     result for result in search_results
-                    if result.get("payload", {}).get("file_id") in file_ids
+                    if result.get("payload", {}).get("file_id") in allowed_file_ids
                 ]
             
-            # 增强搜索结果
-            enriched_results = []
-            for result in search_results[:limit]:
-                payload = result.get("payload", {})
-                file_id = payload.get("file_id")
-                
-                # 获取文件元数据
-                file_metadata = None
-                if file_id:
-                    file_metadata = await self.cache_service.get_file_metadata(file_id)
-                
-                enriched_result = {
-                    "score": 1.0,  # 文本搜索没有相似度分数，使用1.0
-                    "chunk_id": payload.get("chunk_id"),
-                    "file_id": file_id,
-                    "text": payload.get("text", ""),
-                    "chunk_index": payload.get("chunk_index", 0),
-                    "source_file": payload.get("source_file"),
-                    "block_type": payload.get("block_type"),
-                    "file_metadata": {
-                        "filename": file_metadata.get("filename") if file_metadata else None,
-                        "upload_date": file_metadata.get("upload_date") if file_metadata else None,
-                        "file_size": file_metadata.get("file_size") if file_metadata else None,
-                        "content_type": file_metadata.get("content_type") if file_metadata else None
-                    } if file_metadata else None
-                }
-                enriched_results.append(enriched_result)
+            # 增强搜索结果（文本搜索没有相似度分数，使用1.0）
+            enriched_results = await self._enrich_results(search_results[:limit], score=1.0)
             
             logger.info(f"文本检索完成: 查询='{query}' 找到{len(enriched_results)}个结果")
             return enriched_results
@@ -266,8 +325,6 @@ class SearchService:
         
         try:
             # 并行执行向量检索和文本检索
-            import asyncio
-            
             # 确保collection_name正确传递
             actual_collection = None
             if collection_name and isinstance(collection_name, str):
@@ -294,52 +351,42 @@ class SearchService:
             
             vector_results, text_results = await asyncio.gather(vector_task, text_task)
             
-            # 合并结果并重新评分
-            chunk_scores = {}
-            
-            # 处理向量检索结果
+            # 合并结果：chunk_id -> [向量分数, 文本分数, 结果]
+            merged: Dict[str, list] = {}
             for result in vector_results:
                 chunk_id = result.get("chunk_id")
                 if chunk_id:
-                    chunk_scores[chunk_id] = {
-                        "vector_score": result.get("score", 0.0),
-                        "text_score": 0.0,
-                        "result": result
-                    }
+                    merged[chunk_id] = [result.get("score", 0.0), 0.0, result]
             
-            # 处理文本检索结果
             for result in text_results:
                 chunk_id = result.get("chunk_id")
-                if chunk_id:
-                    if chunk_id in chunk_scores:
-                        chunk_scores[chunk_id]["text_score"] = 1.0
-                    else:
-                        chunk_scores[chunk_id] = {
-                            "vector_score": 0.0,
-                            "text_score": 1.0,
-                            "result": result
-                        }
-            
-            # 计算混合分数并排序
-            hybrid_results = []
-            for chunk_id, scores in chunk_scores.items():
-                hybrid_score = (
-                    scores["vector_score"] * vector_weight +
-                    scores["text_score"] * text_weight
-                )
-                
-                result = scores["result"].copy()
-                result["hybrid_score"] = hybrid_score
-                result["vector_score"] = scores["vector_score"]
-                result["text_score"] = scores["text_score"]
-                
-                hybrid_results.append(result)
-            
-            # 按混合分数排序
-            hybrid_results.sort(key=lambda x: x["hybrid_score"], reverse=True)
+                if not chunk_id:
+                    continue
+                entry = merged.get(chunk_id)
+                if entry:
+                    entry[1] = 1.0
+                else:
+                    merged[chunk_id] = [0.0, 1.0, result]
+            
+            # 权重归一化：0.7/0.3与7/3效果相同
+            total_weight = vector_weight + text_weight
+            if total_weight > 0:
+                vector_weight, text_weight = vector_weight / total_weight, text_weight / total_weight
+            
+            # 计算混合分数，只取前N个，无需对全部结果排序
+            top_entries = heapq.nlargest(
+                limit,
+                merged.values(),
+                key=lambda entry: entry[0] * vector_weight + entry[1] * text_weight
+            )
             
-            # 返回前N个结果
-            final_results = hybrid_results[:limit]
+            # 结果字典由本次检索新建，直接写入分数无需复制
+            final_results = []
+            for vector_score, text_score, result in top_entries:
+                result["hybrid_score"] = vector_score * vector_weight + text_score * text_weight
+                result["vector_score"] = vector_score
+                result["text_score"] = text_score
+                final_results.append(result)
             
             logger.info(f"混合检索完成: 查询='{query}' 找到{len(final_results)}个结果")
             return final_results
@@ -351,55 +398,69 @@ class SearchService:
                 f"混合检索失败: {str(e)}"
             )
     
+    @staticmethod
+    def _build_answer_context(
+        search_results: List[Dict[str, Any]],
+        max_context_tokens: int
+    ) -> Tuple[str, List[Dict[str, Any]]]:
+        """按估算的token数截取检索结果作为上下文，返回上下文文本和来源列表"""
+        context_texts = []
+        sources = []
+        total_tokens = 0
+        
+        for result in search_results:
+            text = result.get("text", "")
+            if not text:
+                continue
+            
+            text_tokens = _estimate_tokens(text)
+            if total_tokens + text_tokens <= max_context_tokens:
+                context_texts.append(text)
+                sources.append({
+                    "chunk_id": result.get("chunk_id"),
+                    "file_id": result.get("file_id"),
+                    "filename": (result.get("file_metadata") or {}).get("filename"),
+                    "score": result.get("score", 0.0)
+                })
+                total_tokens += text_tokens
+            
+            if total_tokens >= max_context_tokens:
+                break
+        
+        return "\n\n".join(context_texts), sources
+    
+    @staticmethod
+    def _build_answer_prompt(query: str, context: str) -> str:
+        """构建问答提示词"""
+        return f"""基于以下上下文信息，回答用户的问题。请确保答案准确、完整，并基于提供的上下文。
+
+上下文信息：
+{context}
+
+用户问题：{query}
+
+请提供一个详细、准确的回答："""
+    
     async def generate_answer(
         self,
         query: str,
         search_results: List[Dict[str, Any]],
-        max_context_length: int = 4000
+        max_context_tokens: int = 4000
     ) -> Dict[str, Any]:
-        """基于检索结果生成回答"""
+        """基于检索结果生成回答 - 上下文按估算的token数截断，中文内容不会超出模型窗口"""
         try:
             # 构建上下文
-            context_texts = []
-            sources = []
-            total_length = 0
-            
-            for result in search_results:
-                text = result.get("text", "")
-                if text and total_length + len(text) <= max_context_length:
-                    context_texts.append(text)
-                    sources.append({
-                        "chunk_id": result.get("chunk_id"),
-                        "file_id": result.get("file_id"),
-                        "filename": result.get("file_metadata", {}).get("filename"),
-                        "score": result.get("score", 0.0)
-                    })
-                    total_length += len(text)
-                
-                if total_length >= max_context_length:
-                    break
+            context, sources = self._build_answer_context(search_results, max_context_tokens)
             
-            if not context_texts:
+            if not context:
                 return {
                     "answer": "抱歉，没有找到相关信息来回答您的问题。",
                     "sources": [],
                     "context_used": ""
                 }
             
-            context = "\n\n".join(context_texts)
-            
-            # 构建提示词
-            prompt = f"""基于以下上下文信息，回答用户的问题。请确保答案准确、完整，并基于提供的上下文。
-
-上下文信息：
-{context}
-
-用户问题：{query}
-
-请提供一个详细、准确的回答："""
-            
             # 调用LLM生成回答
-            answer = await self._call_llm(prompt)
+            answer = await self._call_llm(self._build_answer_prompt(query, context))
             
             result = {
                 "answer": answer,
@@ -419,38 +480,110 @@ class SearchService:
                 f"答案生成失败: {str(e)}"
             )
     
+    @staticmethod
+    def _llm_request(prompt: str, stream: bool = False) -> Dict[str, Any]:
+        """LLM chat/completions请求参数"""
+        return {
+            "url": f"{settings.LLM_API_BASE}/chat/completions",
+            "json": {
+                "model": settings.LLM_MODEL_NAME,
+                "messages": [
+                    {"role": "user", "content": prompt}
+                ],
+                "max_tokens": 1000,
+                "temperature": 0.7,
+                "stream": stream
+            },
+            "headers": {
+                "Authorization": f"Bearer {settings.LLM_API_KEY}",
+                "Content-Type": "application/json"
+            },
+            "timeout": 60
+        }
+    
     async def _call_llm(self, prompt: str) -> str:
         """调用LLM生成回答"""
+        await self._get_services()
+        
         try:
-            import httpx
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{settings.LLM_API_BASE}/chat/completions",
-                    json={
-                        "model": settings.LLM_MODEL_NAME,
-                        "messages": [
-                            {"role": "user", "content": prompt}
-                        ],
-                        "max_tokens": 1000,
-                        "temperature": 0.7
-                    },
-                    headers={
-                        "Authorization": f"Bearer {settings.LLM_API_KEY}",
-                        "Content-Type": "application/json"
-                    },
-                    timeout=60
-                )
-                response.raise_for_status()
-                
-                data = response.json()
-                answer = data["choices"][0]["message"]["content"]
-                return answer.strip()
-                
+            response = await self._http_client.post(**self._llm_request(prompt))
+            response.raise_for_status()
+            
+            data = response.json()
+            answer = data["choices"][0]["message"]["content"]
+            return answer.strip()
+            
         except Exception as e:
             logger.error(f"调用LLM失败: {e}")
             raise
     
+    async def _call_llm_stream(self, prompt: str) -> AsyncIterator[str]:
+        """流式调用LLM，按SSE事件逐段产出生成的文本"""
+        await self._get_services()
+        
+        try:
+            async with self._http_client.stream("POST", **self._llm_request(prompt, stream=True)) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    payload = line[5:].strip()
+                    if payload == "[DONE]":
+                        break
+                    
+                    choices = json.loads(payload).get("choices") or []
+                    delta = (choices[0].get("delta") or {}).get("content") if choices else None
+                    if delta:
+                        yield delta
+                        
+        except Exception as e:
+            logger.error(f"流式调用LLM失败: {e}")
+            raise
+    
+    async def search_and_answer_stream(
+        self,
+        query: str,
+        search_type: str = "hybrid",
+        limit: int = 10,
+        score_threshold: float = 0.5,
+        file_ids: Optional[List[str]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """检索并流式生成回答
+        
+        依次产出事件：sources（检索到的来源）、若干delta（回答片段）、done；出错时产出error后结束。
+        """
+        try:
+            searched_at = datetime.now().isoformat()
+            search_results = await self.search(
+                query=query,
+                search_type=search_type,
+                limit=limit,
+                score_threshold=score_threshold,
+                file_ids=file_ids
+            )
+            context, sources = self._build_answer_context(search_results, 4000)
+            yield {"type": "sources", "query": query, "search_count": len(search_results), "sources": sources}
+            
+            if not context:
+                yield {"type": "delta", "content": "抱歉，没有找到相关信息来回答您的问题。"}
+            else:
+                async for delta in self._call_llm_stream(self._build_answer_prompt(query, context)):
+                    yield {"type": "delta", "content": delta}
+            
+            yield {"type": "done", "generated_at": datetime.now().isoformat()}
+            
+            # 保存搜索历史到缓存
+            self._save_search_history(query, {
+                "search_type": search_type,
+                "search_count": len(search_results),
+                "searched_at": searched_at,
+                "answer": True
+            })
+            
+        except Exception as e:
+            logger.error(f"流式检索和回答失败: {query} - {e}")
+            yield {"type": "error", "message": f"检索和回答失败: {str(e)}"}
+    
     async def search_and_answer(
         self,
         query: str,
@@ -508,7 +641,7 @@ class SearchService:
                 result["context_used"] = ""
             
             # 保存搜索历史到缓存
-            await self._save_search_history(query, result)
+            self._save_search_history(query, result)
             
             return result
             
@@ -519,27 +652,26 @@ class SearchService:
                 f"检索和回答失败: {str(e)}"
             )
     
-    async def _save_search_history(self, query: str, result: Dict[str, Any]):
-        """保存搜索历史"""
+    def _save_search_history(self, query: str, result: Dict[str, Any]):
+        """保存搜索历史 - 在后台写入，不占用检索响应时间"""
+        # 简化结果用于存储
+        simplified_result = {
+            "query": query,
+            "search_type": result.get("search_type"),
+            "search_count": result.get("search_count"),
+            "searched_at": result.get("searched_at"),
+            "has_answer": "answer" in result
+        }
+        
+        task = asyncio.create_task(self._write_search_history(simplified_result))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+    
+    async def _write_search_history(self, simplified_result: Dict[str, Any]):
+        """写入搜索历史（保留7天）并更新搜索建议索引，失败只记录日志"""
         try:
-            # 简化结果用于存储
-            simplified_result = {
-                "query": query,
-                "search_type": result.get("search_type"),
-                "search_count": result.get("search_count"),
-                "searched_at": result.get("searched_at"),
-                "has_answer": "answer" in result
-            }
-            
-            # 生成搜索历史key
             search_key = f"search_history:{datetime.now().strftime('%Y%m%d')}"
-            
-            # 添加到搜索历史列表
-            await self.cache_service.rpush(search_key, simplified_result)
-            
-            # 设置过期时间（7天）
-            await self.cache_service.expire(search_key, 7 * 24 * 3600)
-            
+            await self.cache_service.save_search_history(search_key, simplified_result, 7 * 24 * 3600)
         except Exception as e:
             logger.warning(f"保存搜索历史失败: {e}")
     
@@ -548,10 +680,13 @@ class SearchService:
         await self._get_services()
         
         try:
-            # 简单的搜索建议实现，基于已有的文本内容
-            # 可以后续使用更复杂的算法优化
+            # 优先按前缀查找历史查询，命中时无需扫描文本内容
+            suggestion_list = await self.cache_service.get_search_suggestions(query, limit)
+            if suggestion_list:
+                logger.debug(f"生成搜索建议: 查询='{query}' 历史查询建议数={len(suggestion_list)}")
+                return suggestion_list
             
-            # 从向量数据库中获取相关文本片段
+            # 没有匹配的历史查询时，从向量数据库中获取相关文本片段提取短语
             search_results = await self.text_search(
                 query=query,
                 limit=20
@@ -604,16 +739,11 @@ class SearchService:
             today_key = f"search_history:{datetime.now().strftime('%Y%m%d')}"
             today_searches = await self.cache_service.llen(today_key)
             
-            # 获取文件统计
-            file_keys = []
-            cursor = 0
-            while True:
-                cursor, new_keys = await self.cache_service.redis.scan(
-                    cursor, match="file:*", count=100
-                )
-                file_keys.extend(new_keys)
-                if cursor == 0:
-                    break
+            # 获取文件统计：读取写入时维护的计数器，未校准时才全量扫描一次并校准
+            file_counters = (
+                await self.cache_service.get_file_counters()
+                or await self.cache_service.aggregate_file_statistics()
+            )
             
             statistics = {
                 "vector_database": {
@@ -624,7 +754,7 @@ class SearchService:
                     "today_searches": today_searches,
                 },
                 "document_library": {
-                    "total_files": len(file_keys),
+                    "total_files": file_counters["total_files"],
                 },
                 "updated_at": datetime.now().isoformat()
             }
@@ -728,36 +858,45 @@ class SearchService:
                 logger.warning(f"知识库 {kb_id} 中没有文件")
                 return []
             
+            # 文件类型和日期范围过滤所需的元数据一次批量读取
+            filter_by_date = bool(date_range and ("start_date" in date_range or "end_date" in date_range))
+            metadata_map = (
+                await self._get_file_metadata_map(kb_file_ids)
+                if file_types or filter_by_date else {}
+            )
+            
             # 应用文件类型过滤
             filtered_file_ids = kb_file_ids
             if file_types:
                 filtered_file_ids = []
                 for file_id in kb_file_ids:
-                    file_metadata = await self.cache_service.get_file_metadata(file_id)
+                    file_metadata = metadata_map.get(file_id)
                     if file_metadata:
                         file_ext = file_metadata.get("filename", "").lower().split(".")[-1]
                         if f".{file_ext}" in file_types:
                             filtered_file_ids.append(file_id)
             
-            # 应用日期范围过滤
-            if date_range and ("start_date" in date_range or "end_date" in date_range):
+            # 应用日期范围过滤（ISO日期字符串可直接比较）
+            if filter_by_date:
+                start_date = date_range.get("start_date")
+                end_date = date_range.get("end_date")
                 date_filtered_ids = []
                 for file_id in filtered_file_ids:
-                    file_metadata = await self.cache_service.get_file_metadata(file_id)
-                    if file_metadata:
-                        upload_date = file_metadata.get("upload_date")
-                        if upload_date:
-                            # 简单的日期比较（这里可以优化）
-                            if date_range.get("start_date"):
-                                if upload_date >= date_range["start_date"]:
-                                    date_filtered_ids.append(file_id)
-                            elif date_range.get("end_date"):
-                                if upload_date <= date_range["end_date"]:
-                                    date_filtered_ids.append(file_id)
-                            else:
-                                date_filtered_ids.append(file_id)
+                    file_metadata = metadata_map.get(file_id)
+                    upload_date = file_metadata.get("upload_date") if file_metadata else None
+                    if not upload_date:
+                        continue
+                    if start_date and upload_date < start_date:
+                        continue
+                    if end_date and upload_date > end_date:
+                        continue
+                    date_filtered_ids.append(file_id)
                 filtered_file_ids = date_filtered_ids
             
+            if not filtered_file_ids:
+                logger.info(f"知识库 {kb_id} 中没有符合过滤条件的文件")
+                return []
+            
             # 执行向量检索
             search_results = await self.vector_search(
                 query=query,
@@ -929,22 +1068,29 @@ class SearchService:
             # 1️⃣ 查询预处理和扩展
             enhanced_queries = self._expand_tender_query(query, analysis_type)
             
-            # 2️⃣ 多层次检索策略
-            all_results = []
-            for enhanced_query in enhanced_queries:
-                # 确保collection_name正确传递
-                actual_collection = None
-                if collection_name and isinstance(collection_name, str):
-                    actual_collection = collection_name
-                
-                results = await self.vector_search(
+            # 2️⃣ 多层次检索策略：一次请求获取全部扩展查询的向量，再并行检索
+            # 确保collection_name正确传递
+            actual_collection = None
+            if collection_name and isinstance(collection_name, str):
+                actual_collection = collection_name
+            
+            query_vectors = await self._get_query_embeddings(
+                [enhanced_query["query"] for enhanced_query in enhanced_queries]
+            )
+            results_per_query = await asyncio.gather(*(
+                self.vector_search(
                     query=enhanced_query["query"],
                     file_ids=file_ids,
                     limit=limit * 2,  # 增大搜索范围
                     score_threshold=score_threshold,
-                    collection_name=actual_collection
+                    collection_name=actual_collection,
+                    query_vector=query_vector
                 )
-                
+                for enhanced_query, query_vector in zip(enhanced_queries, query_vectors)
+            ))
+            
+            all_results = []
+            for enhanced_query, results in zip(enhanced_queries, results_per_query):
                 # 为结果添加查询类型标记
                 for result in results:
                     result["query_type"] = enhanced_query["type"]
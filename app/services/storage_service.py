@@ -6,7 +6,7 @@ MinIO 对象存储服务
 import os
 import asyncio
 import logging
-from typing import Dict, List, Optional, BinaryIO, Any
+from typing import AsyncIterator, Dict, List, Optional, BinaryIO, Any, Union
 from datetime import datetime, timedelta
 import uuid
 
@@ -22,6 +22,33 @@ from app.core.exceptions import create_service_exception
 
 logger = logging.getLogger("rag-anything")
 
+# 未指定content_type时按扩展名推断
+_CONTENT_TYPE_MAP = {
+    '.pdf': 'application/pdf',
+    '.doc': 'application/msword',
+    '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    '.txt': 'text/plain',
+    '.md': 'text/markdown',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+}
+
+# 分片上传配置：超过阈值的对象走S3 multipart，分片并行上传
+# 已知大小的对象按大小选择分片，保证至少有MULTIPART_CONCURRENCY个分片可以并行（S3分片下限5MiB）；
+# 长度未知的流按MULTIPART_PART_SIZE逐片读取
+MULTIPART_THRESHOLD = 32 * 1024 * 1024
+MULTIPART_PART_SIZE = 16 * 1024 * 1024
+MULTIPART_MIN_PART_SIZE = 5 * 1024 * 1024
+MULTIPART_CONCURRENCY = 8
+
+# 下载到本地文件时的分片大小和并行分片数
+DOWNLOAD_PART_SIZE = 32 * 1024 * 1024
+DOWNLOAD_CONCURRENCY = 8
+
+# 分段读取对象时每次Range GET的大小
+RANGE_READ_SIZE = 4 * 1024 * 1024
+
 
 class MinIOService:
     """MinIO 对象存储服务"""
@@ -84,6 +111,24 @@ class MinIOService:
                 
         await loop.run_in_executor(None, _sync_ensure_bucket)
     
+    @staticmethod
+    def _resolve_content_type(object_name: str, content_type: Optional[str]) -> str:
+        """确定上传对象的content_type"""
+        if content_type:
+            return content_type
+        ext = os.path.splitext(object_name)[1].lower()
+        return _CONTENT_TYPE_MAP.get(ext, 'application/octet-stream')
+    
+    @staticmethod
+    def _multipart_part_size(length: int, concurrency: int) -> int:
+        """按对象大小选择分片大小：分片数不少于并行数，且不超过MULTIPART_PART_SIZE"""
+        if length is None or length < 0:
+            return MULTIPART_PART_SIZE
+        part_size = -(-length // max(concurrency, 1))
+        # 向上取整到MiB
+        part_size = -(-part_size // (1024 * 1024)) * 1024 * 1024
+        return max(MULTIPART_MIN_PART_SIZE, min(part_size, MULTIPART_PART_SIZE))
+    
     async def upload_file(self, object_name: str, file_data: bytes, content_type: str = None) -> str:
         """上传文件到MinIO"""
         if not self._connected:
@@ -95,21 +140,7 @@ class MinIOService:
             def _sync_upload():
                 from io import BytesIO
                 
-                # 🔧 修复作用域问题：在内部函数开始就确定content_type的值
-                final_content_type = content_type
-                if not final_content_type:
-                    ext = os.path.splitext(object_name)[1].lower()
-                    content_type_map = {
-                        '.pdf': 'application/pdf',
-                        '.doc': 'application/msword',
-                        '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-                        '.txt': 'text/plain',
-                        '.md': 'text/markdown',
-                        '.jpg': 'image/jpeg',
-                        '.jpeg': 'image/jpeg',
-                        '.png': 'image/png',
-                    }
-                    final_content_type = content_type_map.get(ext, 'application/octet-stream')
+                final_content_type = self._resolve_content_type(object_name, content_type)
                 
                 # 调试日志
                 logger.debug(f"MinIO上传: object_name={object_name}, content_type={content_type} -> final_content_type={final_content_type}")
@@ -136,6 +167,100 @@ class MinIOService:
                 f"文件上传失败: {str(e)}"
             )
     
+    async def upload_file_multipart(
+        self,
+        object_name: str,
+        data: Union[bytes, BinaryIO],
+        content_type: str = None,
+        length: int = -1,
+        part_size: Optional[int] = None,
+        concurrency: int = MULTIPART_CONCURRENCY
+    ) -> str:
+        """分片上传文件到MinIO，适用于大文件
+        
+        data可以是bytes或可读的文件对象；文件对象长度未知时传length=-1，
+        由minio按part_size逐片读取，内存占用与对象大小无关。
+        未指定part_size时按对象大小选择。
+        """
+        if not self._connected:
+            await self.initialize()
+            
+        try:
+            loop = asyncio.get_event_loop()
+            
+            def _sync_upload():
+                from io import BytesIO
+                
+                stream = BytesIO(data) if isinstance(data, (bytes, bytearray)) else data
+                stream_length = len(data) if isinstance(data, (bytes, bytearray)) else length
+                
+                self.client.put_object(
+                    bucket_name=self.bucket_name,
+                    object_name=object_name,
+                    data=stream,
+                    length=stream_length,
+                    content_type=self._resolve_content_type(object_name, content_type),
+                    part_size=part_size or self._multipart_part_size(stream_length, concurrency),
+                    num_parallel_uploads=concurrency
+                )
+                
+                return f"minio://{self.bucket_name}/{object_name}"
+            
+            file_url = await loop.run_in_executor(None, _sync_upload)
+            logger.info(f"文件分片上传成功: {object_name}")
+            return file_url
+            
+        except Exception as e:
+            logger.error(f"文件分片上传失败: {object_name} - {e}")
+            raise create_service_exception(
+                ErrorCode.MINIO_CONNECTION_ERROR,
+                f"文件上传失败: {str(e)}"
+            )
+    
+    async def upload_file_from_path(
+        self,
+        object_name: str,
+        file_path: str,
+        content_type: str = None,
+        part_size: Optional[int] = None,
+        concurrency: int = MULTIPART_CONCURRENCY
+    ) -> str:
+        """从本地路径上传文件到MinIO
+        
+        使用fput_object直接从磁盘流式读取，不经过Python bytes中转，大文件自动分片上传。
+        未指定part_size时按文件大小选择。
+        """
+        if not self._connected:
+            await self.initialize()
+            
+        try:
+            loop = asyncio.get_event_loop()
+            
+            def _sync_upload():
+                self.client.fput_object(
+                    bucket_name=self.bucket_name,
+                    object_name=object_name,
+                    file_path=file_path,
+                    content_type=self._resolve_content_type(object_name, content_type),
+                    part_size=part_size or self._multipart_part_size(
+                        os.path.getsize(file_path), concurrency
+                    ),
+                    num_parallel_uploads=concurrency
+                )
+                
+                return f"minio://{self.bucket_name}/{object_name}"
+            
+            file_url = await loop.run_in_executor(None, _sync_upload)
+            logger.debug(f"文件上传成功: {object_name}")
+            return file_url
+            
+        except Exception as e:
+            logger.error(f"文件上传失败: {object_name} - {e}")
+            raise create_service_exception(
+                ErrorCode.MINIO_CONNECTION_ERROR,
+                f"文件上传失败: {str(e)}"
+            )
+    
     async def download_file(self, object_name: str) -> bytes:
         """从MinIO下载文件"""
         if not self._connected:
@@ -163,6 +288,120 @@ class MinIOService:
                 f"文件下载失败: {str(e)}"
             )
     
+    async def iter_ranges(self, object_name: str, range_size: int = RANGE_READ_SIZE) -> AsyncIterator[bytes]:
+        """按range_size分段读取MinIO对象（Range GET），逐段产出，不在内存中保留整个对象"""
+        if not self._connected:
+            await self.initialize()
+            
+        try:
+            loop = asyncio.get_event_loop()
+            
+            stat = await loop.run_in_executor(
+                None, self.client.stat_object, self.bucket_name, object_name
+            )
+            
+            def _sync_read_range(offset: int, length: int) -> bytes:
+                response = self.client.get_object(
+                    self.bucket_name, object_name, offset=offset, length=length
+                )
+                try:
+                    return response.read()
+                finally:
+                    response.close()
+                    response.release_conn()
+            
+            for offset in range(0, stat.size, range_size):
+                yield await loop.run_in_executor(
+                    None, _sync_read_range, offset, min(range_size, stat.size - offset)
+                )
+                
+        except Exception as e:
+            logger.error(f"文件分段读取失败: {object_name} - {e}")
+            raise create_service_exception(
+                ErrorCode.MINIO_CONNECTION_ERROR,
+                f"文件下载失败: {str(e)}"
+            )
+    
+    async def download_to_file(
+        self,
+        object_name: str,
+        dest_path: str,
+        part_size: int = DOWNLOAD_PART_SIZE,
+        concurrency: int = DOWNLOAD_CONCURRENCY
+    ) -> int:
+        """从MinIO下载文件到本地路径，返回文件大小
+        
+        按part_size拆成多个Range GET并行下载，各分片流式写入目标文件对应偏移，
+        内存占用与文件大小无关。
+        """
+        if not self._connected:
+            await self.initialize()
+            
+        try:
+            loop = asyncio.get_event_loop()
+            
+            stat = await loop.run_in_executor(
+                None, self.client.stat_object, self.bucket_name, object_name
+            )
+            total_size = stat.size
+            
+            # 预分配目标文件，各分片按偏移独立写入
+            with open(dest_path, "wb") as f:
+                f.truncate(total_size)
+            
+            fd = os.open(dest_path, os.O_WRONLY)
+            try:
+                semaphore = asyncio.Semaphore(concurrency)
+                
+                def _sync_download_part(offset: int, length: int):
+                    response = self.client.get_object(
+                        self.bucket_name, object_name, offset=offset, length=length
+                    )
+                    try:
+                        position = offset
+                        for chunk in response.stream(1024 * 1024):
+                            os.pwrite(fd, chunk, position)
+                            position += len(chunk)
+                    finally:
+                        response.close()
+                        response.release_conn()
+                
+                failed = False
+                
+                async def _download_part(offset: int, length: int):
+                    nonlocal failed
+                    async with semaphore:
+                        # 已有分片失败时不再发起新的Range GET
+                        if failed:
+                            return
+                        try:
+                            await loop.run_in_executor(None, _sync_download_part, offset, length)
+                        except Exception:
+                            failed = True
+                            raise
+                
+                # 等全部分片结束（包括仍在线程池中写入的分片）再关闭fd，之后再抛出第一个错误
+                results = await asyncio.gather(*[
+                    _download_part(offset, min(part_size, total_size - offset))
+                    for offset in range(0, total_size, part_size)
+                ], return_exceptions=True)
+            finally:
+                os.close(fd)
+            
+            errors = [result for result in results if isinstance(result, BaseException)]
+            if errors:
+                raise errors[0]
+            
+            logger.debug(f"文件下载成功: {object_name} -> {dest_path}")
+            return total_size
+            
+        except Exception as e:
+            logger.error(f"文件下载失败: {object_name} - {e}")
+            raise create_service_exception(
+                ErrorCode.MINIO_CONNECTION_ERROR,
+                f"文件下载失败: {str(e)}"
+            )
+    
     async def delete_file(self, object_name: str) -> bool:
         """从MinIO删除文件"""
         if not self._connected:
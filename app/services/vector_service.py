@@ -13,7 +13,9 @@ try:
     from qdrant_client.http import models
     from qdrant_client.http.models import (
         Distance, VectorParams, CreateCollection, PointStruct,
-        Filter, FieldCondition, MatchValue, SearchRequest
+        Filter, FieldCondition, MatchValue, MatchAny, SearchRequest,
+        PayloadSchemaType, ScalarQuantization, ScalarQuantizationConfig, ScalarType,
+        SearchParams, QuantizationSearchParams
     )
 except ImportError:
     raise ImportError("请安装qdrant-client库: pip install qdrant-client")
@@ -24,6 +26,9 @@ from app.core.exceptions import create_service_exception
 
 logger = logging.getLogger("rag-anything")
 
+# 检索时作为过滤条件的payload字段，建集合时创建keyword索引，过滤在ANN检索过程中完成
+_KEYWORD_PAYLOAD_FIELDS = ("file_id",)
+
 
 class VectorService:
     """Qdrant 向量数据库服务"""
@@ -80,8 +85,10 @@ class VectorService:
                     vectors_config=VectorParams(
                         size=vector_size,  # 使用Qwen3-Embedding-8B的维度：3072
                         distance=Distance.COSINE  # 使用余弦相似度
-                    )
+                    ),
+                    quantization_config=self._quantization_config()
                 )
+                self._create_payload_indexes(collection_name)
                 logger.info(f"创建向量集合: {collection_name} - 维度: {vector_size}")
             else:
                 logger.info(f"向量集合已存在: {collection_name}")
@@ -90,6 +97,62 @@ class VectorService:
             logger.error(f"确保集合存在失败: {collection_name} - {e}")
             raise
     
+    @staticmethod
+    def _quantization_config() -> Optional[ScalarQuantization]:
+        """新建集合的量化配置：int8标量量化，量化向量常驻内存，原始向量用于重新打分"""
+        if settings.QDRANT_QUANTIZATION.lower() != "int8":
+            return None
+        return ScalarQuantization(
+            scalar=ScalarQuantizationConfig(
+                type=ScalarType.INT8,
+                quantile=0.99,
+                always_ram=True
+            )
+        )
+    
+    @staticmethod
+    def _search_params() -> Optional[SearchParams]:
+        """检索参数：先在量化索引中多取候选，再用原始向量重新打分；未量化的集合忽略该参数"""
+        if settings.QDRANT_QUANTIZATION.lower() != "int8":
+            return None
+        return SearchParams(
+            quantization=QuantizationSearchParams(
+                rescore=True,
+                oversampling=settings.QDRANT_SEARCH_OVERSAMPLING
+            )
+        )
+    
+    def _create_payload_indexes(self, collection_name: str):
+        """为过滤字段创建payload索引
+        
+        索引只影响过滤性能，没有索引时过滤条件仍然生效；创建失败只记录日志，
+        不把已经建好的集合当作创建失败。
+        """
+        for field_name in _KEYWORD_PAYLOAD_FIELDS:
+            try:
+                self.client.create_payload_index(
+                    collection_name=collection_name,
+                    field_name=field_name,
+                    field_schema=PayloadSchemaType.KEYWORD
+                )
+            except Exception as e:
+                logger.warning(f"创建payload索引失败: {collection_name}.{field_name} - {e}")
+    
+    @staticmethod
+    def _build_filter(filter_conditions: Optional[Dict[str, Any]]) -> Optional[Filter]:
+        """构建过滤条件：列表值匹配其中任意一个，其他值精确匹配"""
+        if not filter_conditions:
+            return None
+        
+        conditions = []
+        for key, value in filter_conditions.items():
+            if isinstance(value, (list, tuple, set)):
+                match = MatchAny(any=list(value))
+            else:
+                match = MatchValue(value=value)
+            conditions.append(FieldCondition(key=key, match=match))
+        return Filter(must=conditions)
+    
     async def create_collection(self, collection_name: str, vector_size: int = None) -> bool:
         """创建向量集合"""
         if not self._connected:
@@ -105,8 +168,10 @@ class VectorService:
                 vectors_config=VectorParams(
                     size=vector_size,
                     distance=Distance.COSINE
-                )
+                ),
+                quantization_config=self._quantization_config()
             )
+            self._create_payload_indexes(collection_name)
             logger.info(f"创建向量集合成功: {collection_name} - 维度: {vector_size}")
             return True
             
@@ -218,17 +283,7 @@ class VectorService:
             
         try:
             # 构建过滤条件
-            search_filter = None
-            if filter_conditions:
-                conditions = []
-                for key, value in filter_conditions.items():
-                    conditions.append(
-                        FieldCondition(
-                            key=key,
-                            match=MatchValue(value=value)
-                        )
-                    )
-                search_filter = Filter(must=conditions)
+            search_filter = self._build_filter(filter_conditions)
             
             # 调试：记录搜索参数
             logger.info(f"🔍 向量搜索调试:")
@@ -246,6 +301,7 @@ class VectorService:
                 limit=limit,
                 score_threshold=score_threshold,
                 query_filter=search_filter,
+                search_params=self._search_params(),
                 with_payload=True,
                 with_vectors=False
             )
@@ -372,17 +428,7 @@ class VectorService:
             
         try:
             # 构建过滤条件
-            scroll_filter = None
-            if filter_conditions:
-                conditions = []
-                for key, value in filter_conditions.items():
-                    conditions.append(
-                        FieldCondition(
-                            key=key,
-                            match=MatchValue(value=value)
-                        )
-                    )
-                scroll_filter = Filter(must=conditions)
+            scroll_filter = self._build_filter(filter_conditions)
             
             # 执行滚动查询
             result, next_page_offset = self.client.scroll(
@@ -523,13 +569,10 @@ class VectorService:
         # 🔧 增强调试信息
         logger.debug(f"search_documents调用参数: collection_name={collection_name}, file_ids={file_ids}, limit={limit}, score_threshold={score_threshold}")
         
-        # 构建过滤条件
+        # 构建过滤条件：多个文件ID由Qdrant按MatchAny在检索时过滤
         filter_conditions = {}
         if file_ids:
-            # 注意：这里的实现可能需要根据Qdrant的具体API调整
-            # 当前实现仅支持单个文件ID过滤
-            if len(file_ids) == 1:
-                filter_conditions["file_id"] = file_ids[0]
+            filter_conditions["file_id"] = file_ids[0] if len(file_ids) == 1 else list(file_ids)
         
         return await self.search_vectors(
             collection_name=collection_name,
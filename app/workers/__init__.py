@@ -4,5 +4,6 @@
 """
 
 from .vectorize_worker import start_vectorize_worker, stop_vectorize_worker
+from .parse_worker import start_parse_worker, stop_parse_worker
 
-__all__ = ["start_vectorize_worker", "stop_vectorize_worker"] 
\ No newline at end of file
+__all__ = ["start_vectorize_worker", "stop_vectorize_worker", "start_parse_worker", "stop_parse_worker"] 
\ No newline at end of file
@@ -0,0 +1,211 @@
+"""
+解析任务处理器
+负责从Redis队列中消费文档解析任务，执行MinerU解析
+多个实例可同时消费同一队列，通过增加进程/Pod数量横向扩展
+"""
+
+import asyncio
+import json
+import logging
+from typing import Dict, Any, Optional, Set
+from datetime import datetime
+
+from app.core.config import settings
+from app.services.cache_service import get_cache_service
+from app.services.document_service import get_document_service
+
+logger = logging.getLogger("rag-anything")
+
+
+class ParseWorker:
+    """解析任务处理器"""
+    
+    def __init__(self, max_tasks: Optional[int] = None):
+        self.cache_service = None
+        self.document_service = None
+        self.running = False
+        self.queue_name = "document_parse"
+        # 单个进程内同时执行的解析任务上限
+        self.max_tasks = max_tasks or settings.PARSE_WORKER_MAX_TASKS
+        self._slots = asyncio.Semaphore(self.max_tasks)
+        self._active_tasks: Set[asyncio.Task] = set()
+        # start()所在的后台任务，stop()等待它退出；停止事件用于打断空闲等待
+        self._loop_task: Optional[asyncio.Task] = None
+        self._stop_event = asyncio.Event()
+    
+    async def initialize(self):
+        """初始化服务依赖"""
+        self.cache_service = await get_cache_service()
+        self.document_service = await get_document_service()
+        logger.info(f"解析任务处理器初始化完成，最大并发任务数: {self.max_tasks}")
+    
+    async def start(self):
+        """启动任务处理器"""
+        await self.initialize()
+        self.running = True
+        self._stop_event.clear()
+        logger.info("🚀 解析任务处理器启动，开始监听队列...")
+        
+        while self.running:
+            # 先占用执行槽位，槽位满时不再从队列取任务，剩余任务留给其他实例
+            await self._slots.acquire()
+            # 等待槽位期间可能已经停止，此时不能再从队列取出任务
+            if not self.running:
+                self._slots.release()
+                break
+            try:
+                # 1. 按优先级和入队顺序获取任务
+                task_data = await self.cache_service.get_priority_task(self.queue_name)
+                
+                # 2. 兼容旧版本写入普通列表的任务，排空后即不再命中
+                if not task_data:
+                    task_json = await self.cache_service.redis.lpop(self.queue_name)
+                    if task_json:
+                        task_data = json.loads(task_json)
+                
+                # 3. 后台执行任务，完成后释放槽位
+                if task_data:
+                    task = asyncio.create_task(self.process_task(task_data))
+                    self._active_tasks.add(task)
+                    task.add_done_callback(self._on_task_done)
+                else:
+                    self._slots.release()
+                    # 没有任务，等待1秒
+                    await self._idle(1)
+            
+            except Exception as e:
+                self._slots.release()
+                logger.error(f"解析任务处理器运行异常: {e}")
+                await self._idle(5)  # 出错时等待5秒后重试
+    
+    async def _idle(self, seconds: float):
+        """空闲等待，停止时立即返回"""
+        try:
+            await asyncio.wait_for(self._stop_event.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+    
+    def _on_task_done(self, task: asyncio.Task):
+        """任务结束回调：释放执行槽位"""
+        self._active_tasks.discard(task)
+        self._slots.release()
+    
+    async def stop(self):
+        """停止任务处理器"""
+        self.running = False
+        self._stop_event.set()
+        # 先取消执行中的任务以释放槽位，让等待槽位的主循环醒来并退出
+        for task in list(self._active_tasks):
+            task.cancel()
+        if self._loop_task is not None:
+            await asyncio.gather(self._loop_task, return_exceptions=True)
+            self._loop_task = None
+        # 主循环退出前可能刚取出并启动了任务，一并取消
+        for task in list(self._active_tasks):
+            task.cancel()
+        if self._active_tasks:
+            await asyncio.gather(*self._active_tasks, return_exceptions=True)
+        logger.info("解析任务处理器已停止")
+    
+    async def process_task(self, task_data: Dict[str, Any]):
+        """处理单个解析任务"""
+        task_id = task_data.get("task_id")
+        file_id = task_data.get("file_id")
+        filename = task_data.get("filename", "未知文件")
+        
+        try:
+            logger.info(f"🔄 开始处理解析任务: {task_id}")
+            logger.info(f"   📄 文件: {filename} ({file_id})")
+            
+            await self.update_task_status(task_id, "running", "开始解析文档...")
+            
+            # parse_document内部负责更新文件的解析状态
+            result = await self.document_service.parse_document(file_id)
+            
+            if result.get("status") == "success":
+                await self.update_task_status(task_id, "completed", "解析完成")
+                logger.info(f"✅ 解析任务完成: {task_id}")
+            else:
+                error_msg = result.get("error", "未知错误")
+                await self.update_task_status(task_id, "failed", f"解析失败: {error_msg}")
+                logger.error(f"❌ 解析任务失败: {task_id} - {error_msg}")
+        
+        except asyncio.CancelledError:
+            # worker停止时取消执行中的解析：文件恢复为待解析并重新入队，由其他worker接手
+            await self._requeue_task(task_data)
+            raise
+        
+        except Exception as e:
+            error_msg = str(e)
+            await self.update_task_status(task_id, "failed", f"解析失败: {error_msg}")
+            
+            logger.error(f"❌ 解析任务失败: {task_id}")
+            logger.error(f"   🔍 错误: {error_msg}")
+    
+    async def _requeue_task(self, task_data: Dict[str, Any]):
+        """把被取消的解析任务放回队列，并把文件的解析状态恢复为pending"""
+        task_id = task_data.get("task_id")
+        file_id = task_data.get("file_id")
+        try:
+            if file_id:
+                await self.cache_service.save_file_metadata(file_id, {"parse_status": "pending"})
+            requeued = await self.cache_service.add_to_queue(
+                self.queue_name, task_data, int(task_data.get("priority") or 0)
+            )
+        except Exception as e:
+            logger.error(f"解析任务重新入队失败: {task_id} - {e}")
+            requeued = False
+        
+        if requeued:
+            await self.update_task_status(task_id, "pending", "处理器停止，任务已重新入队")
+            logger.info(f"↩️ 解析任务已重新入队: {task_id}")
+        else:
+            await self.update_task_status(task_id, "cancelled", "任务被取消")
+    
+    async def update_task_status(self, task_id: str, status: str, message: str = ""):
+        """更新任务状态"""
+        try:
+            current_time = datetime.utcnow().isoformat()
+            
+            task_update = {
+                "status": status,
+                "updated_at": current_time,
+                "message": message
+            }
+            if status == "running":
+                task_update["started_at"] = current_time
+            elif status in ("completed", "failed", "cancelled"):
+                task_update["completed_at"] = current_time
+            
+            await self.cache_service.set_task_info(task_id, task_update)
+        
+        except Exception as e:
+            logger.error(f"更新任务状态失败: {task_id} - {e}")
+
+
+# 全局任务处理器实例
+_parse_worker = None
+
+
+async def get_parse_worker() -> ParseWorker:
+    """获取解析任务处理器实例"""
+    global _parse_worker
+    if _parse_worker is None:
+        _parse_worker = ParseWorker()
+    return _parse_worker
+
+
+async def start_parse_worker():
+    """启动解析任务处理器（后台运行）"""
+    worker = await get_parse_worker()
+    # 在后台运行，不阻塞主进程；保留任务引用，停止时等待主循环退出
+    worker._loop_task = asyncio.create_task(worker.start())
+    logger.info("解析任务处理器已在后台启动")
+
+
+async def stop_parse_worker():
+    """停止解析任务处理器"""
+    global _parse_worker
+    if _parse_worker and _parse_worker.running:
+        await _parse_worker.stop()
+        logger.info("解析任务处理器已停止")
@@ -40,10 +40,10 @@ class VectorizeWorker:
         
         while self.running:
             try:
-                # 1. 尝试获取优先级任务
+                # 1. 按优先级和入队顺序获取任务
                 task_data = await self.cache_service.get_priority_task(self.queue_name)
                 
-                # 2. 如果没有优先级任务，获取普通任务  
+                # 2. 兼容旧版本写入普通列表的任务，排空后即不再命中
                 if not task_data:
                     task_json = await self.cache_service.redis.lpop(self.queue_name)
                     if task_json:
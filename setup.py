@@ -89,6 +89,7 @@ setuptools.setup(
     install_requires=requirements,
     extras_require=extras_require,
     include_package_data=True,  # Includes non-code files from MANIFEST.in
+    package_data={"app.services": ["prompts/*.txt"]},  # Prompt templates loaded at runtime
     project_urls={  # Additional project metadata
         "Documentation": metadata.get("__url__", ""),
         "Source": metadata.get("__url__", ""),